@@ -0,0 +1,6 @@
+#benchmarks
+#synthetic data plus timing for the storage layer, the market tick, the lottery draw and
+#mixes of slash commands driven through fake interactions. needs the bot's requirements
+#installed but no discord connection or real config.json.
+#    python -m benchmarks.run --users 1000 10000 100000 --out bench_results.json
+#    python -m benchmarks.run --users 10000 --compare bench_results.json
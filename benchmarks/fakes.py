@@ -0,0 +1,67 @@
+#benchmarks/fakes.py
+#just enough of discord.Interaction and friends for the cog commands to run without a
+#gateway connection. responses are counted, not sent anywhere.
+
+class FakeRole:
+    def __init__(self, name):
+        self.name = name
+
+class FakeMember:
+    def __init__(self, user_id, roles=()):
+        self.id = int(user_id)
+        self.name = f"user{user_id}"
+        self.display_name = self.name
+        self.mention = f"<@{user_id}>"
+        self.roles = [FakeRole(name) for name in roles]
+        self.premium_since = None
+
+    async def timeout(self, until, reason=None):
+        pass
+
+    def __str__(self):
+        return self.name
+
+class FakeGuild:
+    def __init__(self, guild_id=1):
+        self.id = guild_id
+        self.members = {}
+
+    def get_member(self, user_id):
+        return self.members.get(int(user_id))
+
+class FakeResponse:
+    def __init__(self):
+        self.done = False
+        self.last = None
+
+    async def send_message(self, content=None, **kwargs):
+        self.done = True
+        self.last = content if content is not None else kwargs.get("embed")
+
+    async def defer(self, **kwargs):
+        self.done = True
+
+    def is_done(self):
+        return self.done
+
+class FakeFollowup:
+    async def send(self, content=None, **kwargs):
+        pass
+
+class FakeInteraction:
+    def __init__(self, user, guild):
+        self.user = user
+        self.guild = guild
+        self.channel = None
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+
+class FakeBot:
+    def __init__(self, guild):
+        self.guild = guild
+
+    def get_all_channels(self):
+        return []
+
+    def get_guild(self, guild_id):
+        return self.guild
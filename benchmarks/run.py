@@ -0,0 +1,340 @@
+#benchmarks/run.py
+#times the hot paths and a mix of slash commands at each user count and writes the
+#numbers to a json file. --compare prints the ops/sec change against an older file.
+#    python -m benchmarks.run --users 1000 10000 --ops 5000 --out bench_results.json
+import argparse
+import asyncio
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import synthetic
+from benchmarks.fakes import FakeBot, FakeGuild, FakeInteraction, FakeMember
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#relative weights of the simulated command mix, roughly what a busy evening looks like.
+COMMAND_MIX = {
+    "balance": 25,
+    "work": 15,
+    "roulette": 15,
+    "portfolio": 10,
+    "stockbuy": 10,
+    "daily": 5,
+    "stocksell": 5,
+    "pay": 5,
+    "lotteryticket": 5,
+    "cryptobuy": 3,
+    "stocks": 2,
+}
+
+def percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def summarize(samples):
+    #samples are seconds per op.
+    ordered = sorted(samples)
+    total = sum(ordered)
+    return {
+        "runs": len(ordered),
+        "ops_per_sec": round(len(ordered) / total, 2) if total else None,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
+
+def time_calls(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def quiet_cog(cog):
+    #cogs start their background loops in __init__, the benchmark drives things itself.
+    from discord.ext import tasks
+    for value in vars(cog).values():
+        if isinstance(value, tasks.Loop):
+            value.cancel()
+    return cog
+
+def bench_hot_paths(ids, repeat):
+    from economy import economy
+    from storage import JsonBackend, SqliteBackend
+    from stocks import update_stock_prices
+    from lottery import load_lottery_book, lottery_draw
+    from history import price_history
+    from market import MarketEngine
+    from leaderboard import leaderboards
+    from stocks import load_stocks
+
+    results = {}
+    backend = JsonBackend()
+    results["json_load_all"] = time_calls(backend.load_all, repeat)
+    records = backend.load_all()
+    keys = list(records)
+    results["json_snapshot"] = time_calls(lambda: backend.snapshot(records, keys), repeat)
+    #the old save_data(): every user serialized and rewritten.
+    results["json_save_full"] = time_calls(lambda: backend.save(backend.snapshot(records, keys), keys, backend.journal_seq), repeat)
+
+    sqlite = SqliteBackend("bench.db")
+    try:
+        sqlite.save(sqlite.snapshot(records, keys), keys, 0)
+        results["sqlite_load_all"] = time_calls(sqlite.load_all, repeat)
+        rng = random.Random(7)
+        dirty = rng.sample(keys, min(100, len(keys)))
+        results["sqlite_save_100_dirty"] = time_calls(lambda: sqlite.save(sqlite.snapshot(records, dirty), dirty, 0), repeat)
+    finally:
+        sqlite.close()
+
+    #per-append cost of the journal, the write every command pays.
+    samples = []
+    for user_id in ids[:5000]:
+        started = time.perf_counter()
+        economy.journal.append_delta(user_id, 1, "bench")
+        samples.append(time.perf_counter() - started)
+    economy.journal.sync()
+    results["journal_append"] = summarize(samples)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = MarketEngine.from_prices({}, seed=1)
+        results["update_stock_prices"] = time_calls(lambda: update_stock_prices(engine, None), repeat)
+        lottery_data, book, _ = load_lottery_book()
+        jackpot, tickets = lottery_data["Jackpot"], book.tickets()
+        results["lottery_draw"] = time_calls(lambda: lottery_draw(jackpot, tickets["user_id"], tickets["mask"]), repeat)
+    results["lottery_draw"]["tickets"] = len(tickets)
+    #the price model alone on a much bigger market.
+    big_market = MarketEngine.from_prices({f"SYM{i}": 100.0 for i in range(5000)}, seed=1)
+    results["market_step_5000_symbols"] = time_calls(lambda: big_market.step({"event": "rally", "duration": 1}), max(repeat, 100))
+    #what /stocks SYMBOL reads.
+    results["history_tail_10"] = time_calls(lambda: price_history.tail("INK", 10), repeat)
+
+    #what /leaderboard pays now (a page plus the caller's rank) and the per-tick revalue.
+    prices = load_stocks()
+    results["leaderboard_rebuild"] = time_calls(lambda: leaderboards.rebuild(prices), repeat)
+    results["leaderboard_page_and_rank"] = time_calls(
+        lambda: (leaderboards.page("networth", 0, 10), leaderboards.rank("networth", ids[-1])), max(repeat, 100)
+    )
+    results["leaderboard_reprice"] = time_calls(
+        lambda: leaderboards.reprice({stock: price * 1.01 for stock, price in prices.items()}), repeat
+    )
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    loaded = JsonBackend().load_all()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    results["records_memory"] = {"users": len(loaded), "mb": round((after - before) / 2**20, 2)}
+    return results
+
+async def bench_compaction(ids, repeat):
+    from economy import economy
+    rng = random.Random(11)
+    samples = []
+    for _ in range(repeat):
+        #dirty 1% of users the way a busy compaction window would.
+        for user_id in rng.sample(ids, max(1, len(ids) // 100)):
+            economy.adjust(user_id, 1, "bench")
+        started = time.perf_counter()
+        await economy.flush()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+def command_args(name, rng, ids, guild):
+    if name == "roulette":
+        return {"bet": str(rng.randint(1, 500)), "choice": rng.choice(["red", "black", "odd", "even", "1st12", str(rng.randint(0, 36))])}
+    if name == "stockbuy":
+        return {"stock": rng.choice(list(synthetic.STOCKS)), "amount": str(rng.randint(10, 2000))}
+    if name == "stocksell":
+        return {"stock": rng.choice(list(synthetic.STOCKS)), "quantity": str(round(rng.uniform(0.1, 5), 2))}
+    if name == "pay":
+        payee = FakeMember(rng.choice(ids))
+        guild.members[payee.id] = payee
+        return {"user": payee, "amount": rng.randint(1, 1000)}
+    if name == "lotteryticket":
+        return {"numbers": " ".join(str(n) for n in rng.sample(range(1, 61), 5))}
+    if name == "cryptobuy":
+        return {"quantity": 1}
+    #balance, portfolio, stocks, work and daily take no arguments.
+    return {}
+
+async def bench_command_mix(ids, ops, seed):
+    from general import GeneralCog
+    from stocks import StocksCog
+    from crypto import CryptoCog
+    from lottery import LotteryCog, load_lottery_book
+    from roulette import RouletteCog
+    from persistence import flush_all
+
+    guild = FakeGuild()
+    bot = FakeBot(guild)
+    lottery_data, tickets, _ = load_lottery_book()
+    cogs = {
+        "general": quiet_cog(GeneralCog(bot)),
+        "stocks": quiet_cog(StocksCog(bot)),
+        "crypto": quiet_cog(CryptoCog(bot)),
+        "lottery": quiet_cog(LotteryCog(bot, lottery_data, tickets)),
+        "roulette": quiet_cog(RouletteCog(bot)),
+    }
+    commands = {
+        "balance": (cogs["general"], "balance"),
+        "work": (cogs["general"], "work"),
+        "daily": (cogs["general"], "daily"),
+        "pay": (cogs["general"], "pay"),
+        "roulette": (cogs["roulette"], "roulette"),
+        "portfolio": (cogs["stocks"], "portfolio"),
+        "stockbuy": (cogs["stocks"], "stockbuy"),
+        "stocksell": (cogs["stocks"], "sell"),
+        "stocks": (cogs["stocks"], "stocks"),
+        "cryptobuy": (cogs["crypto"], "cryptobuy"),
+        "lotteryticket": (cogs["lottery"], "lotteryticket"),
+    }
+
+    rng = random.Random(seed)
+    names = list(COMMAND_MIX)
+    weights = [COMMAND_MIX[name] for name in names]
+    per_command = {name: [] for name in names}
+    overall = []
+    started_all = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name in rng.choices(names, weights=weights, k=ops):
+            cog, attr = commands[name]
+            user = FakeMember(rng.choice(ids))
+            guild.members[user.id] = user
+            interaction = FakeInteraction(user, guild)
+            kwargs = command_args(name, rng, ids, guild)
+            started = time.perf_counter()
+            await getattr(cog, attr).callback(cog, interaction, **kwargs)
+            elapsed = time.perf_counter() - started
+            per_command[name].append(elapsed)
+            overall.append(elapsed)
+        await flush_all()
+    wall = time.perf_counter() - started_all
+
+    summary = summarize(overall)
+    summary["wall_ops_per_sec"] = round(len(overall) / wall, 2) if wall else None
+    return {
+        "overall": summary,
+        "commands": {name: summarize(samples) for name, samples in per_command.items() if samples},
+    }
+
+async def bench_size(users, workdir, args):
+    ids = synthetic.generate(workdir, users, seed=args.seed, history_days=args.history_days)
+    os.chdir(workdir)
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    #modules are imported here, not at the top, globals.py needs the config.json above.
+    from economy import economy
+    from history import migrate_json_history
+    from leaderboard import leaderboards
+    from prices import price_feed
+    from stocks import load_stocks
+    from mining import mining_network
+    from crypto import join_idle_rigs
+    migrate_json_history()
+    if economy.journal is not None:
+        economy.journal.close()
+    economy.backend = None
+    economy.journal = None
+    economy.load()
+    price_feed.publish(load_stocks())
+    leaderboards.attach(economy, price_feed.current())
+    economy.add_settler(mining_network.settle)
+    await join_idle_rigs()
+
+    print(f"[Bench] {users} users: hot paths...")
+    result = {"hot": bench_hot_paths(ids, args.repeat)}
+    result["hot"]["compaction_1pct_dirty"] = await bench_compaction(ids, args.repeat)
+    print(f"[Bench] {users} users: command mix ({args.ops} ops)...")
+    result["mix"] = await bench_command_mix(ids, args.ops, args.seed)
+    economy.journal.close()
+    return result
+
+def compare(old, new):
+    #prints ops/sec for every metric found in both result files.
+    for size, result in new["sizes"].items():
+        previous = old.get("sizes", {}).get(size)
+        if not previous:
+            continue
+        print(f"\n{size} users")
+        pairs = [(f"hot.{name}", stats, previous["hot"].get(name)) for name, stats in result["hot"].items()]
+        pairs.append(("mix.overall", result["mix"]["overall"], previous["mix"]["overall"]))
+        pairs += [
+            (f"mix.{name}", stats, previous["mix"]["commands"].get(name))
+            for name, stats in result["mix"]["commands"].items()
+        ]
+        for name, stats, before in pairs:
+            if not before or not stats.get("ops_per_sec") or not before.get("ops_per_sec"):
+                continue
+            change = (stats["ops_per_sec"] / before["ops_per_sec"] - 1) * 100
+            print(f"  {name:32} {before['ops_per_sec']:>12.2f} -> {stats['ops_per_sec']:>12.2f} ops/s ({change:+.1f}%)")
+
+async def main(args):
+    out_path = os.path.abspath(args.out)
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    root = args.workdir or tempfile.mkdtemp(prefix="beanbench-")
+    results = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(),
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "ops": args.ops,
+            "history_days": args.history_days,
+        },
+        "sizes": {},
+    }
+    cwd = os.getcwd()
+    try:
+        for users in args.users:
+            results["sizes"][str(users)] = await bench_size(users, os.path.join(root, str(users)), args)
+    finally:
+        os.chdir(cwd)
+        if not args.workdir and not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+    with open(out_path, "w") as f:
+        json.dump(results, f, indent=4)
+    print(f"[Bench] Results written to {out_path}")
+
+    if compare_path:
+        with open(compare_path, "r") as f:
+            compare(json.load(f), results)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the bot's storage and commands on synthetic data.")
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 10000, 100000], help="user counts to benchmark")
+    parser.add_argument("--ops", type=int, default=5000, help="commands in the simulated mix")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each hot function")
+    parser.add_argument("--history-days", type=int, default=30, help="days of stock history to generate")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--out", default="bench_results.json", help="where to write the results")
+    parser.add_argument("--compare", help="older results file to compare against")
+    parser.add_argument("--workdir", help="keep generated data here instead of a temp dir")
+    parser.add_argument("--keep", action="store_true", help="don't delete the temp dir afterwards")
+    asyncio.run(main(parser.parse_args()))
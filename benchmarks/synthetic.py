@@ -0,0 +1,86 @@
+#benchmarks/synthetic.py
+#writes a believable set of bot data files (data.json, stocks.json, stock_history.json,
+#lottery.json) for a given number of users. everything comes from one seeded random so
+#two runs at the same size benchmark the same data.
+import datetime
+import json
+import os
+import random
+
+STOCKS = {
+    "INK": 300.0, "MEN": 85.5, "ACME": 120.0, "BEAN": 42.0,
+    "GOOB": 9.75, "TACO": 61.2, "DRIP": 230.4, "MOON": 15.0,
+    "BEANEDCOIN": 10.0, "INKCOIN": 3.5, "GOOBCOIN": 0.8,
+}
+
+#first snowflake handed out, real discord ids are ~18 digits.
+BASE_USER_ID = 300000000000000000
+
+#one market tick every 20 minutes, like UPDATE_INTERVAL_MINUTES.
+TICK_MINUTES = 20
+
+def user_ids(users):
+    return [BASE_USER_ID + i * 7919 for i in range(users)]
+
+def make_record(rng, now):
+    record = {"balance": rng.randint(0, 250000)}
+    #most members touch the market at some point, a few hold a lot of it.
+    holdings = rng.choices(range(6), weights=[30, 25, 20, 12, 8, 5])[0]
+    if holdings:
+        symbols = rng.sample(list(STOCKS), holdings)
+        record["portfolio"] = {symbol: round(rng.uniform(0.1, 500.0), 4) for symbol in symbols}
+        record["total_spent"] = round(rng.uniform(100, 200000), 2)
+        record["total_earned"] = round(rng.uniform(0, 200000), 2)
+    if rng.random() < 0.15:
+        record["graphics_cards"] = rng.randint(1, 40)
+        if rng.random() < 0.7:
+            record["mining"] = rng.choice([symbol for symbol in STOCKS if symbol.endswith("COIN")])
+    for key, chance, window in (("last_daily", 0.5, 2880), ("last_work", 0.6, 120), ("last_daily_boost", 0.05, 2880)):
+        if rng.random() < chance:
+            record[key] = (now - datetime.timedelta(minutes=rng.randint(0, window))).isoformat()
+    if rng.random() < 0.4:
+        record["vc_time"] = round(rng.uniform(0, 500000), 3)
+        record["vc_timealone"] = round(record["vc_time"] * rng.random() * 0.3, 3)
+        record["vc_afk"] = round(rng.uniform(0, 100000), 3)
+    return record
+
+def make_history(rng, now, days):
+    history = {}
+    ticks = days * 24 * 60 // TICK_MINUTES
+    for symbol, price in STOCKS.items():
+        points = []
+        for tick in range(ticks, 0, -1):
+            price = max(round(price * (1 + rng.uniform(-0.05, 0.05)), 2), 0.01)
+            timestamp = (now - datetime.timedelta(minutes=tick * TICK_MINUTES)).isoformat()
+            points.append({"timestamp": timestamp, "price": price})
+        history[symbol] = points
+    return history
+
+def make_lottery(rng, ids, tickets):
+    return {
+        "Jackpot": 100000 + tickets * 1000,
+        "Tickets": [
+            {"user_id": str(rng.choice(ids)), "numbers": sorted(rng.sample(range(1, 61), 5))}
+            for _ in range(tickets)
+        ],
+    }
+
+def write_json(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=4)
+
+def generate(workdir, users, seed=1234, history_days=30, tickets=None):
+    #returns the user ids so the command mix can pick from them.
+    rng = random.Random(seed)
+    now = datetime.datetime.now()
+    ids = user_ids(users)
+    if tickets is None:
+        tickets = users // 2
+    os.makedirs(workdir, exist_ok=True)
+    write_json(os.path.join(workdir, "data.json"), {str(user_id): make_record(rng, now) for user_id in ids})
+    write_json(os.path.join(workdir, "stocks.json"), dict(STOCKS))
+    write_json(os.path.join(workdir, "stock_history.json"), make_history(rng, now, history_days))
+    write_json(os.path.join(workdir, "lottery.json"), make_lottery(rng, ids, tickets))
+    #globals.py reads this at import time, none of it is used for anything real.
+    write_json(os.path.join(workdir, "config.json"), {"token": "benchmark", "guild_id": "1", "target_member_id": "1"})
+    return ids
@@ -5,7 +5,6 @@ import json
 import random
 import datetime
 from globals import RIOT_IDS, UPDATE_INTERVAL_MINUTES, GUILD_ID
-from utils import load_data, save_data
 from typing import Optional
 import pytz
 import cassiopeia as cass
@@ -4,7 +4,7 @@ from discord.ext import commands
 import random
 import datetime
 import asyncio
-from utils import load_data, save_data
+from economy import economy
 from globals import GUILD_ID
 #constants for cards:
 HEARTS   = chr(9829)  # ♥
@@ -170,14 +170,17 @@ class BlackjackView(discord.ui.View):
             await interaction.response.send_message("You can only double down on your first move (with exactly 2 cards).", ephemeral=True)
             return
 
-        if not hasattr(self.game, 'remaining'):
-            await interaction.response.send_message("Funds information missing.", ephemeral=True)
-            return
-        if self.game.remaining < self.game.bet:
+        #escrow the extra bet the same way the original one was taken.
+        user_id = str(self.game.player.id)
+        async with economy.transaction(user_id) as tx:
+            self.game.remaining = tx.balance(user_id)
+            can_double = self.game.remaining >= self.game.bet
+            if can_double:
+                self.game.remaining = tx.adjust(user_id, -self.game.bet, "blackjack")
+        if not can_double:
             await interaction.response.send_message("You don't have enough funds to double down.", ephemeral=True)
             return
 
-        self.game.remaining -= self.game.bet
         self.game.bet *= 2
         print(f"[Blackjack] Doubling down. New bet: {self.game.bet}. Remaining funds: {self.game.remaining}")
         self.game.player_hand.append(self.game.deck.pop())
@@ -191,31 +194,38 @@ class BlackjackCog(commands.Cog):
     @app_commands.command(name="blackjack", description="Play a round of Blackjack using your Beaned Bucks.")
     @app_commands.describe(bet="The amount of Beaned Bucks you want to bet (can be non-integer)")
     async def blackjack(self, interaction: discord.Interaction, bet: str):
-        data = load_data()
         user_id = str(interaction.user.id)
-        user_record = data.get(user_id, {"balance": 0})
-        balance = float(user_record.get("balance", 0))
 
-        if bet.lower() == "all":
-            bet_val = balance
-        else:
+        bet_val = None
+        if bet.lower() != "all":
             try:
                 bet_val = float(bet)
             except ValueError:
                 await interaction.response.send_message("Invalid bet amount.", ephemeral=True)
                 return
 
-        if bet_val <= 0:
-            await interaction.response.send_message("Bet must be greater than 0.", ephemeral=True)
-            return
-        if bet_val > balance:
-            await interaction.response.send_message("You don't have enough Beaned Bucks to make that bet.", ephemeral=True)
+        #take the bet up front. the game itself runs without holding the lock, so
+        #/work, /pay or mining can keep changing the balance while it's being played.
+        error = None
+        async with economy.transaction(user_id) as tx:
+            balance = float(tx.balance(user_id))
+            if bet_val is None:
+                bet_val = balance
+            if bet_val <= 0:
+                error = "Bet must be greater than 0."
+            elif bet_val > balance:
+                error = "You don't have enough Beaned Bucks to make that bet."
+            else:
+                remaining = tx.adjust(user_id, -bet_val, "blackjack")
+
+        if error:
+            await interaction.response.send_message(error, ephemeral=True)
             return
 
         #create the game and set up starting funds.
         game = BlackjackGame(interaction.user, bet_val)
         game.start_balance = balance
-        game.remaining = balance - bet_val
+        game.remaining = remaining
 
         #check for immediate blackjack.
         if is_blackjack(game.player_hand):
@@ -228,14 +238,11 @@ class BlackjackCog(commands.Cog):
             outcome_text = f"Blackjack! You win {game.bet} Beaned Bucks!" if game.result == "win" else "Both you and the dealer got blackjack. It's a tie!"
             content += "\n\n" + outcome_text
             await interaction.response.send_message(content=content, ephemeral=False)
-            if game.result == "win":
-                user_record["balance"] = balance + game.bet
-            else:
-                user_record["balance"] = balance
-            data[user_id] = user_record
-            save_data(data)
+            #hand back the escrowed bet, plus the 3:2 winnings on a win.
+            async with economy.transaction(user_id) as tx:
+                tx.adjust(user_id, bet_val + (game.bet if game.result == "win" else 0), "blackjack")
             try:
-                await interaction.followup.send(f"Your new balance is {user_record['balance']} Beaned Bucks.", ephemeral=False)
+                await interaction.followup.send(f"Your new balance is {economy.get(user_id).balance} Beaned Bucks.", ephemeral=False)
             except Exception as e:
                 print(f"Error sending followup message: {e}")
             return
@@ -245,18 +252,20 @@ class BlackjackCog(commands.Cog):
         await interaction.response.send_message(content=content, view=view, ephemeral=False)
         await view.wait()
 
-        if game.result == "win":
-            user_record["balance"] = balance + game.bet
-        elif game.result == "lose":
-            user_record["balance"] = balance - game.bet
-        elif game.result == "tie":
-            user_record["balance"] = balance
-        else:
-            print("Game result not set. No balance change.")
-        data[user_id] = user_record
-        save_data(data)
+        #the bet (doubled or not) is already escrowed, so a win pays it back twice,
+        #a tie returns it and a loss keeps it.
+        async with economy.transaction(user_id) as tx:
+            if game.result == "win":
+                tx.adjust(user_id, game.bet * 2, "blackjack")
+            elif game.result == "lose":
+                pass
+            elif game.result == "tie":
+                tx.adjust(user_id, game.bet, "blackjack")
+            else:
+                print("Game result not set. Returning the bet.")
+                tx.adjust(user_id, game.bet, "blackjack")
         try:
-            await interaction.followup.send(f"Your new balance is {user_record['balance']} Beaned Bucks.", ephemeral=False)
+            await interaction.followup.send(f"Your new balance is {economy.get(user_id).balance} Beaned Bucks.", ephemeral=False)
         except Exception as e:
             print(f"Error sending followup message: {e}")
 
@@ -11,7 +11,11 @@ import datetime
 from zoneinfo import ZoneInfo
 from globals import TOKEN, GUILD_ID, TARGET_MEMBER_ID, TARGET_USER_ID, DATA_FILE, ALLOWED_ROLES, STOCK_FILE, STOCK_HISTORY_FILE, UPDATE_INTERVAL_MINUTES, LOTTERY_FILE, AFK_CHANNEL_ID
 from stocks import load_stocks
-from utils import save_data, load_data
+from prices import price_feed
+from economy import economy
+from persistence import run_io, flush_all, flush_metrics
+from leaderboard import leaderboards, PAGE_SIZE
+from scheduler import scheduler
 
 #keys are user IDs (as strings), values are dicts with session data. tracks active VCs
 active_vc_sessions = {}
@@ -97,17 +101,13 @@ async def on_voice_state_update(member, before, after):
             alone_time = session["alone_accumulated"]
             if session["last_alone_update"]:
                 alone_time += now - session["last_alone_update"]
-            data = load_data()
             #if session was AFK, update "vc_afk"; else update normal VC times.
-            if session.get("afk"):
-                record = data.get(uid, {"vc_afk": 0})
-                record["vc_afk"] = record.get("vc_afk", 0) + session_duration.total_seconds()
-            else:
-                record = data.get(uid, {"vc_time": 0, "vc_timealone": 0})
-                record["vc_time"] = record.get("vc_time", 0) + session_duration.total_seconds()
-                record["vc_timealone"] = record.get("vc_timealone", 0) + alone_time.total_seconds()
-            data[uid] = record
-            save_data(data)
+            async with economy.transaction(uid) as tx:
+                if session.get("afk"):
+                    tx.adjust(uid, session_duration.total_seconds(), "vc", field="vc_afk")
+                else:
+                    tx.adjust(uid, session_duration.total_seconds(), "vc", field="vc_time")
+                    tx.adjust(uid, alone_time.total_seconds(), "vc", field="vc_timealone")
     #if a user switches voice channels:
     elif before.channel is not None and after.channel is not None:
         #end the old session.
@@ -117,17 +117,13 @@ async def on_voice_state_update(member, before, after):
             alone_time = session["alone_accumulated"]
             if session["last_alone_update"]:
                 alone_time += now - session["last_alone_update"]
-            data = load_data()
             #update the appropriate field based on whether it was AFK.
-            if session.get("afk"):
-                record = data.get(uid, {"vc_afk": 0})
-                record["vc_afk"] = record.get("vc_afk", 0) + session_duration.total_seconds()
-            else:
-                record = data.get(uid, {"vc_time": 0, "vc_timealone": 0})
-                record["vc_time"] = record.get("vc_time", 0) + session_duration.total_seconds()
-                record["vc_timealone"] = record.get("vc_timealone", 0) + alone_time.total_seconds()
-            data[uid] = record
-            save_data(data)
+            async with economy.transaction(uid) as tx:
+                if session.get("afk"):
+                    tx.adjust(uid, session_duration.total_seconds(), "vc", field="vc_afk")
+                else:
+                    tx.adjust(uid, session_duration.total_seconds(), "vc", field="vc_time")
+                    tx.adjust(uid, alone_time.total_seconds(), "vc", field="vc_timealone")
         #start a new session for the new channel.
         channel = after.channel
         members = non_bot_members(channel)
@@ -196,58 +192,50 @@ async def leavenotification(interaction: discord.Interaction):
     description="View the leaderboard. Categories: networth, time, timealone, or timeafk.",
     guild=discord.Object(id=GUILD_ID)
 )
-@app_commands.describe(category="Choose a category: networth, time, timealone, or timeafk")
-async def leaderboard(interaction: discord.Interaction, category: str):
+@app_commands.describe(
+    category="Choose a category: networth, time, timealone, or timeafk",
+    page="Optional: Page to show, 10 users per page"
+)
+async def leaderboard(interaction: discord.Interaction, category: str, page: Optional[int] = 1):
     category = category.lower()
-    data = load_data()
-    leaderboard_list = []
-
-    if category == "networth":
-        stock_prices = load_stocks()
-        for user_id, record in data.items():
-            balance = record.get("balance", 0)
-            portfolio = record.get("portfolio", {})
-            portfolio_value = sum(stock_prices.get(stock, 0) * shares for stock, shares in portfolio.items())
-            networth = balance + portfolio_value + (record.get("graphics_cards", 0) * 10000)
-            leaderboard_list.append((user_id, networth))
-        title = "Net Worth Leaderboard"
-    elif category == "time":
-        #only include non-AFK voice channel time.
-        for user_id, record in data.items():
-            vc_time = record.get("vc_time", 0)
-            leaderboard_list.append((user_id, vc_time))
-        title = "Voice Channel Time Leaderboard (Non-AFK)"
-    elif category == "timealone":
-        #only include non-AFK alone time.
-        for user_id, record in data.items():
-            vc_timealone = record.get("vc_timealone", 0)
-            leaderboard_list.append((user_id, vc_timealone))
-        title = "Voice Channel Alone Time Leaderboard (Non-AFK)"
-    elif category == "timeafk":
+    titles = {
+        "networth": "Net Worth Leaderboard",
+        #only non-AFK voice channel time.
+        "time": "Voice Channel Time Leaderboard (Non-AFK)",
+        #only non-AFK alone time.
+        "timealone": "Voice Channel Alone Time Leaderboard (Non-AFK)",
         #this one shows AFK time.
-        for user_id, record in data.items():
-            vc_afk = record.get("vc_afk", 0)
-            leaderboard_list.append((user_id, vc_afk))
-        title = "AFK Time Leaderboard"
-    else:
+        "timeafk": "AFK Time Leaderboard",
+    }
+    if category not in titles:
         await interaction.response.send_message("Invalid category. Please choose networth, time, timealone, or timeafk.", ephemeral=True)
         return
 
-    leaderboard_list.sort(key=lambda x: x[1], reverse=True)
-    embed = discord.Embed(title=title, color=discord.Color.gold())
-    count = 0
-    for user_id, value in leaderboard_list[:10]:
-        count += 1
+    total = leaderboards.size(category)
+    pages = max(1, -(-total // PAGE_SIZE))
+    if page is None or page < 1 or page > pages:
+        await interaction.response.send_message(f"Invalid page. There are {pages} page(s).", ephemeral=True)
+        return
+
+    def format_value(value):
+        if category == "networth":
+            return f"{value:.2f} Beaned Bucks"
+        hrs = value // 3600
+        mins = (value % 3600) // 60
+        secs = value % 60
+        return f"{int(hrs)}h {int(mins)}m {int(secs)}s"
+
+    start = (page - 1) * PAGE_SIZE
+    embed = discord.Embed(title=titles[category], color=discord.Color.gold())
+    for count, (user_id, value) in enumerate(leaderboards.page(category, start, PAGE_SIZE), start=start + 1):
         member = interaction.guild.get_member(int(user_id))
         name = member.display_name if member else f"User {user_id}"
-        if category == "networth":
-            display_value = f"{value:.2f} Beaned Bucks"
-        else:
-            hrs = value // 3600
-            mins = (value % 3600) // 60
-            secs = value % 60
-            display_value = f"{int(hrs)}h {int(mins)}m {int(secs)}s"
-        embed.add_field(name=f"{count}. {name}", value=display_value, inline=False)
+        embed.add_field(name=f"{count}. {name}", value=format_value(value), inline=False)
+    footer = f"Page {page}/{pages}"
+    rank = leaderboards.rank(category, interaction.user.id)
+    if rank is not None:
+        footer += f" | You are #{rank} of {total}"
+    embed.set_footer(text=footer)
     await interaction.response.send_message(embed=embed)
 
 @bot.tree.command(
@@ -260,9 +248,10 @@ async def exit(interaction: discord.Interaction):
     if not any(role.name.lower() == "horrible person" for role in interaction.user.roles):
         await interaction.response.send_message("You do not have permission to use this command.", ephemeral=True)
         return
+    #answered first, the flushes below can take longer than discord waits for a response.
+    await interaction.response.send_message("Shutting down the bot and updating VC trackers...", ephemeral=True)
 
     now = datetime.datetime.now()
-    data = load_data()
     #process all active VC sessions.
     for uid, session in list(active_vc_sessions.items()):
         session_duration = now - session["join_time"]
@@ -271,21 +260,68 @@ async def exit(interaction: discord.Interaction):
             alone_time += now - session["last_alone_update"]
         
         #check if this session is AFK
-        if session.get("afk"):
-            record = data.get(uid, {"vc_afk": 0})
-            record["vc_afk"] = record.get("vc_afk", 0) + session_duration.total_seconds()
-        else:
-            record = data.get(uid, {"vc_time": 0, "vc_timealone": 0})
-            record["vc_time"] = record.get("vc_time", 0) + session_duration.total_seconds()
-            record["vc_timealone"] = record.get("vc_timealone", 0) + alone_time.total_seconds()
+        async with economy.transaction(uid) as tx:
+            if session.get("afk"):
+                tx.adjust(uid, session_duration.total_seconds(), "vc", field="vc_afk")
+            else:
+                tx.adjust(uid, session_duration.total_seconds(), "vc", field="vc_time")
+                tx.adjust(uid, alone_time.total_seconds(), "vc", field="vc_timealone")
         
-        data[uid] = record
         del active_vc_sessions[uid]
 
-    save_data(data)
-    await interaction.response.send_message("Shutting down the bot and updating VC trackers...", ephemeral=True)
+    #no more market ticks or draws (one already running finishes), write out anything
+    #still waiting in a flush window, then fold the journal into a fresh snapshot and
+    #close it and the storage backend.
+    await scheduler.stop()
+    await flush_all()
+    await economy.close()
     await bot.close()
 
+@bot.tree.command(
+    name="flushstats",
+    description="Show how far behind the debounced saves are. (Restricted to users with the 'horrible person' role.)",
+    guild=discord.Object(id=GUILD_ID)
+)
+async def flushstats(interaction: discord.Interaction):
+    if not any(role.name.lower() == "horrible person" for role in interaction.user.roles):
+        await interaction.response.send_message("You do not have permission to use this command.", ephemeral=True)
+        return
+    embed = discord.Embed(title="Flush Stats", color=discord.Color.blue())
+    for name, stats in flush_metrics().items():
+        embed.add_field(
+            name=name,
+            value=(
+                f"Requests: {stats['requests']} | Writes: {stats['writes']} | Failures: {stats['failures']}\n"
+                f"Last lag: {stats['last_lag_ms']} ms | Max lag: {stats['max_lag_ms']} ms\n"
+                f"Pending: {'yes' if stats['pending'] else 'no'}"
+            ),
+            inline=False
+        )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+@bot.tree.command(
+    name="schedulestats",
+    description="Show how the market and lottery jobs are running. (Restricted to users with the 'horrible person' role.)",
+    guild=discord.Object(id=GUILD_ID)
+)
+async def schedulestats(interaction: discord.Interaction):
+    if not any(role.name.lower() == "horrible person" for role in interaction.user.roles):
+        await interaction.response.send_message("You do not have permission to use this command.", ephemeral=True)
+        return
+    embed = discord.Embed(title="Schedule Stats", color=discord.Color.blue())
+    for name, stats in scheduler.metrics().items():
+        next_run = f"<t:{int(stats['next_run'])}:R>" if stats["next_run"] else "not scheduled"
+        embed.add_field(
+            name=name,
+            value=(
+                f"Runs: {stats['runs']} in {stats['calls']} calls | Caught up: {stats['caught_up']} | Skipped: {stats['skipped']} | Failures: {stats['failures']}\n"
+                f"Last: {stats['last_ms']} ms | Mean: {stats['mean_ms']} ms | Max: {stats['max_ms']} ms | Started {stats['last_delay_s']} s late\n"
+                f"Next run: {next_run}"
+            ),
+            inline=False
+        )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
 #onready event
 @bot.event
 async def on_ready():
@@ -296,11 +332,19 @@ async def on_ready():
     await bot.load_extension("general")
     await bot.load_extension("help")
     await bot.load_extension("stocks")
+    await bot.load_extension("orders")
+    await bot.load_extension("margin")
     await bot.load_extension("blackjack")
     await bot.load_extension("lottery")
     await bot.load_extension("roulette")
     await bot.load_extension("crypto")
     await bot.load_extension("bet")
+    #compaction starts once every cog has added its books and replayed the journal.
+    economy.start()
+    #open orders are loaded now, their escrow counts toward networth.
+    leaderboards.rebuild(price_feed.current())
+    #market ticks and lottery draws, anything missed while the bot was down runs now.
+    await scheduler.start()
     
     try:
         synced = await bot.tree.sync(guild=discord.Object(id=GUILD_ID))
@@ -311,4 +355,12 @@ async def on_ready():
 
 
 
-bot.run(TOKEN)
+#chart workers import this file again as __mp_main__, only a real start loads data and runs.
+if __name__ == "__main__":
+    #load data.json once, every cog works out of memory from here on.
+    economy.load()
+    #prices are read from stocks.json this once, after that the market tick publishes them.
+    price_feed.publish(load_stocks())
+    #leaderboards are built once here and kept current by the store and the market tick.
+    leaderboards.attach(economy, price_feed.current())
+    bot.run(TOKEN)
@@ -0,0 +1,194 @@
+#charts.py
+#png price charts for /stocks. matplotlib runs in a separate process so a render never
+#holds up the event loop, and every image is cached under (symbol, range, version) where
+#the version is the time of the symbol's last tick. asking again before the next tick is
+#a dict lookup, older versions just age out of the lru.
+#
+#cached pngs live in memory and in CHART_CACHE_DIR, each side has its own byte budget
+#and drops the least recently used charts first.
+#    png = await chart_cache.get(symbol, "week", version, load_series)
+import asyncio
+import collections
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from globals import CHART_CACHE_DIR
+from persistence import run_io
+
+CHART_WORKERS = 1
+MEMORY_BUDGET = 16 * 1024 * 1024
+DISK_BUDGET = 64 * 1024 * 1024
+
+def render_chart(title, times, closes, lows=None, highs=None, volumes=None):
+    #runs in the chart process, returns png bytes. times are epoch seconds.
+    import datetime
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.dates as mdates
+    import matplotlib.pyplot as plt
+
+    dates = [datetime.datetime.fromtimestamp(timestamp) for timestamp in times]
+    show_volume = bool(volumes) and any(volumes)
+    if show_volume:
+        fig, (ax, volume_ax) = plt.subplots(2, 1, figsize=(8, 4.5), dpi=100, sharex=True, gridspec_kw={"height_ratios": [3, 1]})
+    else:
+        fig, ax = plt.subplots(figsize=(8, 4), dpi=100)
+    try:
+        up = closes[-1] >= closes[0]
+        color = "#2ecc71" if up else "#e74c3c"
+        ax.plot(dates, closes, color=color, linewidth=1.6)
+        if lows and highs:
+            ax.fill_between(dates, lows, highs, color=color, alpha=0.15, linewidth=0)
+        ax.set_title(title)
+        ax.set_ylabel("Beaned Bucks")
+        ax.grid(True, alpha=0.3)
+        if show_volume:
+            volume_ax.bar(dates, volumes, color="#7f8c8d", width=0.8 * (dates[1] - dates[0]) if len(dates) > 1 else 0.02)
+            volume_ax.set_ylabel("Volume")
+            volume_ax.grid(True, alpha=0.3)
+        (volume_ax if show_volume else ax).xaxis.set_major_formatter(mdates.ConciseDateFormatter(mdates.AutoDateLocator()))
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png")
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+class ChartCache:
+    def __init__(self, directory=CHART_CACHE_DIR, memory_budget=MEMORY_BUDGET, disk_budget=DISK_BUDGET):
+        self.directory = directory
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        #key -> png bytes, oldest first
+        self.memory = collections.OrderedDict()
+        self.memory_bytes = 0
+        #file name -> size, oldest first, filled from the directory on first use
+        self.disk = None
+        self.disk_bytes = 0
+        #key -> future, so a burst of the same request renders once
+        self.pending = {}
+        self.executor = None
+        self.hits = 0
+        self.misses = 0
+
+    def _filename(self, key):
+        symbol, range_name, version = key
+        return f"{symbol}-{range_name}-{int(version)}.png"
+
+    def _scan_disk(self):
+        #rebuilds the disk lru from file mtimes, oldest first.
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".png"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, name, stat.st_size))
+        entries.sort()
+        return collections.OrderedDict((name, size) for _, name, size in entries)
+
+    def _read_disk(self, name):
+        path = os.path.join(self.directory, name)
+        with open(path, "rb") as f:
+            data = f.read()
+        #touch it so the lru order survives a restart.
+        os.utime(path)
+        return data
+
+    def _write_disk(self, name, data, evict):
+        path = os.path.join(self.directory, name)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+        for old in evict:
+            try:
+                os.remove(os.path.join(self.directory, old))
+            except FileNotFoundError:
+                pass
+
+    def _remember(self, key, data):
+        self.memory[key] = data
+        self.memory.move_to_end(key)
+        self.memory_bytes += len(data)
+        while self.memory_bytes > self.memory_budget and len(self.memory) > 1:
+            _, old = self.memory.popitem(last=False)
+            self.memory_bytes -= len(old)
+
+    async def _store_disk(self, name, data):
+        self.disk[name] = len(data)
+        self.disk_bytes += len(data)
+        evict = []
+        while self.disk_bytes > self.disk_budget and len(self.disk) > 1:
+            old, size = self.disk.popitem(last=False)
+            self.disk_bytes -= size
+            evict.append(old)
+        await run_io(self._write_disk, name, data, evict)
+
+    async def _render(self, loop, series):
+        if self.executor is None:
+            #not fork, the bot already runs io threads and a forked child can inherit a lock
+            #one of them held. forkserver starts workers from a clean process with charts
+            #preloaded, bot.py keeps its startup under a main guard for the __mp_main__ import.
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["charts"])
+            self.executor = ProcessPoolExecutor(max_workers=CHART_WORKERS, mp_context=context)
+        return await loop.run_in_executor(self.executor, _render_series, series)
+
+    async def get(self, symbol, range_name, version, load_series):
+        #png for the chart, load_series() (run on the io pool) is only called on a miss
+        #and returns render_chart kwargs, or None if there's nothing to draw.
+        key = (symbol, range_name, version)
+        data = self.memory.get(key)
+        if data is not None:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return data
+        if key in self.pending:
+            return await asyncio.shield(self.pending[key])
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending[key] = future
+        try:
+            if self.disk is None:
+                self.disk = await run_io(self._scan_disk)
+                self.disk_bytes = sum(self.disk.values())
+            name = self._filename(key)
+            if name in self.disk:
+                self.hits += 1
+                self.disk.move_to_end(name)
+                data = await run_io(self._read_disk, name)
+            else:
+                self.misses += 1
+                series = await run_io(load_series)
+                if series is None:
+                    data = None
+                else:
+                    data = await self._render(loop, series)
+                    await self._store_disk(name, data)
+            if data is not None:
+                self._remember(key, data)
+            future.set_result(data)
+            return data
+        except Exception as e:
+            future.set_exception(e)
+            #nobody else may be waiting, don't let the future complain about it.
+            future.exception()
+            raise
+        finally:
+            #cancelled (or anything else that isn't an Exception) before an answer,
+            #waiters shielded on the future must not wait for one forever.
+            if not future.done():
+                future.cancel()
+            del self.pending[key]
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+def _render_series(series):
+    return render_chart(**series)
+
+#the one chart cache every cog shares
+chart_cache = ChartCache()
@@ -5,43 +5,32 @@ import json
 import os
 import random
 import datetime
+import time
 from zoneinfo import ZoneInfo
 from globals import STOCK_FILE, GUILD_ID
-from stocks import load_stocks
-from utils import load_data, save_data
+from prices import price_feed
+from economy import economy
+from persistence import run_io
+from mining import mining_network, load_mining, MINING_PERIOD_SECONDS
+from media import rig_image, load_media_cache, make_thumbnail
 from typing import Optional
 import pytz
 
 class CryptoCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.mine_loop = tasks.loop(minutes=5)(self.execute_mine)
-        self.mine_loop.start()
-
-    async def execute_mine(self):
-        data = load_data()
-        for user_id in data:
-            user_record = data.get(user_id, {"graphics_cards": 0, "mining": None, "portfolio": {}})
-            if user_record.get("mining") and user_record.get("graphics_cards"):
-                curr_mining = user_record.get("mining")
-                num_cards = user_record.get("graphics_cards")
-                portfolio = user_record.get("portfolio", {})
-                
-                portfolio[curr_mining] = portfolio.get(curr_mining, 0) + num_cards
-                user_record["portfolio"] = portfolio
-                data[user_id] = user_record
-        save_data(data)
-    
+
     @app_commands.guilds(discord.Object(id=GUILD_ID))
     @app_commands.command(name="crypto", description="Shows how many RTX 5090s owned and what is currently being mined.")
     @app_commands.describe(user="The user to check crypto statistics for (defaults to yourself if not provided).")
     async def crypto(self, interaction: discord.Interaction, user: Optional[discord.Member] = None):
         target = user or interaction.user
-        data = load_data()
         user_id = str(target.id)
-        user_record = data.get(user_id, {"graphics_cards": 0, "mining": None})
-        num_cards = user_record.get("graphics_cards", 0)
-        curr_mining = user_record.get("mining", None)
+        #reading through a transaction pays out whatever the rig mined since last time.
+        async with economy.transaction(user_id) as tx:
+            user_record = tx.get(user_id)
+        num_cards = user_record.graphics_cards
+        curr_mining = user_record.mining
 
         if not curr_mining:
             curr_mining = "Not mining..."
@@ -50,8 +39,14 @@ class CryptoCog(commands.Cog):
             title=f"{target}'s Crypto Mining Rig",
             color=discord.Color.green()
         )
-        image = discord.File("RTX5090.jpg", filename="RTX5090.jpg")
-        embed.set_image(url="attachment://RTX5090.jpg")
+        #the photo is uploaded once and linked from the CDN after that.
+        image_url = await rig_image.url(self.bot)
+        image = None
+        if image_url is None:
+            image = rig_image.file("RTX5090.jpg")
+            embed.set_image(url="attachment://RTX5090.jpg")
+        else:
+            embed.set_image(url=image_url)
         embed.add_field(
             name="Graphics Cards Owned",
             value=f"{num_cards}",
@@ -62,16 +57,32 @@ class CryptoCog(commands.Cog):
             value=f"{curr_mining}",
             inline=True
         )
+        if mining_network.active(user_record):
+            coin = user_record.mining
+            difficulty = mining_network.difficulty(coin)
+            embed.add_field(
+                name="Network",
+                value=(
+                    f"{mining_network.coins[coin]['hashrate']} cards mining {coin}, difficulty {round(difficulty, 2)}\n"
+                    f"Your rig makes {round(num_cards / difficulty, 4)} {coin} every {MINING_PERIOD_SECONDS // 60} minutes\n"
+                    f"Unpaid: {round(mining_network.pending(user_record, time.time()), 4)} {coin}"
+                ),
+                inline=False
+            )
+        if image is None:
+            await interaction.response.send_message(embed=embed)
+            return
         await interaction.response.send_message(embed=embed, file=image)
+        try:
+            await rig_image.remember(await interaction.original_response())
+        except discord.HTTPException as e:
+            print(f"Failed to cache the rig image url: {e}")
 
     @app_commands.guilds(discord.Object(id=GUILD_ID))
     @app_commands.command(name="cryptobuy", description="Buy RTX 5090s using your Beaned Bucks. Each card is $10,000")
     @app_commands.describe(quantity="Number of cards to purchase")
     async def cryptobuy(self, interaction: discord.Interaction, quantity: int):
-        data = load_data()
         user_id = str(interaction.user.id)
-        user_record = data.get(user_id, {"balance": 0, "graphics_cards": 0})
-        current_balance = float(user_record.get("balance", 0))
 
         try:
             num_cards = int(quantity)
@@ -82,78 +93,85 @@ class CryptoCog(commands.Cog):
         if num_cards <= 0:
             await interaction.response.send_message("Number of cards must be greater than 0.", ephemeral=True)
             return
-        if (num_cards * 10000) > current_balance:
+
+        async with economy.transaction(user_id) as tx:
+            user_record = tx.get(user_id)
+            current_balance = float(user_record.balance)
+            can_afford = (num_cards * 10000) <= current_balance
+            if can_afford:
+                user_record.balance = current_balance - (num_cards * 10000)
+                #pays the rig for its old card count before the network sees the new one.
+                mining_network.change_cards(user_record, num_cards, time.time())
+                total_cards = user_record.graphics_cards
+
+                tx.put(user_id, user_record, "cryptobuy")
+                new_balance = user_record.balance
+
+        if not can_afford:
             await interaction.response.send_message(f"You do not have enough Beaned Bucks to buy {num_cards} cards.", ephemeral=True)
             return
-        
-        user_record["balance"] = current_balance - (num_cards * 10000)
-        total_cards = user_record.get("graphics_cards", 0) + num_cards
-        user_record["graphics_cards"] = total_cards
-
-        data[user_id] = user_record
-        save_data(data)
 
         await interaction.response.send_message(
             f"Successfully purchased {num_cards} RTX 5090s.\n"
             f"You now own {total_cards} graphics cards.\n"
-            f"Your new balance is {user_record['balance']} Beaned Bucks."
+            f"Your new balance is {new_balance} Beaned Bucks."
         )
 
     @app_commands.guilds(discord.Object(id=GUILD_ID))
     @app_commands.command(name="cryptosell", description="Sell your RTX 5090s for $5,000 Beaned Bucks. Don't complain, they've been used to mine crypto.")
     @app_commands.describe(quantity="The number of graphics cards you want to sell.")
     async def cryptosell(self, interaction: discord.Interaction, quantity: int):
-        data = load_data()
         user_id = str(interaction.user.id)
-        user_record = data.get(user_id, {"balance": 0, "graphics_cards": 0})
-        owned_cards = user_record.get("graphics_cards", 0)
 
-        if not owned_cards:
-            await interaction.response.send_message("You do not own any RTX 5090s.", ephemeral=True)
-            return
-        
         try:
             num_sell = int(quantity)
         except Exception as e:
             await interaction.response.send_message("You cannot sell fractional graphics cards!", ephemeral=True)
             return
-        
-        if num_sell <= 0:
-            await interaction.response.send_message("Quantity must be greater than zero.", ephemeral=True)
-            return
-        if owned_cards < num_sell:
-            await interaction.response.send_message("You cannot sell more graphics cards than you own.", ephemeral=True)
-            return
-        
-        sale_value = num_sell * 5000
 
-        user_record["balance"] += float(sale_value)
-        user_record["graphics_cards"] -= num_sell
+        error = None
+        async with economy.transaction(user_id) as tx:
+            user_record = tx.get(user_id)
+            owned_cards = user_record.graphics_cards
+
+            if not owned_cards:
+                error = "You do not own any RTX 5090s."
+            elif num_sell <= 0:
+                error = "Quantity must be greater than zero."
+            elif owned_cards < num_sell:
+                error = "You cannot sell more graphics cards than you own."
+            else:
+                sale_value = num_sell * 5000
 
-        data[user_id] = user_record
-        save_data(data)
+                user_record.balance += float(sale_value)
+                mining_network.change_cards(user_record, -num_sell, time.time())
+
+                tx.put(user_id, user_record, "cryptosell")
+                new_balance = user_record.balance
+
+        if error:
+            await interaction.response.send_message(error, ephemeral=True)
+            return
 
         await interaction.response.send_message(
             f"Successfully sold {num_sell} RTX 5090s for $5,000 Beaned Bucks each for a total of {sale_value} Beaned Bucks.\n"
-            f"Your new balance is {user_record['balance']} Beaned Bucks."
+            f"Your new balance is {new_balance} Beaned Bucks."
         )
 
     @app_commands.guilds(discord.Object(id=GUILD_ID))
-    @app_commands.command(name="mine", description="Decide what crypto you'd like to mine. You will gain 1 coin/card every 5 minutes.")
+    @app_commands.command(name="mine", description="Decide what crypto you'd like to mine. Each card makes up to 1 coin every 5 minutes.")
     @app_commands.describe(crypto="The cryptocoin that you'd like to mine ('stop' to stop mining).")
     async def mine(self, interaction: discord.Interaction, crypto: str):
-        data = load_data()
         user_id = str(interaction.user.id)
-        user_record = data.get(user_id, {"balance": 0, "graphics_cards": 0, "mining": None})
-        owned_cards = user_record.get("graphics_cards")
 
-        crypto_data = load_stocks()
+        crypto_data = price_feed.current()
         crypto = crypto.upper()
 
         if crypto == "STOP":
-            user_record["mining"] = None
-            data[user_id] = user_record
-            save_data(data)
+            async with economy.transaction(user_id) as tx:
+                user_record = tx.get(user_id)
+                mining_network.stop(user_record, time.time())
+                tx.put(user_id, user_record, "mine")
             await interaction.response.send_message(
             f"You are no longer mining\n", ephemeral=True)
             return
@@ -165,17 +183,49 @@ class CryptoCog(commands.Cog):
             await interaction.response.send_message("Invalid crypto symbol.", ephemeral=True)
             return
 
+        async with economy.transaction(user_id) as tx:
+            user_record = tx.get(user_id)
+            owned_cards = user_record.graphics_cards
+            if owned_cards:
+                mining_network.start(user_record, crypto, time.time())
+                tx.put(user_id, user_record, "mine")
+
         if not owned_cards:
             await interaction.response.send_message("You do not own any RTX 5090s.", ephemeral=True)
             return
-        
-        user_record["mining"] = crypto
-        data[user_id] = user_record
-        save_data(data)
 
         await interaction.response.send_message(
             f"You are now mining {crypto}\n", ephemeral=True)
                 
+async def join_idle_rigs():
+    #rigs from before the mining network existed join it once. a rig still carrying the
+    #old mining_since clock is paid its full periods at the old flat rate first.
+    idle = [user_id for user_id, user_record in economy.items() if user_record.mining and user_record.mining_index is None]
+    for user_id in idle:
+        async with economy.transaction(user_id) as tx:
+            user_record = tx.get(user_id)
+            if not user_record.mining or user_record.mining_index is not None:
+                continue
+            now = time.time()
+            since = (user_record.extra or {}).pop("mining_since", None)
+            if since is not None and user_record.graphics_cards:
+                periods = int((now - since) // MINING_PERIOD_SECONDS)
+                if periods > 0:
+                    user_record.add_shares(user_record.mining, periods * user_record.graphics_cards)
+            mining_network.start(user_record, user_record.mining, now)
+            tx.put(user_id, user_record, "mining network")
+    return len(idle)
+
 async def setup(bot: commands.Bot):
     print("Loading CryptoCog...")
+    rig_image.load(await run_io(load_media_cache))
+    await run_io(make_thumbnail, rig_image.path, rig_image.thumbnail_path)
+    mining_network.load(await run_io(load_mining))
+    drifted = mining_network.reconcile(economy)
+    if drifted:
+        print(f"[Crypto] Recounted the hash rate for {', '.join(drifted)}.")
+    economy.add_settler(mining_network.settle)
+    joined = await join_idle_rigs()
+    if joined:
+        print(f"[Crypto] {joined} rig(s) joined the mining network.")
     await bot.add_cog(CryptoCog(bot))
\ No newline at end of file
@@ -0,0 +1,320 @@
+#economy.py
+#process-wide store for user data. everything is loaded from the storage backend
+#(data.json or sqlite, see storage.py) once at startup and every cog reads/writes user
+#records from memory. each change is appended to the journal (journal.py) right away
+#and the compactor folds the journal into a fresh snapshot in the background.
+#
+#anything that reads a record and writes it back has to do it inside a transaction:
+#    async with economy.transaction([payer_id, payee_id]) as tx:
+#        if tx.get(payer_id).balance >= amount: ...
+#which holds a per-user lock, so different users never wait on each other and the same
+#user only waits for the short read-modify-write, never for a whole game.
+#
+#records are UserRecord objects (records.py) keyed by integer user id, string ids from
+#discord objects are accepted everywhere and converted.
+#
+#state that accrues with time (mining) isn't swept in the background. settlers bring a
+#record up to date the first time a transaction reads it, so every read-modify-write
+#sees settled numbers.
+#
+#books are state kept outside the records that money pays for (open orders, lottery
+#tickets). their changes ride along as effects on the same journal event as the money:
+#    tx.adjust(user_id, -cost, "lottery ticket", effects=[{"book": "lottery", ...}])
+#applies the effect through the book's apply() and journals both in one line. a book
+#saves checkpoints tagged with a journal seq and replays the effects after it on load.
+import asyncio
+import contextlib
+import os
+import time
+from discord.ext import tasks
+from storage import get_backend
+from journal import Journal, apply_event
+from records import UserRecord
+from persistence import run_io, FlushScheduler
+
+#appends within this window share one journal fsync.
+JOURNAL_SYNC_WINDOW_SECONDS = 0.25
+#how often the journal is folded into the storage snapshot.
+COMPACT_INTERVAL_SECONDS = 300
+
+class Transaction:
+    #view of the store limited to the users whose locks are held.
+    def __init__(self, store, user_ids):
+        self.store = store
+        self.user_ids = set(user_ids)
+        self.settled = set()
+
+    def _check(self, user_id):
+        user_id = int(user_id)
+        if user_id not in self.user_ids:
+            raise KeyError(f"User {user_id} is not locked by this transaction.")
+        return user_id
+
+    def get(self, user_id):
+        user_id = self._check(user_id)
+        if user_id not in self.settled:
+            self.settled.add(user_id)
+            self.store.settle(user_id)
+        return self.store.get(user_id)
+
+    def balance(self, user_id):
+        return self.store.get(self._check(user_id)).balance
+
+    def put(self, user_id, record, reason=None, effects=None):
+        self.store.put(self._check(user_id), record, reason, effects)
+
+    def adjust(self, user_id, delta, reason, field="balance", effects=None):
+        return self.store.adjust(self._check(user_id), delta, reason, field, effects)
+
+    def adjust_many(self, deltas, reason, effects=None):
+        self.store.adjust_many({self._check(user_id): delta for user_id, delta in deltas.items()}, reason, effects)
+
+class EconomyStore:
+    def __init__(self, backend=None, journal=None):
+        self.backend = backend
+        self.journal = journal
+        self.records = {}
+        self.dirty = set()
+        #user id -> [lock, number of tasks holding or waiting on it]
+        self.locks = {}
+        #one journal fsync / compaction at a time, the journal file can't be rotated mid-fsync.
+        self.io_lock = asyncio.Lock()
+        self.loaded = False
+        #a burst of changes (roulette spam, lottery payouts) is fsync'd once, not per append.
+        self.journal_flusher = FlushScheduler("journal", self.sync_journal, JOURNAL_SYNC_WINDOW_SECONDS)
+        self.compact_loop = None
+        #callbacks(user_id, record) run after every change, e.g. the leaderboard indexes.
+        self.listeners = []
+        #callbacks(record, now) that catch a record up on time-based accruals, True if
+        #they changed it.
+        self.settlers = []
+        #book name -> (apply(effect), checkpoint() -> async write)
+        self.books = {}
+        #journal events with effects found at load, books replay what they're missing.
+        self.effect_log = []
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def add_settler(self, callback):
+        if callback not in self.settlers:
+            self.settlers.append(callback)
+
+    def settle(self, user_id, reason="settle"):
+        #only called with the user's lock held (Transaction.get).
+        record = self.records.get(int(user_id))
+        if record is None or not self.settlers:
+            return False
+        now = time.time()
+        changed = False
+        for settler in self.settlers:
+            changed = settler(record, now) or changed
+        if changed:
+            self.put(user_id, record, reason)
+        return changed
+
+    def _changed(self, user_id, record):
+        for listener in self.listeners:
+            listener(user_id, record)
+
+    def add_book(self, name, apply, checkpoint):
+        #checkpoint() has to capture the book as of journal.seq (no awaits in between)
+        #and returns an async callable that writes it, which may never be called if the
+        #snapshot fails. books must be added before start(), a compaction drops the
+        #journal effects they haven't replayed.
+        self.books[name] = (apply, checkpoint)
+
+    def replay_book(self, name, after_seq):
+        #applies the book's effects journaled after its checkpoint at after_seq.
+        apply = self.books[name][0]
+        replayed = 0
+        for event in self.effect_log:
+            if event["seq"] <= after_seq:
+                continue
+            for effect in event["effects"]:
+                if effect["book"] == name:
+                    apply(effect)
+                    replayed += 1
+        if replayed:
+            print(f"[Economy] Replayed {replayed} {name} change(s) from the journal.")
+        return replayed
+
+    def _apply_effects(self, effects):
+        for effect in effects or ():
+            self.books[effect["book"]][0](effect)
+
+    def record(self, effects):
+        #journals and applies book changes that don't move anyone's money.
+        self.journal.append_effects(effects)
+        self.journal_flusher.request()
+        self._apply_effects(effects)
+
+    async def save_book(self, name):
+        #writes a book's checkpoint now, e.g. a lottery draw before it pays out. the
+        #journal is synced first, a checkpoint may never be ahead of what it can replay.
+        async with self.io_lock:
+            write = self.books[name][1]()
+            fd = self.journal.flush()
+            if fd is not None:
+                await run_io(os.fsync, fd)
+            await write()
+
+    def load(self):
+        if self.backend is None:
+            self.backend = get_backend()
+        if self.journal is None:
+            self.journal = Journal()
+        self.records = self.backend.load_all()
+        self.dirty.clear()
+        #replay only what was journaled after the snapshot was taken.
+        self.effect_log = []
+        tail = self.journal.open(self.backend.journal_seq, self.effect_log)
+        for event in tail:
+            self.dirty.update(apply_event(self.records, event))
+        if tail:
+            print(f"[Economy] Replayed {len(tail)} journal event(s) on top of the snapshot.")
+        self.loaded = True
+
+    def get(self, user_id):
+        #returns the live record, or a fresh default one if the user has none yet.
+        #nothing is created here, so read-only commands never dirty the store.
+        record = self.records.get(int(user_id))
+        if record is None:
+            return UserRecord()
+        return record
+
+    def put(self, user_id, record, reason=None, effects=None):
+        #store a (possibly new) record, journaled as a whole-record write.
+        user_id = int(user_id)
+        self.records[user_id] = record
+        self.dirty.add(user_id)
+        self.journal.append_put(user_id, record.to_dict(), reason, effects)
+        self.journal_flusher.request()
+        self._apply_effects(effects)
+        self._changed(user_id, record)
+
+    def adjust(self, user_id, delta, reason, field="balance", effects=None):
+        #add delta to one numeric field (balance by default) and return the new value.
+        user_id = int(user_id)
+        record = self.records.get(user_id)
+        if record is None:
+            record = self.records[user_id] = UserRecord()
+        value = getattr(record, field) + delta
+        setattr(record, field, value)
+        self.dirty.add(user_id)
+        self.journal.append_delta(user_id, delta, reason, field, effects)
+        self.journal_flusher.request()
+        self._apply_effects(effects)
+        self._changed(user_id, record)
+        return value
+
+    def adjust_many(self, deltas, reason, effects=None):
+        #{user id: delta} added to balances as one journal event, all of it or none of it
+        #survives a crash.
+        records = {}
+        for user_id, delta in deltas.items():
+            user_id = int(user_id)
+            record = self.records.get(user_id)
+            if record is None:
+                record = self.records[user_id] = UserRecord()
+            record.balance += delta
+            self.dirty.add(user_id)
+            records[user_id] = record
+        self.journal.append_deltas(deltas, reason, effects)
+        self.journal_flusher.request()
+        self._apply_effects(effects)
+        for user_id, record in records.items():
+            self._changed(user_id, record)
+
+    @contextlib.asynccontextmanager
+    async def transaction(self, user_ids):
+        #locks the given users (one id or several) for a read-modify-write.
+        if isinstance(user_ids, (str, int)):
+            user_ids = [user_ids]
+        #always lock in the same order so two multi-user transactions can't deadlock.
+        keys = sorted({int(user_id) for user_id in user_ids})
+        entries = []
+        acquired = []
+        try:
+            for key in keys:
+                entry = self.locks.get(key)
+                if entry is None:
+                    entry = self.locks[key] = [asyncio.Lock(), 0]
+                entry[1] += 1
+                entries.append((key, entry))
+                await entry[0].acquire()
+                acquired.append(entry[0])
+            yield Transaction(self, keys)
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+            #forget locks nobody is using so the table doesn't grow with every user ever seen.
+            for key, entry in entries:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self.locks[key]
+
+    def items(self):
+        return self.records.items()
+
+    def __contains__(self, user_id):
+        return int(user_id) in self.records
+
+    async def sync_journal(self):
+        async with self.io_lock:
+            fd = self.journal.flush()
+            if fd is not None:
+                await run_io(os.fsync, fd)
+
+    async def flush(self):
+        #compaction: write a snapshot tagged with the journal position, then drop the
+        #journal entries it now contains. records are copied here on the event loop and
+        #serialized on the io pool, so commands keep running while it's written.
+        async with self.io_lock:
+            if not self.dirty:
+                fd = self.journal.flush()
+                if fd is not None:
+                    await run_io(os.fsync, fd)
+                return False
+            seq = self.journal.seq
+            dirty = self.dirty
+            self.dirty = set()
+            snapshot = self.backend.snapshot(self.records, dirty)
+            #the books are captured at the same seq, the rotated journal is all they could replay.
+            checkpoints = [checkpoint() for _, checkpoint in self.books.values()]
+            self.journal.rotate()
+            try:
+                await run_io(self.backend.save, snapshot, dirty, seq)
+                for write in checkpoints:
+                    await write()
+            except Exception:
+                #keep the rotated journal and retry these users on the next compaction.
+                self.dirty |= dirty
+                raise
+            self.journal.drop_rotated()
+            #every book has a checkpoint at seq now, none of them replays these again.
+            self.effect_log = [event for event in self.effect_log if event["seq"] > seq]
+            return True
+
+    async def close(self):
+        #shutdown: one last compaction, then the journal and the backend are closed. the
+        #compactor is stopped, not cancelled, so a compaction already running finishes.
+        if self.compact_loop is not None:
+            self.compact_loop.stop()
+        await self.flush()
+        async with self.io_lock:
+            self.journal.close()
+            self.backend.close()
+
+    async def _compact_task(self):
+        await self.flush()
+
+    def start(self):
+        #kick off the background compactor, needs a running event loop.
+        if self.compact_loop is None:
+            self.compact_loop = tasks.loop(seconds=COMPACT_INTERVAL_SECONDS)(self._compact_task)
+        if not self.compact_loop.is_running():
+            self.compact_loop.start()
+
+#the one store every cog shares
+economy = EconomyStore()
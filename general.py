@@ -9,19 +9,7 @@ import json
 import os
 from typing import Optional
 from globals import TOKEN, GUILD_ID, TARGET_MEMBER_ID, TARGET_USER_ID, DATA_FILE, ALLOWED_ROLES, STOCK_FILE, STOCK_HISTORY_FILE, UPDATE_INTERVAL_MINUTES, LOTTERY_FILE, AFK_CHANNEL_ID
-
-def load_data():
-    if not os.path.exists(DATA_FILE):
-        return {}
-    with open(DATA_FILE, "r") as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            return {}
-
-def save_data(data):
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+from economy import economy
 
 class GeneralCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
@@ -54,13 +42,10 @@ class GeneralCog(commands.Cog):
         if roll < 0.60:
             #success reward between 500 and 1000.
             reward = random.randint(500, 1000)
-            data = load_data()
-            user_record = data.get(user_id, {"balance": 0})
-            user_record["balance"] = user_record.get("balance", 0) + reward
-            data[user_id] = user_record
-            save_data(data)
+            async with economy.transaction(user_id) as tx:
+                new_balance = tx.adjust(user_id, reward, "crime")
             await interaction.response.send_message(
-                f"You successfully committed a crime and earned {reward} Beaned Bucks! Your new balance is {user_record['balance']}.",
+                f"You successfully committed a crime and earned {reward} Beaned Bucks! Your new balance is {new_balance}.",
                 ephemeral=False
             )
         elif roll < 0.60 + 0.35:
@@ -97,43 +82,42 @@ class GeneralCog(commands.Cog):
     @app_commands.guilds(discord.Object(id=GUILD_ID))
     @app_commands.command(name="daily", description="Claim your daily reward of 1000-3000 Beaned Bucks (once every 24 hours).")
     async def daily(self, interaction: discord.Interaction):
-        data = load_data()
         user_id = str(interaction.user.id)
         now = datetime.datetime.now()
         
-        #retrieve or initialize user record with a default balance of 0.
-        user_record = data.get(user_id, {})
-        user_record.setdefault("balance", 0)
-        user_record.setdefault("last_daily", None)
-        
-        #check if the user has already claimed within the last 24 hours.
-        last_daily_str = user_record.get("last_daily")
-        if last_daily_str:
-            last_daily = datetime.datetime.fromisoformat(last_daily_str)
-            if now - last_daily < datetime.timedelta(days=1):
-                remaining = datetime.timedelta(days=1) - (now - last_daily)
-            
-                # Calculate the remaining hours, minutes, and seconds
-                remaining_hours = remaining.seconds // 3600  # Get the number of whole hours
-                remaining_minutes = (remaining.seconds % 3600) // 60  # Get the remaining minutes after hours are accounted for
-                remaining_seconds = remaining.seconds % 60  # Get the remaining seconds after minutes are accounted for
-            
-                # Send the response with the calculated time left
-                await interaction.response.send_message(
-                f"You have already claimed your daily reward. Try again in {remaining_hours} hours, {remaining_minutes} minutes, and {remaining_seconds} seconds.",
-                ephemeral=True
-                )
-                return
+        remaining = None
+        async with economy.transaction(user_id) as tx:
+            user_record = tx.get(user_id)
+
+            #check if the user has already claimed within the last 24 hours.
+            last_daily_str = user_record.last_daily
+            if last_daily_str:
+                last_daily = datetime.datetime.fromisoformat(last_daily_str)
+                if now - last_daily < datetime.timedelta(days=1):
+                    remaining = datetime.timedelta(days=1) - (now - last_daily)
 
-        #award a random amount between 500 and 1000 Beaned Bucks.
-        reward = random.randint(1000, 5000)
-        user_record["balance"] += reward
-        user_record["last_daily"] = now.isoformat()
-        data[user_id] = user_record
-        save_data(data)
+            if remaining is None:
+                #award a random amount between 500 and 1000 Beaned Bucks.
+                reward = random.randint(1000, 5000)
+                user_record.last_daily = now.isoformat()
+                tx.put(user_id, user_record, "daily")
+                new_balance = tx.adjust(user_id, reward, "daily")
+
+        if remaining is not None:
+            # Calculate the remaining hours, minutes, and seconds
+            remaining_hours = remaining.seconds // 3600  # Get the number of whole hours
+            remaining_minutes = (remaining.seconds % 3600) // 60  # Get the remaining minutes after hours are accounted for
+            remaining_seconds = remaining.seconds % 60  # Get the remaining seconds after minutes are accounted for
         
+            # Send the response with the calculated time left
+            await interaction.response.send_message(
+            f"You have already claimed your daily reward. Try again in {remaining_hours} hours, {remaining_minutes} minutes, and {remaining_seconds} seconds.",
+            ephemeral=True
+            )
+            return
+
         await interaction.response.send_message(
-            f"You received {reward} Beaned Bucks! Your new balance is {user_record['balance']}.",
+            f"You received {reward} Beaned Bucks! Your new balance is {new_balance}.",
             ephemeral=True
         )
       
@@ -145,38 +129,38 @@ class GeneralCog(commands.Cog):
             await interaction.response.send_message("You must be a Server Booster to claim this reward.", ephemeral=True)
             return
 
-        data = load_data()
         user_id = str(interaction.user.id)
         now = datetime.datetime.now()
 
-        #retrieve or initialize user record with default keys.
-        user_record = data.get(user_id, {})
-        user_record.setdefault("balance", 0)
-        user_record.setdefault("last_daily_boost", None)
+        remaining = None
+        async with economy.transaction(user_id) as tx:
+            user_record = tx.get(user_id)
 
-        last_boost_str = user_record.get("last_daily_boost")
-        if last_boost_str:
-            last_boost = datetime.datetime.fromisoformat(last_boost_str)
-            if now - last_boost < datetime.timedelta(days=1):
-                remaining = datetime.timedelta(days=1) - (now - last_boost)
-                # Calculate the remaining hours, minutes, and seconds
-                remaining_hours = remaining.seconds // 3600  # Get the number of whole hours
-                remaining_minutes = (remaining.seconds % 3600) // 60  # Get the remaining minutes after hours are accounted for
-                remaining_seconds = remaining.seconds % 60  # Get the remaining seconds after minutes are accounted for
-                await interaction.response.send_message(
-                    f"You have already claimed your daily booster reward. Try again in {remaining_hours} hours, {remaining_minutes} minutes and {remaining_seconds} seconds.",
-                    ephemeral=True
-                )
-                return
+            last_boost_str = user_record.last_daily_boost
+            if last_boost_str:
+                last_boost = datetime.datetime.fromisoformat(last_boost_str)
+                if now - last_boost < datetime.timedelta(days=1):
+                    remaining = datetime.timedelta(days=1) - (now - last_boost)
 
-        reward = random.randint(5000, 10000)
-        user_record["balance"] += reward
-        user_record["last_daily_boost"] = now.isoformat()
-        data[user_id] = user_record
-        save_data(data)
+            if remaining is None:
+                reward = random.randint(5000, 10000)
+                user_record.last_daily_boost = now.isoformat()
+                tx.put(user_id, user_record, "dailyboost")
+                new_balance = tx.adjust(user_id, reward, "dailyboost")
+
+        if remaining is not None:
+            # Calculate the remaining hours, minutes, and seconds
+            remaining_hours = remaining.seconds // 3600  # Get the number of whole hours
+            remaining_minutes = (remaining.seconds % 3600) // 60  # Get the remaining minutes after hours are accounted for
+            remaining_seconds = remaining.seconds % 60  # Get the remaining seconds after minutes are accounted for
+            await interaction.response.send_message(
+                f"You have already claimed your daily booster reward. Try again in {remaining_hours} hours, {remaining_minutes} minutes and {remaining_seconds} seconds.",
+                ephemeral=True
+            )
+            return
         
         await interaction.response.send_message(
-            f"You worked as a booster and earned {reward} Beaned Bucks! Your new balance is {user_record['balance']}.",
+            f"You worked as a booster and earned {reward} Beaned Bucks! Your new balance is {new_balance}.",
             ephemeral=True
         )
 
@@ -186,31 +170,23 @@ class GeneralCog(commands.Cog):
     async def pay(self, interaction: discord.Interaction, user: discord.Member, amount: int):
         payer_id = str(interaction.user.id)
         payee_id = str(user.id)
-        data = load_data()
-
-        #ensure both payer and payee have an entry in the data.
-        if payer_id not in data:
-            data[payer_id] = {"balance": 0}
-        if payee_id not in data:
-            data[payee_id] = {"balance": 0}
 
         #check that the transfer amount is positive.
         if amount <= 0:
             await interaction.response.send_message("Transfer amount must be greater than 0.", ephemeral=True)
             return
 
-        payer_balance = data[payer_id].get("balance", 0)
-        if payer_balance < amount:
+        async with economy.transaction([payer_id, payee_id]) as tx:
+            enough = tx.balance(payer_id) >= amount
+            if enough:
+                #subtract from payer and add to payee.
+                tx.adjust(payer_id, -amount, "pay")
+                tx.adjust(payee_id, amount, "pay")
+
+        if not enough:
             await interaction.response.send_message("You do not have enough Beaned Bucks to complete this transfer.", ephemeral=True)
             return
 
-        #subtract from payer and add to payee.
-        data[payer_id]["balance"] = payer_balance - amount
-        payee_balance = data[payee_id].get("balance", 0)
-        data[payee_id]["balance"] = payee_balance + amount
-
-        save_data(data)
-
         await interaction.response.send_message(
             f"You have transferred {amount} Beaned Bucks to {user.display_name}.",
             ephemeral=False
@@ -222,10 +198,8 @@ class GeneralCog(commands.Cog):
     async def balance(self, interaction: discord.Interaction, user: Optional[discord.Member] = None):
         #default to the interaction user if no user is specified.
         target = user or interaction.user
-        data = load_data()
         user_id = str(target.id)
-        user_record = data.get(user_id, {"balance": 0})
-        balance_value = user_record.get("balance", 0)
+        balance_value = economy.get(user_id).balance
         
         await interaction.response.send_message(f"{target.display_name} has {balance_value} Beaned Bucks.")
 
@@ -233,36 +207,36 @@ class GeneralCog(commands.Cog):
     @app_commands.guilds(discord.Object(id=GUILD_ID))
     @app_commands.command(name="work", description="Work and earn between 1 and 500 Beaned Bucks (once every 10 minutes).")
     async def work(self, interaction: discord.Interaction):
-        data = load_data()
         user_id = str(interaction.user.id)
         now = datetime.datetime.now()
 
-        # Retrieve or initialize user record with default keys.
-        user_record = data.get(user_id, {})
-        user_record.setdefault("balance", 0)
-        user_record.setdefault("last_work", None)
+        remaining = None
+        async with economy.transaction(user_id) as tx:
+            user_record = tx.get(user_id)
 
-        last_work_str = user_record.get("last_work")
-        if last_work_str:
-            last_work = datetime.datetime.fromisoformat(last_work_str)
-            if now - last_work < datetime.timedelta(minutes=10):
-                remaining = datetime.timedelta(minutes=10) - (now - last_work)
-                minutes = remaining.seconds // 60
-                seconds = remaining.seconds % 60
-                await interaction.response.send_message(
-                    f"You can work again in {minutes} minutes and {seconds} seconds.",
-                    ephemeral=True
-                )
-                return
+            last_work_str = user_record.last_work
+            if last_work_str:
+                last_work = datetime.datetime.fromisoformat(last_work_str)
+                if now - last_work < datetime.timedelta(minutes=10):
+                    remaining = datetime.timedelta(minutes=10) - (now - last_work)
 
-        reward = random.randint(1, 500)
-        user_record["balance"] += reward
-        user_record["last_work"] = now.isoformat()
-        data[user_id] = user_record
-        save_data(data)
+            if remaining is None:
+                reward = random.randint(1, 500)
+                user_record.last_work = now.isoformat()
+                tx.put(user_id, user_record, "work")
+                new_balance = tx.adjust(user_id, reward, "work")
+
+        if remaining is not None:
+            minutes = remaining.seconds // 60
+            seconds = remaining.seconds % 60
+            await interaction.response.send_message(
+                f"You can work again in {minutes} minutes and {seconds} seconds.",
+                ephemeral=True
+            )
+            return
         
         await interaction.response.send_message(
-            f"You worked and earned {reward} Beaned Bucks! Your new balance is {user_record['balance']}.",
+            f"You worked and earned {reward} Beaned Bucks! Your new balance is {new_balance}.",
             ephemeral=True
         )
 
@@ -273,16 +247,15 @@ class GeneralCog(commands.Cog):
     async def wheel(self, interaction: discord.Interaction, target: discord.Member):
         invoker = interaction.user
         has_allowed_role = any(role.name.lower() in [r.lower() for r in ALLOWED_ROLES] for role in invoker.roles)
-        data = load_data()
         user_id = str(invoker.id)
-        user_balance = data.get(user_id, {}).get("balance", 0)
         if not has_allowed_role:
-            if user_balance < 25000:
+            async with economy.transaction(user_id) as tx:
+                can_pay = tx.balance(user_id) >= 25000
+                if can_pay:
+                    tx.adjust(user_id, -25000, "wheel")
+            if not can_pay:
                 await interaction.response.send_message("You do not have permission to use this command. You must either have one of the allowed roles or at least 10,000 Beaned Bucks.", ephemeral=True)
                 return
-            else:
-                data[user_id]["balance"] = user_balance - 25000
-                save_data(data)
         options = [
             (60, "60 seconds"),
             (300, "5 minutes"),
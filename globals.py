@@ -13,7 +13,26 @@ DATA_FILE = "data.json"
 ALLOWED_ROLES = ["him"]
 STOCK_FILE = "stocks.json"
 STOCK_HISTORY_FILE = "stock_history.json"
+#binary per-symbol price history (see history.py), stock_history.json is only read to migrate
+STOCK_HISTORY_DIR = "stock_history"
+#rendered /stocks charts (see charts.py), safe to delete
+CHART_CACHE_DIR = "chart_cache"
 UPDATE_INTERVAL_MINUTES = 20 
+#fixed seed for the market rng (see market.py), leave it out for a different market every run
+MARKET_SEED = config.get("market_seed")
 LOTTERY_FILE = "lottery.json"
+LOTTERY_TICKETS_FILE = "lottery_tickets.bin"
+LOTTERY_SUBSCRIPTIONS_FILE = "lottery_subscriptions.json"
+LOTTERY_REPORT_FILE = "lottery_report.json"
+#next run time of every scheduled job (see scheduler.py)
+SCHEDULE_FILE = "schedule.json"
+ORDERS_FILE = "orders.json"
+MINING_FILE = "mining.json"
+#cdn urls of images the bot already uploaded (see media.py)
+MEDIA_CACHE_FILE = "media_cache.json"
 AFK_CHANNEL_ID = 1042597656612065281
-RIOT_IDS = "riot.json"
\ No newline at end of file
+RIOT_IDS = "riot.json"
+#"json" keeps data.json, "sqlite" stores users in DATABASE_FILE (see storage.py)
+STORAGE_BACKEND = config.get("storage_backend", "json")
+DATABASE_FILE = "economy.db"
+JOURNAL_FILE = "economy.journal"
\ No newline at end of file
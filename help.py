@@ -20,7 +20,7 @@ class HelpCog(commands.Cog):
         
         general = (
             "**/balance [user]** - Check your Beaned Bucks balance (defaults to your own).\n"
-            "**/leaderboard** - Check the networth, time, timealone, timeafk leaderboards.\n" 
+            "**/leaderboard** - Check the networth, time, timealone, timeafk leaderboards (add a page to see past the top 10).\n" 
             "**/daily** - Get your daily beaned bucks.\n"
             "**/dailyboost** - Get your daily beaned bucks. (boosters only)\n"
             "**/joinnotification** - Join the notif notifications channel.\n"
@@ -37,14 +37,23 @@ class HelpCog(commands.Cog):
         
         stocks = (
             "**/portfolio** - Check your stock portfolio and profit (invested vs. earned).\n"
-            "**/stock [stock name]** - View current stock prices or a specific stock's history.\n"
+            "**/stocks [stock name] [range]** - View current stock prices, a specific stock's history, or its day/week/month/all summary.\n"
             "**/buystock [stock] [price]** - Buy stock at your specified price.\n"
-            "**/sellstock [stock] [price]** - Sell stock at your specified price."
+            "**/sellstock [stock] [price]** - Sell stock at your specified price.\n"
+            "**/stockorder [side] [kind] [stock] [price] [amount]** - Place a limit or stop order, the money or shares are held until it fills.\n"
+            "**/orders** - View your open orders.\n"
+            "**/cancelorder [order id]** - Cancel an open order and get its escrow back.\n"
+            "**/stockbuy [stock] [amount] [leverage]** - Buy with up to 5x leverage, liquidated if the price falls too far.\n"
+            "**/stockshort [stock] [amount] [leverage]** - Short a stock, you profit when it falls.\n"
+            "**/stockclose [stock]** - Close your leveraged or short position."
         )
         
         lottery = (
-            "**/lotteryticket [numbers]** - Buy a lottery ticket for 5,000 Beaned Bucks; choose 5 unique numbers (1-60).\n"
+            "**/lotteryticket [numbers] [count]** - Buy lottery tickets for 1,000 Beaned Bucks each; choose 5 unique numbers (1-60) or leave them out for quick picks.\n"
+            "**/lotterysubscribe [draws] [numbers] [count]** - Play the next draws automatically, paid right before each draw.\n"
+            "**/lotteryunsubscribe** - Cancel your lottery subscriptions.\n"
             "**/lotterydraw** - Force a lottery draw (restricted to lottery admins).\n"
+            "**/lotterystats** - Simulated house edge and ticket value of the lottery (restricted to lottery admins).\n"
             "**/lotterytotal** - View the current lottery jackpot."
         )
 
@@ -52,7 +61,7 @@ class HelpCog(commands.Cog):
             "**/crypto [user]** - Shows how many RTX 5090s owned and what is currently being mined.\n"
             "**/cryptobuy [quantity]** - Buy RTX 5090s using your Beaned Bucks. Each card is $10,000\n"
             "**/cryptosell [quantity]** - Sell your RTX 5090s for $5,000 Beaned Bucks. Don't complain, they've been used to mine crypto.\n"
-            "**/mine [crypto]** - Decide what crypto you'd like to mine. You will gain 1 coin/card every 5 minutes.\n"
+            "**/mine [crypto]** - Decide what crypto you'd like to mine. Each card makes 1 coin every 5 minutes until more than 50 cards mine the same coin, then the difficulty rises and the network's coins are split by share.\n"
         )
         
         embed.add_field(name="General", value=general, inline=False)
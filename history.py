@@ -0,0 +1,236 @@
+#history.py
+#per-symbol price history as flat binary files, one fixed-width (epoch, price) record
+#per market tick. a tick only appends 16 bytes to each symbol's file and readers mmap
+#the file and unpack just the records they need, so nothing gets slower as the market
+#gets older.
+#
+#next to the raw ticks every symbol keeps OHLC/volume candles at 1h, 1d and 1w plus one
+#all-time candle. the tick updates the newest candle of each in place (or starts a new
+#one), so any range is answered from a handful of candles.
+#
+#one-shot import of the old stock_history.json (also done on startup if needed):
+#    python history.py migrate [--json stock_history.json] [--dir stock_history]
+import argparse
+import contextlib
+import datetime
+import json
+import mmap
+import os
+import struct
+from globals import STOCK_HISTORY_FILE, STOCK_HISTORY_DIR
+
+#little-endian float64 epoch seconds, float64 price.
+RECORD = struct.Struct("<dd")
+#bucket start, open, high, low, close, volume (shares traded).
+CANDLE = struct.Struct("<dddddd")
+
+#seconds per candle, None is the single all-time candle. buckets are utc.
+RESOLUTIONS = {"1h": 3600, "1d": 86400, "1w": 7 * 86400, "all": None}
+#epoch 0 was a thursday, weekly candles start on monday.
+WEEK_OFFSET = 4 * 86400
+#range name -> (rollup it's read from, seconds it covers), the coarsest rollup that
+#still gives a useful number of candles for the span.
+RANGES = {
+    "day": ("1h", 86400),
+    "week": ("1d", 7 * 86400),
+    "month": ("1d", 30 * 86400),
+    "all": ("all", None),
+}
+
+def bucket_start(timestamp, seconds):
+    if seconds is None:
+        return 0.0
+    offset = WEEK_OFFSET if seconds == RESOLUTIONS["1w"] else 0
+    return (timestamp - offset) // seconds * seconds + offset
+
+def merge_candles(candles):
+    #one candle spanning all of them (oldest first), None if there are none.
+    if not candles:
+        return None
+    return (
+        candles[0][0],
+        candles[0][1],
+        max(candle[2] for candle in candles),
+        min(candle[3] for candle in candles),
+        candles[-1][4],
+        sum(candle[5] for candle in candles),
+    )
+
+class HistoryStore:
+    def __init__(self, directory=STOCK_HISTORY_DIR):
+        self.directory = directory
+
+    def path(self, symbol):
+        return os.path.join(self.directory, f"{symbol}.bin")
+
+    def candle_path(self, symbol, resolution):
+        return os.path.join(self.directory, f"{symbol}.{resolution}.bin")
+
+    def exists(self):
+        return os.path.isdir(self.directory)
+
+    def symbols(self):
+        if not self.exists():
+            return []
+        #candle files are SYMBOL.1h.bin etc, symbols themselves never contain a dot.
+        return sorted(name[:-4] for name in os.listdir(self.directory) if name.endswith(".bin") and "." not in name[:-4])
+
+    def append(self, prices, timestamp, volume=None):
+        #one record per symbol, prices is {symbol: price} for a single tick and volume
+        #{symbol: shares} traded since the last one.
+        os.makedirs(self.directory, exist_ok=True)
+        volume = volume or {}
+        for symbol, price in prices.items():
+            with open(self.path(symbol), "ab") as f:
+                size = f.tell()
+                if size % RECORD.size:
+                    #a crash mid-append left a partial record, drop it so we stay aligned.
+                    f.truncate(size - size % RECORD.size)
+                f.write(RECORD.pack(timestamp, price))
+            for resolution, seconds in RESOLUTIONS.items():
+                self._update_candle(self.candle_path(symbol, resolution), seconds, timestamp, price, volume.get(symbol, 0))
+
+    def _update_candle(self, path, seconds, timestamp, price, volume):
+        bucket = bucket_start(timestamp, seconds)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, "r+b") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size % CANDLE.size:
+                size -= size % CANDLE.size
+                f.truncate(size)
+            if size:
+                f.seek(size - CANDLE.size)
+                start, open_, high, low, close, traded = CANDLE.unpack(f.read(CANDLE.size))
+                if start == bucket:
+                    #same bucket, fold the tick into the newest candle.
+                    f.seek(size - CANDLE.size)
+                    f.write(CANDLE.pack(start, open_, max(high, price), min(low, price), price, traded + volume))
+                    return
+            f.seek(size)
+            f.write(CANDLE.pack(bucket, price, price, price, price, volume))
+
+    def rebuild_candles(self, symbol, resolutions=RESOLUTIONS):
+        #recomputes candles from the raw ticks, for imported or pre-candle history.
+        #volume isn't in the ticks, rebuilt candles start with none.
+        with self._view(self.path(symbol)) as (view, count):
+            ticks = [RECORD.unpack_from(view, i * RECORD.size) for i in range(count)]
+        for resolution in resolutions:
+            seconds = RESOLUTIONS[resolution]
+            candles = []
+            for timestamp, price in ticks:
+                bucket = bucket_start(timestamp, seconds)
+                if candles and candles[-1][0] == bucket:
+                    start, open_, high, low, close, traded = candles[-1]
+                    candles[-1] = (start, open_, max(high, price), min(low, price), price, traded)
+                else:
+                    candles.append((bucket, price, price, price, price, 0.0))
+            self._write_file(self.candle_path(symbol, resolution), b"".join(CANDLE.pack(*candle) for candle in candles))
+
+    def ensure_candles(self):
+        #builds candles for any symbol that has ticks but no rollups yet, returns how many.
+        rebuilt = 0
+        for symbol in self.symbols():
+            missing = [resolution for resolution in RESOLUTIONS if not os.path.exists(self.candle_path(symbol, resolution))]
+            if missing:
+                self.rebuild_candles(symbol, missing)
+                rebuilt += 1
+        return rebuilt
+
+    def write(self, symbol, points):
+        #replaces a symbol's whole history, only used when importing.
+        self._write_file(self.path(symbol), b"".join(RECORD.pack(timestamp, price) for timestamp, price in points))
+        self.rebuild_candles(symbol)
+
+    def _write_file(self, path, payload):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @contextlib.contextmanager
+    def _view(self, path, record=RECORD):
+        #yields (buffer, complete record count), an empty buffer if the file is missing.
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            yield b"", 0
+            return
+        with f:
+            count = os.fstat(f.fileno()).st_size // record.size
+            if not count:
+                yield b"", 0
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                yield view, count
+
+    def count(self, symbol):
+        with self._view(self.path(symbol)) as (view, count):
+            return count
+
+    def tail(self, symbol, n):
+        #last n (timestamp, price) points, oldest first.
+        with self._view(self.path(symbol)) as (view, count):
+            start = max(0, count - n)
+            return [RECORD.unpack_from(view, i * RECORD.size) for i in range(start, count)]
+
+    def candles(self, symbol, resolution, n):
+        #last n (start, open, high, low, close, volume) candles, oldest first.
+        with self._view(self.candle_path(symbol, resolution), CANDLE) as (view, count):
+            start = max(0, count - n)
+            return [CANDLE.unpack_from(view, i * CANDLE.size) for i in range(start, count)]
+
+    def range_candles(self, symbol, name, now):
+        #candles covering one of RANGES, a fixed number of records whatever the market's age.
+        resolution, span = RANGES[name]
+        if span is None:
+            return self.candles(symbol, resolution, 1)
+        seconds = RESOLUTIONS[resolution]
+        cutoff = bucket_start(now - span, seconds)
+        return [candle for candle in self.candles(symbol, resolution, span // seconds + 1) if candle[0] >= cutoff]
+
+    def since(self, symbol, timestamp):
+        #every point at or after timestamp, found by binary search on the sorted epochs.
+        with self._view(self.path(symbol)) as (view, count):
+            low, high = 0, count
+            while low < high:
+                mid = (low + high) // 2
+                if RECORD.unpack_from(view, mid * RECORD.size)[0] < timestamp:
+                    low = mid + 1
+                else:
+                    high = mid
+            return [RECORD.unpack_from(view, i * RECORD.size) for i in range(low, count)]
+
+def migrate_json_history(json_path=STOCK_HISTORY_FILE, store=None):
+    #returns the number of points imported, 0 if there was no json history.
+    store = store or price_history
+    try:
+        with open(json_path, "r") as f:
+            history = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return 0
+    total = 0
+    for symbol, points in history.items():
+        converted = [
+            (datetime.datetime.fromisoformat(point["timestamp"]).timestamp(), point["price"])
+            for point in points
+        ]
+        store.write(symbol, converted)
+        total += len(converted)
+    return total
+
+#the one history store every cog shares
+price_history = HistoryStore()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stock history tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="Import stock_history.json into the binary history files.")
+    migrate.add_argument("--json", default=STOCK_HISTORY_FILE, help="stock_history.json to read")
+    migrate.add_argument("--dir", default=STOCK_HISTORY_DIR, help="directory to write the history files to")
+    args = parser.parse_args()
+    if args.command == "migrate":
+        count = migrate_json_history(args.json, HistoryStore(args.dir))
+        print(f"Imported {count} price point(s) from {args.json} into {args.dir}.")
@@ -0,0 +1,165 @@
+#journal.py
+#append-only log of economy changes. every change is one json line with a sequence
+#number, appends are fsync'd in batches and the compactor folds the log into the
+#storage snapshot every so often, so most writes are a small append instead of a
+#full rewrite of the user data.
+#
+#compaction rotates the live file to <journal>.old before the snapshot is written and
+#deletes it once the snapshot is safe, so appends never wait on (or race) the snapshot.
+#
+#an event can also carry "effects" for the books kept outside the user records (open
+#orders, lottery tickets, subscriptions), so the money and what it paid for land in
+#the same line and a crash keeps both or neither. see EconomyStore.add_book.
+import json
+import os
+import time
+from globals import JOURNAL_FILE
+from records import UserRecord
+
+#push buffered appends to the os once this many are waiting, the sync loop fsyncs them.
+FSYNC_BATCH = 32
+
+class Journal:
+    def __init__(self, path=JOURNAL_FILE):
+        self.path = path
+        self.rotated_path = path + ".old"
+        self.seq = 0
+        self.pending = 0
+        self.file = None
+
+    def _read(self, path, after_seq, events, effects):
+        torn = False
+        if not os.path.exists(path):
+            return torn
+        with open(path, "r") as f:
+            for line in f:
+                torn = not line.endswith("\n")
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    #a crash mid-append can leave a torn line behind, skip it.
+                    print(f"[Journal] Skipping unreadable line in {path}.")
+                    continue
+                if event["seq"] > after_seq:
+                    events.append(event)
+                    self.seq = max(self.seq, event["seq"])
+                #books checkpoint on their own, they may need effects the snapshot already has.
+                if "effects" in event and effects is not None:
+                    effects.append(event)
+        return torn
+
+    def open(self, after_seq=0, effects=None):
+        #returns the events written after the snapshot at after_seq and opens for appending.
+        #every event with effects still on disk goes into effects, whatever its seq.
+        events = []
+        self.seq = after_seq
+        #a leftover .old means the last compaction never finished, its events come first.
+        self._read(self.rotated_path, after_seq, events, effects)
+        torn = self._read(self.path, after_seq, events, effects)
+        self.file = open(self.path, "a")
+        if torn:
+            #end the torn line so the next append starts on a fresh one.
+            self.file.write("\n")
+        return events
+
+    def _append(self, event):
+        self.seq += 1
+        event["seq"] = self.seq
+        event["ts"] = time.time()
+        self.file.write(json.dumps(event) + "\n")
+        self.pending += 1
+        if self.pending >= FSYNC_BATCH:
+            self.file.flush()
+        return self.seq
+
+    def append_delta(self, user_id, delta, reason, field="balance", effects=None):
+        event = {"user": user_id, "delta": delta, "reason": reason}
+        if field != "balance":
+            event["field"] = field
+        if effects:
+            event["effects"] = effects
+        return self._append(event)
+
+    def append_put(self, user_id, record, reason=None, effects=None):
+        #whole-record write for changes that aren't a simple delta (portfolios, cooldowns...).
+        event = {"user": user_id, "record": record}
+        if reason:
+            event["reason"] = reason
+        if effects:
+            event["effects"] = effects
+        return self._append(event)
+
+    def append_deltas(self, deltas, reason, effects=None):
+        #balance changes for several users in one line, e.g. a draw's winnings.
+        event = {"deltas": {str(user_id): delta for user_id, delta in deltas.items()}, "reason": reason}
+        if effects:
+            event["effects"] = effects
+        return self._append(event)
+
+    def append_effects(self, effects):
+        #book changes that don't touch anyone's record (a new subscription, say).
+        return self._append({"effects": effects})
+
+    def flush(self):
+        #hands buffered appends to the os and returns the fd to fsync, or None if idle.
+        if self.file is None or not self.pending:
+            return None
+        self.file.flush()
+        self.pending = 0
+        return self.file.fileno()
+
+    def sync(self):
+        fd = self.flush()
+        if fd is not None:
+            os.fsync(fd)
+
+    def rotate(self):
+        #moves everything written so far aside, new appends go to a fresh file.
+        #no fsync here, the snapshot that follows is what makes these events durable.
+        self.file.close()
+        self.pending = 0
+        if os.path.exists(self.rotated_path):
+            #the previous compaction failed, keep its events in front of ours.
+            with open(self.rotated_path, "a") as old, open(self.path, "r") as current:
+                old.write(current.read())
+            os.remove(self.path)
+        else:
+            os.replace(self.path, self.rotated_path)
+        self.file = open(self.path, "a")
+
+    def drop_rotated(self):
+        #the snapshot now holds everything in the rotated file.
+        if os.path.exists(self.rotated_path):
+            os.remove(self.rotated_path)
+
+    def close(self):
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+def apply_event(records, event):
+    #replays one journal event onto the in-memory records, returns the users it changed.
+    if "deltas" in event:
+        changed = []
+        for user_id, delta in event["deltas"].items():
+            user_id = int(user_id)
+            record = records.get(user_id)
+            if record is None:
+                record = records[user_id] = UserRecord()
+            record.balance += delta
+            changed.append(user_id)
+        return changed
+    if "user" not in event:
+        return []
+    #older journals wrote string user ids, int() reads both.
+    user_id = int(event["user"])
+    if "record" in event:
+        records[user_id] = UserRecord.from_dict(event["record"])
+    else:
+        field = event.get("field", "balance")
+        record = records.get(user_id)
+        if record is None:
+            record = records[user_id] = UserRecord()
+        setattr(record, field, getattr(record, field) + event["delta"])
+    return [user_id]
@@ -0,0 +1,138 @@
+#leaderboard.py
+#ranked indexes for /leaderboard. every category keeps a sorted list of (-score, user id)
+#that the economy store updates as records change, so showing a page or finding
+#someone's rank is a couple of O(log n) lookups instead of sorting every user.
+#
+#networth depends on stock prices (shares held, shares escrowed in open sell orders and
+#what open margin positions would close for), holders are revalued once per market
+#tick. money escrowed in open buy orders counts at face value.
+#    leaderboards.attach(economy, price_feed.current())
+#    rows = leaderboards.page("networth", 0, 10)
+#    rank = leaderboards.rank("networth", user_id)
+from sortedcontainers import SortedList
+from margin import close_value
+from orders import order_book
+
+#rows per /leaderboard page.
+PAGE_SIZE = 10
+#what a graphics card counts for in networth.
+CARD_VALUE = 10000
+#category -> record field it ranks, networth is computed.
+CATEGORIES = {
+    "networth": None,
+    "time": "vc_time",
+    "timealone": "vc_timealone",
+    "timeafk": "vc_afk",
+}
+#past this share of users changing at once it's cheaper to re-sort than to move each one.
+REBUILD_RATIO = 0.25
+
+class RankIndex:
+    #one category: user id -> score plus the same scores kept sorted, highest first.
+    def __init__(self):
+        self.scores = {}
+        self.order = SortedList()
+
+    def update(self, user_id, score):
+        old = self.scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            self.order.remove((-old, user_id))
+        self.scores[user_id] = score
+        self.order.add((-score, user_id))
+
+    def update_many(self, scores):
+        changed = {user_id: score for user_id, score in scores.items() if self.scores.get(user_id) != score}
+        if len(changed) > len(self.scores) * REBUILD_RATIO:
+            self.scores.update(changed)
+            self.order = SortedList((-score, user_id) for user_id, score in self.scores.items())
+        else:
+            for user_id, score in changed.items():
+                self.update(user_id, score)
+
+    def replace_all(self, scores):
+        self.scores = dict(scores)
+        self.order = SortedList((-score, user_id) for user_id, score in self.scores.items())
+
+    def page(self, start, count):
+        #[(user id, score)] for ranks start+1 .. start+count.
+        return [(user_id, -negated) for negated, user_id in self.order.islice(start, start + count)]
+
+    def rank(self, user_id):
+        #1-based rank, None for users that aren't ranked.
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return self.order.index((-score, user_id)) + 1
+
+    def __len__(self):
+        return len(self.scores)
+
+class Leaderboards:
+    def __init__(self):
+        self.prices = {}
+        self.indexes = {name: RankIndex() for name in CATEGORIES}
+        #users with any stock, margin position or open order, the only ones a price tick can move.
+        self.holders = set()
+        self.store = None
+
+    def networth(self, user_id, record):
+        portfolio_value = sum(self.prices.get(stock, 0) * shares for stock, shares in record.portfolio.items())
+        if record.positions:
+            portfolio_value += sum(close_value(position, self.prices.get(stock, 0)) for stock, position in record.positions.items())
+        #order placement, fills and cancels are effects on the user's own journal event,
+        #the book is up to date by the time changed() sees the record.
+        portfolio_value += order_book.escrow_value(user_id, self.prices)
+        return record.balance + portfolio_value + record.graphics_cards * CARD_VALUE
+
+    def holds(self, user_id, record):
+        return bool(record.portfolio or record.positions or str(user_id) in order_book.by_user)
+
+    def attach(self, store, prices):
+        #builds every index from a loaded store and keeps them current from then on.
+        self.store = store
+        self.rebuild(prices)
+        if self.changed not in store.listeners:
+            store.add_listener(self.changed)
+
+    def rebuild(self, prices):
+        #prices is a PriceSnapshot (or any mapping), it's never modified so no copy.
+        self.prices = prices
+        self.holders = {user_id for user_id, record in self.store.items() if self.holds(user_id, record)}
+        for name, field in CATEGORIES.items():
+            if field is None:
+                scores = {user_id: self.networth(user_id, record) for user_id, record in self.store.items()}
+            else:
+                scores = {user_id: getattr(record, field) for user_id, record in self.store.items()}
+            self.indexes[name].replace_all(scores)
+
+    def changed(self, user_id, record):
+        #economy listener, called after every put/adjust.
+        if self.holds(user_id, record):
+            self.holders.add(user_id)
+        else:
+            self.holders.discard(user_id)
+        for name, field in CATEGORIES.items():
+            self.indexes[name].update(user_id, self.networth(user_id, record) if field is None else getattr(record, field))
+
+    def reprice(self, prices):
+        #new market prices, only stock holders' networth moves.
+        self.prices = prices
+        if self.store is None:
+            return
+        self.indexes["networth"].update_many({
+            user_id: self.networth(user_id, self.store.get(user_id)) for user_id in self.holders
+        })
+
+    def page(self, category, start, count):
+        return self.indexes[category].page(start, count)
+
+    def rank(self, category, user_id):
+        return self.indexes[category].rank(int(user_id))
+
+    def size(self, category):
+        return len(self.indexes[category])
+
+#the one set of leaderboards every cog shares
+leaderboards = Leaderboards()
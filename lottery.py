@@ -1,119 +1,435 @@
 #lottery.py
+#the lottery cog. the open draw's tickets live in LOTTERY_TICKETS_FILE as raw
+#TICKET_DTYPE records (see lottery_math.py) behind a small header with the jackpot, the
+#draw number and the journal seq the file is current to.
+#
+#the lottery is an economy book (see economy.py): a purchase's tickets are an effect on
+#the journal event that debits it, and a draw is an effect on the one event that pays
+#all of its winners, so a crash keeps the money and the tickets together. the tickets
+#file is a checkpoint, written (appended to, or rewritten after a draw) at every
+#compaction, the journal after its seq is replayed on top of it. LOTTERY_FILE is only
+#read to migrate from before the header.
 import discord
 from discord import app_commands
-from discord.ext import commands, tasks
+from discord.ext import commands
 import json
 import os
 import random
 import datetime
 import asyncio
+import functools
+import struct
+import time
 from zoneinfo import ZoneInfo
-from globals import LOTTERY_FILE, GUILD_ID, ALLOWED_ROLES
-from utils import load_data, save_data
+import numpy as np
+from typing import Optional
+from globals import LOTTERY_FILE, LOTTERY_TICKETS_FILE, LOTTERY_REPORT_FILE, GUILD_ID, ALLOWED_ROLES
+from economy import economy
+from persistence import run_io, atomic_write_json
+from subscriptions import subscription_book, load_subscriptions, MAX_SUBSCRIPTION_DRAWS, MAX_SUBSCRIPTIONS
+from lottery_math import TICKET_DTYPE, TICKET_PRICE, DEFAULT_JACKPOT, valid_numbers, ticket_mask, mask_numbers, quick_picks, draw_numbers, draw_payouts, next_jackpot
+from lottery_sim import rules
+from scheduler import scheduler
+
+#slots a fresh ticket book starts with, it doubles from there.
+MIN_CAPACITY = 1024
+#most tickets one /lotteryticket can buy.
+MAX_TICKETS_PER_PURCHASE = 1000
+#purchases listing more tickets than this just give the count.
+SHOWN_TICKETS = 5
+#LOTTERY_TICKETS_FILE header: magic, journal seq, tickets in the file, jackpot, next draw.
+TICKETS_HEADER = struct.Struct("<8sqqdq")
+TICKETS_MAGIC = b"LOTTERY1"
+
+quick_pick_rng = np.random.default_rng()
+
+#/lotterystats flags a report this old, or made for other rules, as stale.
+STATS_MAX_AGE_SECONDS = 7 * 24 * 60 * 60
+#how to make (or remake) the report /lotterystats shows.
+STATS_COMMAND = f"python lottery_sim.py --out {LOTTERY_REPORT_FILE}"
+#a draw that starts this late after 4pm gets announced as a catch-up.
+DRAW_GRACE_SECONDS = 5 * 60
 
 def load_lottery():
     try:
         with open(LOTTERY_FILE, "r") as f:
             data = json.load(f)
             if "Jackpot" not in data:
-                data["Jackpot"] = 100000
-            if "Tickets" not in data:
-                data["Tickets"] = []
+                data["Jackpot"] = DEFAULT_JACKPOT
+            if "Draw" not in data:
+                data["Draw"] = 0
             return data
     except (FileNotFoundError, json.JSONDecodeError):
-        default_data = {"Jackpot": 100000, "Tickets": []}
+        default_data = {"Jackpot": DEFAULT_JACKPOT, "Draw": 0}
         save_lottery(default_data)
         return default_data
 
 def save_lottery(data):
-    with open(LOTTERY_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+    atomic_write_json(LOTTERY_FILE, data)
+
+def load_report():
+    try:
+        with open(LOTTERY_REPORT_FILE, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def report_mtime():
+    try:
+        return os.path.getmtime(LOTTERY_REPORT_FILE)
+    except FileNotFoundError:
+        return None
+
+def report_fresh(report):
+    if not report or report.get("rules") != rules():
+        return False
+    return time.time() - report.get("settings", {}).get("created", 0) < STATS_MAX_AGE_SECONDS
+
+def load_tickets():
+    #blocking. (state, tickets) from LOTTERY_TICKETS_FILE, state is the header as a dict
+    #or None for a missing file or one from before the header.
+    try:
+        with open(LOTTERY_TICKETS_FILE, "rb") as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return None, np.zeros(0, TICKET_DTYPE)
+    if raw[:len(TICKETS_MAGIC)] != TICKETS_MAGIC:
+        count = len(raw) // TICKET_DTYPE.itemsize
+        return None, np.frombuffer(raw, dtype=TICKET_DTYPE, count=count).copy()
+    _, seq, count, jackpot, draw = TICKETS_HEADER.unpack_from(raw)
+    #tickets past count are from an append whose header never got written, the journal
+    #replays them.
+    tickets = np.frombuffer(raw, dtype=TICKET_DTYPE, count=count, offset=TICKETS_HEADER.size).copy()
+    return {"seq": seq, "jackpot": jackpot, "draw": draw}, tickets
+
+def save_tickets(state, tickets, start):
+    #writes tickets from position start on, then the header that counts them. start 0
+    #replaces the file whole, otherwise the new tickets are appended.
+    header = TICKETS_HEADER.pack(TICKETS_MAGIC, state["seq"], start + len(tickets), state["jackpot"], state["draw"])
+    if start:
+        with open(LOTTERY_TICKETS_FILE, "r+b") as f:
+            f.seek(TICKETS_HEADER.size + start * TICKET_DTYPE.itemsize)
+            f.write(tickets.tobytes())
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+            f.seek(0)
+            f.write(header)
+            f.flush()
+            os.fsync(f.fileno())
+        return
+    tmp_path = LOTTERY_TICKETS_FILE + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(tickets.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, LOTTERY_TICKETS_FILE)
+
+class TicketBook:
+    #the open draw's tickets in one TICKET_DTYPE array that doubles when full, so a sale
+    #is a slice assignment and the draw hands the array straight to the payout math.
+    def __init__(self, tickets=None):
+        tickets = np.zeros(0, TICKET_DTYPE) if tickets is None else tickets
+        self.array = np.zeros(max(MIN_CAPACITY, len(tickets)), TICKET_DTYPE)
+        self.array[:len(tickets)] = tickets
+        self.count = len(tickets)
+        #tickets already in LOTTERY_TICKETS_FILE, the rest get appended on the next save.
+        self.saved = self.count
+        #set by a draw, the file has to be rewritten instead of appended to.
+        self.rewrite = False
+        #bumped by every draw so a save that was in flight during one is ignored.
+        self.generation = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, user_id, masks):
+        #user_id is one id for every ticket or an array with one per ticket.
+        masks = np.asarray(masks, dtype=np.uint64)
+        end = self.count + len(masks)
+        if end > len(self.array):
+            grown = np.zeros(max(end, 2 * len(self.array)), TICKET_DTYPE)
+            grown[:self.count] = self.array[:self.count]
+            self.array = grown
+        self.array["user_id"][self.count:end] = user_id if isinstance(user_id, np.ndarray) else int(user_id)
+        self.array["mask"][self.count:end] = masks
+        self.count = end
 
-def lottery_draw():
+    def add_legacy(self, tickets):
+        #tickets from the old lottery.json list, skipping any that aren't 5 valid numbers.
+        for ticket in tickets:
+            numbers = ticket.get("numbers", [])
+            if valid_numbers(numbers):
+                self.add(ticket["user_id"], [ticket_mask(numbers)])
+
+    def tickets(self):
+        #a view, sales while a draw runs go in after it and don't change it.
+        return self.array[:self.count]
+
+    def drop(self, count):
+        #a draw is over, its first `count` tickets leave and anything bought during it stays.
+        remaining = self.array[count:self.count]
+        self.array = np.zeros(max(MIN_CAPACITY, len(remaining)), TICKET_DTYPE)
+        self.array[:len(remaining)] = remaining
+        self.count = len(remaining)
+        self.saved = 0
+        self.rewrite = True
+        self.generation += 1
+
+    def pending_write(self):
+        #(generation, tickets, start) for save_tickets, copied so sales can go on.
+        start = 0 if self.rewrite else self.saved
+        return self.generation, self.array[start:self.count].copy(), start
+
+    def written(self, generation, count):
+        if generation == self.generation:
+            self.saved = count
+            self.rewrite = False
+
+def load_lottery_book():
+    #blocking. (lottery_data, tickets, seq) from the tickets file, or from lottery.json and
+    #any tickets still listed in it when the file has no header yet.
+    state, tickets = load_tickets()
+    if state is not None:
+        return {"Jackpot": state["jackpot"], "Draw": state["draw"]}, TicketBook(tickets), state["seq"]
     lottery_data = load_lottery()
-    jackpot = lottery_data.get("Jackpot", 100000)
-    tickets = lottery_data.get("Tickets", [])
-    drawn_numbers = random.sample(range(1, 61), 5)
-    drawn_set = set(drawn_numbers)
-    print(f"[Lottery] Drawn Numbers: {drawn_numbers}")
+    book = TicketBook(tickets)
+    legacy = lottery_data.pop("Tickets", None)
+    if legacy and not book.count:
+        book.add_legacy(legacy)
+    #written out with a header before anything is appended.
+    book.rewrite = True
+    return lottery_data, book, 0
 
-    winners = {1: [], 2: [], 3: [], 4: [], 5: []}
-    for ticket in tickets:
-        chosen = set(ticket.get("numbers", []))
-        if len(chosen) != 5:
-            continue
-        matches = len(chosen.intersection(drawn_set))
-        if matches >= 1:
-            #only record tickets with at least one match.
-            winners[matches].append(ticket["user_id"])
-
-    total_payout = 0
-    payouts = {}
-    fixed_percentages = {1: 0.20, 2: 0.40, 3: 0.60, 4: 0.80, 5: 1.00}
-
-    for matches, users in winners.items():
-        if users:
-            #the total group allocation is fixed percentage * jackpot.
-            group_allocation = fixed_percentages[matches] * jackpot
-            #each ticket in this group gets an equal share.
-            share = group_allocation / len(users)
-            for uid in users:
-                payouts[uid] = payouts.get(uid, 0) + share
-                total_payout += share
-
-    #calculate the new jackpot 
-    new_jackpot = jackpot - total_payout + 25000
-    lottery_data["Jackpot"] = new_jackpot
-    lottery_data["Tickets"] = []
-    save_lottery(lottery_data)
-    return drawn_numbers, payouts
+def ticket_effect(user_id, masks, numbers=None):
+    #the journal effect that puts a purchase in the book, fixed numbers are stored once.
+    if numbers:
+        return {"book": "lottery", "user_id": str(user_id), "mask": ticket_mask(numbers), "count": len(masks)}
+    return {"book": "lottery", "user_id": str(user_id), "masks": [int(mask) for mask in masks]}
+
+def next_draw_time(after):
+    #epoch of the first 4pm ET strictly after `after`, follows daylight saving.
+    after_et = datetime.datetime.fromtimestamp(after, ZoneInfo("America/New_York"))
+    target_et = after_et.replace(hour=16, minute=0, second=0, microsecond=0)
+    if target_et.timestamp() <= after:
+        target_et += datetime.timedelta(days=1)
+    return target_et.timestamp()
+
+def parse_numbers(numbers):
+    #(numbers, error) for a "1 2 3 4 5" option.
+    try:
+        chosen_numbers = [int(n) for n in numbers.split()]
+    except ValueError:
+        return None, "Invalid numbers. Please enter 5 numbers separated by spaces."
+    if not valid_numbers(chosen_numbers):
+        return None, "You must provide 5 unique numbers between 1 and 60."
+    return chosen_numbers, None
+
+def lottery_draw(jackpot, user_ids, masks):
+    #pure, so it can run on the io pool while new tickets go into the next draw.
+    drawn_numbers = draw_numbers()
+    print(f"[Lottery] Drawn Numbers: {drawn_numbers}")
+    return drawn_numbers, draw_payouts(jackpot, user_ids, masks, drawn_numbers)
 
 
 class LotteryCog(commands.Cog):
-    def __init__(self, bot: commands.Bot):
+    def __init__(self, bot: commands.Bot, lottery_data, tickets):
         self.bot = bot
-        #start the daily lottery draw task.
-        self.daily_task = tasks.loop(hours=24)(self.daily_lottery_draw)
-        self.daily_task.before_loop(self.before_daily_lottery_draw)
-        self.daily_task.start()
+        #lottery.json is read once at load, after that the cog owns it in memory and
+        #a burst of ticket sales is saved as one write.
+        self.lottery_data = lottery_data
+        self.tickets = tickets
+        economy.add_book("lottery", self.apply_effect, self.checkpoint)
+        #one draw at a time.
+        self.lottery_lock = asyncio.Lock()
+        #the simulator report /lotterystats shows, reread only when lottery_sim.py rewrote it.
+        self.stats_report = None
+        self.stats_mtime = None
 
-    @app_commands.guilds(discord.Object(id=GUILD_ID))
-    @app_commands.command(name="lotteryticket", description="Buy a lottery ticket for 1,000 Beaned Bucks. Choose 5 unique numbers from 1 to 60.")
-    async def lotteryticket(self, interaction: discord.Interaction, numbers: str):
-        try:
-            chosen_numbers = [int(n) for n in numbers.split()]
-        except ValueError:
-            await interaction.response.send_message("Invalid numbers. Please enter 5 numbers separated by spaces.", ephemeral=True)
+    def cog_unload(self):
+        scheduler.remove("lottery")
+
+    def apply_effect(self, effect):
+        #economy book hook, purchases and draws change the book the same way live and on replay.
+        if "draw" in effect:
+            #the draw's tickets are the first ones, anything bought while it ran stays for
+            #the next one and is already in the jackpot.
+            self.tickets.drop(effect["drop"])
+            self.lottery_data["Draw"] = effect["draw"]
+            self.lottery_data["Jackpot"] = next_jackpot(self.lottery_data.get("Jackpot", DEFAULT_JACKPOT), effect["paid"])
             return
+        if "masks" in effect:
+            masks = np.array(effect["masks"], dtype=np.uint64)
+        else:
+            masks = np.full(effect["count"], effect["mask"], dtype=np.uint64)
+        self.tickets.add(effect["user_id"], masks)
+        self.lottery_data["Jackpot"] = self.lottery_data.get("Jackpot", DEFAULT_JACKPOT) + len(masks) * TICKET_PRICE
+
+    def checkpoint(self):
+        #economy book hook, the state as of the journal's seq right now.
+        state = {"seq": economy.journal.seq, "jackpot": self.lottery_data.get("Jackpot", DEFAULT_JACKPOT), "draw": self.lottery_data.get("Draw", 0)}
+        generation, tickets, start = self.tickets.pending_write()
+        return functools.partial(self.write_checkpoint, state, generation, tickets, start)
 
-        if len(chosen_numbers) != 5 or len(set(chosen_numbers)) != 5 or any(n < 1 or n > 60 for n in chosen_numbers):
-            await interaction.response.send_message("You must provide 5 unique numbers between 1 and 60.", ephemeral=True)
+    async def write_checkpoint(self, state, generation, tickets, start):
+        await run_io(save_tickets, state, tickets, start)
+        self.tickets.written(generation, start + len(tickets))
+
+    async def buy_subscription_tickets(self, draw):
+        #every subscription due at this draw buys its tickets in one batch under one
+        #transaction. each user's debit is journaled with their tickets and their
+        #subscriptions moving on, so a restart never charges them twice for one draw.
+        #a user who can't cover all of their subscriptions loses them.
+        due = subscription_book.due(draw)
+        if not due:
+            return 0
+        by_user = {}
+        for subscription in due:
+            by_user.setdefault(subscription["user_id"], []).append(subscription)
+        #every due ticket is made up front in one go: fixed numbers are repeated, the 0
+        #masks left over are the quick picks. then split back up per user.
+        subscriptions = [s for user_subscriptions in by_user.values() for s in user_subscriptions]
+        counts = np.array([s["count"] for s in subscriptions])
+        masks = np.repeat(np.array([ticket_mask(s["numbers"]) if s["numbers"] else 0 for s in subscriptions], dtype=np.uint64), counts)
+        quick = masks == 0
+        masks[quick] = quick_picks(int(quick.sum()), quick_pick_rng)
+        ends = np.cumsum([sum(s["count"] for s in user_subscriptions) for user_subscriptions in by_user.values()])
+        user_masks = dict(zip(by_user, np.split(masks, ends[:-1])))
+        bought = 0
+        lapsed = []
+        async with economy.transaction(by_user.keys()) as tx:
+            for user_id, user_subscriptions in by_user.items():
+                if any(s["id"] not in subscription_book.subscriptions for s in user_subscriptions):
+                    #unsubscribed while the batch waited for the locks.
+                    continue
+                cost = len(user_masks[user_id]) * TICKET_PRICE
+                if tx.balance(user_id) < cost:
+                    lapsed.extend(user_subscriptions)
+                    continue
+                tx.adjust(user_id, -cost, "lottery subscription", effects=[
+                    ticket_effect(user_id, user_masks[user_id]),
+                    {"book": "subscriptions", "paid": [s["id"] for s in user_subscriptions], "next_draw": draw + 1},
+                ])
+                bought += len(user_masks[user_id])
+        if lapsed:
+            subscription_book.cancel(lapsed)
+            print(f"[Lottery] {len({s['user_id'] for s in lapsed})} users could not pay for their subscriptions, {len(lapsed)} cancelled.")
+        return bought
+
+    async def run_draw(self):
+        async with self.lottery_lock:
+            draw = self.lottery_data.get("Draw", 0)
+            bought = await self.buy_subscription_tickets(draw)
+            if bought:
+                print(f"[Lottery] {bought} subscription tickets bought for draw {draw}.")
+            #this draw's tickets, anything bought while it runs goes in after them.
+            tickets = self.tickets.tickets()
+            jackpot = self.lottery_data.get("Jackpot", DEFAULT_JACKPOT)
+            drawn_numbers, payouts = await run_io(lottery_draw, jackpot, tickets["user_id"], tickets["mask"])
+            #the winnings and the draw itself (its tickets leaving, the draw number moving on,
+            #the new jackpot) are one journal event, so a crash either pays and finishes the
+            #draw or leaves it to run again.
+            async with economy.transaction(payouts.keys()) as tx:
+                tx.adjust_many(payouts, "lottery", effects=[
+                    {"book": "lottery", "draw": draw + 1, "drop": len(tickets), "paid": sum(payouts.values())},
+                ])
+        return drawn_numbers, payouts
+
+    def winners_message(self, guild, payouts):
+        if not payouts:
+            return "No winning tickets this draw."
+        winners_msg = ""
+        for uid, amount in payouts.items():
+            member = guild.get_member(int(uid)) if guild else None
+            name = member.display_name if member else f"User {uid}"
+            winners_msg += f"{name} wins {amount:.2f} Beaned Bucks.\n"
+        return winners_msg
+
+    @app_commands.guilds(discord.Object(id=GUILD_ID))
+    @app_commands.command(name="lotteryticket", description="Buy lottery tickets for 1,000 Beaned Bucks each. Choose 5 unique numbers from 1 to 60.")
+    @app_commands.describe(
+    numbers="5 unique numbers from 1 to 60 separated by spaces, leave empty for quick picks",
+    count=f"Optional: How many tickets to buy, 1 to {MAX_TICKETS_PER_PURCHASE}"
+    )
+    async def lotteryticket(self, interaction: discord.Interaction, numbers: Optional[str] = None, count: int = 1):
+        if count < 1 or count > MAX_TICKETS_PER_PURCHASE:
+            await interaction.response.send_message(f"You can buy between 1 and {MAX_TICKETS_PER_PURCHASE} tickets at a time.", ephemeral=True)
             return
+        if numbers:
+            chosen_numbers, error = parse_numbers(numbers)
+            if error:
+                await interaction.response.send_message(error, ephemeral=True)
+                return
+            #the same numbers on every ticket.
+            masks = np.full(count, ticket_mask(chosen_numbers), dtype=np.uint64)
+        else:
+            masks = quick_picks(count, quick_pick_rng)
 
-        user_data = load_data()
+        #one debit for the whole purchase, journaled together with its tickets.
+        cost = count * TICKET_PRICE
         user_id = str(interaction.user.id)
-        user_record = user_data.get(user_id, {"balance": 0})
-        if user_record.get("balance", 0) < 1000:
-            await interaction.response.send_message("You do not have enough Beaned Bucks to buy a lottery ticket.", ephemeral=True)
+        async with economy.transaction(user_id) as tx:
+            can_afford = tx.balance(user_id) >= cost
+            if can_afford:
+                tx.adjust(user_id, -cost, "lottery ticket", effects=[ticket_effect(user_id, masks, chosen_numbers if numbers else None)])
+        if not can_afford:
+            await interaction.response.send_message(f"You do not have enough Beaned Bucks to buy {count} lottery ticket{'s' if count != 1 else ''}.", ephemeral=True)
             return
 
-        user_record["balance"] -= 1000
-        user_data[user_id] = user_record
-        save_data(user_data)
+        if count == 1:
+            message = f"Ticket purchased with numbers: {mask_numbers(int(masks[0]))}. {cost} Beaned Bucks deducted."
+        else:
+            shown = "\n".join(str(mask_numbers(int(mask))) for mask in masks[:SHOWN_TICKETS])
+            more = f"\n...and {count - SHOWN_TICKETS} more." if count > SHOWN_TICKETS else ""
+            message = f"{count} tickets purchased. {cost} Beaned Bucks deducted.\n{shown}{more}"
+        await interaction.response.send_message(message, ephemeral=False)
 
-        lottery_data = load_lottery()
-        lottery_data["Jackpot"] = lottery_data.get("Jackpot", 100000) + 1000
-        ticket = {"user_id": user_id, "numbers": sorted(chosen_numbers)}
-        lottery_data["Tickets"].append(ticket)
-        save_lottery(lottery_data)
+    @app_commands.guilds(discord.Object(id=GUILD_ID))
+    @app_commands.command(name="lotterysubscribe", description="Buy lottery tickets automatically before each of the next draws.")
+    @app_commands.describe(
+    draws=f"How many draws to play, 1 to {MAX_SUBSCRIPTION_DRAWS}",
+    numbers="5 unique numbers from 1 to 60 separated by spaces, leave empty for new quick picks every draw",
+    count=f"Optional: Tickets per draw, 1 to {MAX_TICKETS_PER_PURCHASE}"
+    )
+    async def lotterysubscribe(self, interaction: discord.Interaction, draws: int, numbers: Optional[str] = None, count: int = 1):
+        if draws < 1 or draws > MAX_SUBSCRIPTION_DRAWS:
+            await interaction.response.send_message(f"You can subscribe for between 1 and {MAX_SUBSCRIPTION_DRAWS} draws.", ephemeral=True)
+            return
+        if count < 1 or count > MAX_TICKETS_PER_PURCHASE:
+            await interaction.response.send_message(f"You can buy between 1 and {MAX_TICKETS_PER_PURCHASE} tickets per draw.", ephemeral=True)
+            return
+        chosen_numbers = None
+        if numbers:
+            chosen_numbers, error = parse_numbers(numbers)
+            if error:
+                await interaction.response.send_message(error, ephemeral=True)
+                return
+        user_id = str(interaction.user.id)
+        if len(subscription_book.user_subscriptions(user_id)) >= MAX_SUBSCRIPTIONS:
+            await interaction.response.send_message(f"You already have {MAX_SUBSCRIPTIONS} subscriptions. Use /lotteryunsubscribe first.", ephemeral=True)
+            return
+        subscription_book.subscribe(user_id, chosen_numbers, count, draws, self.lottery_data.get("Draw", 0))
+        picks = f"numbers {sorted(chosen_numbers)}" if chosen_numbers else "quick picks"
+        await interaction.response.send_message(
+            f"Subscribed to {count} ticket{'s' if count != 1 else ''} ({picks}) for the next {draws} draw{'s' if draws != 1 else ''}.\n"
+            f"{count * TICKET_PRICE} Beaned Bucks are taken right before each draw. If you can't cover it, the subscription ends.",
+            ephemeral=True
+        )
 
-        await interaction.response.send_message(f"Ticket purchased with numbers: {sorted(chosen_numbers)}. 1000 Beaned Bucks deducted.", ephemeral=False)
+    @app_commands.guilds(discord.Object(id=GUILD_ID))
+    @app_commands.command(name="lotteryunsubscribe", description="Cancel all of your lottery subscriptions.")
+    async def lotteryunsubscribe(self, interaction: discord.Interaction):
+        cancelled = subscription_book.cancel_user(interaction.user.id)
+        if not cancelled:
+            await interaction.response.send_message("You have no lottery subscriptions.", ephemeral=True)
+            return
+        await interaction.response.send_message(f"Cancelled {len(cancelled)} lottery subscription{'s' if len(cancelled) != 1 else ''}.", ephemeral=True)
 
     @app_commands.guilds(discord.Object(id=GUILD_ID))
     @app_commands.command(name="lotterytotal", description="View the current lottery jackpot.")
     async def lotterytotal(self, interaction: discord.Interaction):
-        lottery_data = load_lottery()
-        jackpot = lottery_data.get("Jackpot", 100000)
+        jackpot = self.lottery_data.get("Jackpot", DEFAULT_JACKPOT)
         await interaction.response.send_message(f"The current lottery jackpot is {jackpot} Beaned Bucks.", ephemeral=False)
 
     @app_commands.guilds(discord.Object(id=GUILD_ID))
@@ -122,62 +438,82 @@ class LotteryCog(commands.Cog):
         if not any(role.name.lower() == "him" for role in interaction.user.roles):
             await interaction.response.send_message("You do not have permission to run the lottery draw.", ephemeral=True)
             return
-        drawn_numbers, payouts = lottery_draw()
-        user_data = load_data()
-        winners_msg = ""
-        if payouts:
-            for uid, amount in payouts.items():
-                record = user_data.get(uid, {"balance": 0})
-                record["balance"] = record.get("balance", 0) + amount
-                user_data[uid] = record
-                member = interaction.guild.get_member(int(uid))
-                name = member.display_name if member else f"User {uid}"
-                winners_msg += f"{name} wins {amount:.2f} Beaned Bucks.\n"
-            save_data(user_data)
-        else:
-            winners_msg = "No winning tickets this draw."
+        drawn_numbers, payouts = await self.run_draw()
+        winners_msg = self.winners_message(interaction.guild, payouts)
         await interaction.response.send_message(f"Drawn Numbers: {drawn_numbers}\n{winners_msg}")
         
-    async def daily_lottery_draw(self):
-        drawn_numbers, payouts = lottery_draw()
-        user_data = load_data()
-        winners_msg = ""
-        if payouts:
-            for uid, amount in payouts.items():
-                record = user_data.get(uid, {"balance": 0})
-                record["balance"] = record.get("balance", 0) + amount
-                user_data[uid] = record
-                member = self.bot.get_guild(GUILD_ID).get_member(int(uid))
-                name = member.display_name if member else f"User {uid}"
-                winners_msg += f"{name} wins {amount:.2f} Beaned Bucks.\n"
-            save_data(user_data)
-        else:
-            winners_msg = "No winning tickets this draw."
+    async def lottery_report(self):
+        #the simulator is never run in the bot, it takes a process pool and minutes of
+        #cpu. lottery_sim.py writes the report offline and this just reads it.
+        mtime = await run_io(report_mtime)
+        if mtime != self.stats_mtime:
+            self.stats_report = await run_io(load_report) if mtime is not None else None
+            self.stats_mtime = mtime
+        return self.stats_report
+
+    @app_commands.guilds(discord.Object(id=GUILD_ID))
+    @app_commands.command(name="lotterystats", description="Lottery house edge and ticket value from the simulator. (Restricted to lottery admins.)")
+    async def lotterystats(self, interaction: discord.Interaction):
+        if not any(role.name.lower() == "him" for role in interaction.user.roles):
+            await interaction.response.send_message("You do not have permission to view the lottery stats.", ephemeral=True)
+            return
+        report = await self.lottery_report()
+        if report is None:
+            await interaction.response.send_message(f"There is no simulator report yet. Run `{STATS_COMMAND}` on the bot's host.", ephemeral=True)
+            return
+        embed = discord.Embed(
+            title="Lottery Simulator Report",
+            description=(
+                f"{report['paths']} simulated histories of {report['draws']} draws per ticket volume, "
+                f"quick picks, starting from a {report['start_jackpot']} jackpot."
+            ),
+            color=discord.Color.gold()
+        )
+        for stats in report["volumes"].values():
+            jackpot = stats["jackpot"]["percentiles"]
+            embed.add_field(
+                name=f"{stats['tickets_per_draw']} tickets per draw",
+                value=(
+                    f"Ticket EV: {stats['ticket_ev']} Beaned Bucks | House edge: {stats['house_edge']:.2%}\n"
+                    f"Paid per draw: {stats['paid_per_draw']} | Jackpot below 0: {stats['negative_jackpot_probability']:.2%}\n"
+                    f"Jackpot after {stats['jackpot']['draws'][-1]} draws: {jackpot['p50'][-1]} "
+                    f"(p5 {jackpot['p5'][-1]}, p95 {jackpot['p95'][-1]})"
+                ),
+                inline=False
+            )
+        created = datetime.datetime.fromtimestamp(report["settings"]["created"]).strftime("%Y-%m-%d %H:%M")
+        footer = f"Simulated {created} in {report['settings']['seconds']}s."
+        if not report_fresh(report):
+            footer += f" Out of date, run {STATS_COMMAND} again."
+        embed.set_footer(text=footer)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    async def daily_lottery_draw(self, times=None):
+        #scheduler job. draws missed while the bot was down come in as one catch-up run,
+        #there's only one pot of tickets to draw from anyway.
+        late = times is not None and time.time() - times[-1] > DRAW_GRACE_SECONDS
+        drawn_numbers, payouts = await self.run_draw()
+        winners_msg = self.winners_message(self.bot.get_guild(GUILD_ID), payouts)
         channel = discord.utils.get(self.bot.get_all_channels(), name="bot-output")
         if channel:
-            await channel.send(f"Daily Lottery Draw at 4pm ET:\nDrawn Numbers: {drawn_numbers}\n{winners_msg}")
+            title = "Daily Lottery Draw at 4pm ET (caught up after downtime)" if late else "Daily Lottery Draw at 4pm ET"
+            await channel.send(f"{title}:\nDrawn Numbers: {drawn_numbers}\n{winners_msg}")
         else:
             print("Channel not found for lottery.")
 
-    async def before_daily_lottery_draw(self):
-        now_et = datetime.datetime.now(ZoneInfo("America/New_York"))
-        target_et = now_et.replace(hour=16, minute=0, second=0, microsecond=0)
-        
-        #if we're before 4pm, wait until 4pm.
-        if now_et < target_et:
-            delay = (target_et - now_et).total_seconds()
-        #if we're between 4:00 and 4:05 pm, run immediately.
-        elif now_et <= target_et + datetime.timedelta(minutes=5):
-            delay = 0
-        else:
-            #if we're more than 5 minutes past 4pm, schedule for tomorrow at 4pm.
-            target_et += datetime.timedelta(days=1)
-            delay = (target_et - now_et).total_seconds()
-        
-        print(f"Waiting {delay} seconds until next lottery draw.")
-        await asyncio.sleep(delay)
-
 
 async def setup(bot: commands.Bot):
     print("Loading LotteryCog...")
-    await bot.add_cog(LotteryCog(bot))
+    lottery_data, tickets, seq = await run_io(load_lottery_book)
+    subscriptions = await run_io(load_subscriptions)
+    subscription_book.load(subscriptions)
+    economy.add_book("subscriptions", subscription_book.apply, subscription_book.checkpoint)
+    cog = LotteryCog(bot, lottery_data, tickets)
+    economy.replay_book("subscriptions", subscriptions.get("seq", 0))
+    economy.replay_book("lottery", seq)
+    if not seq:
+        #moved over from lottery.json, written out with a header right away.
+        await economy.save_book("lottery")
+    await bot.add_cog(cog)
+    #on a fresh install a start between 4:00 and 4:05pm still makes that day's draw.
+    scheduler.add("lottery", cog.daily_lottery_draw, next_draw_time, first_run=next_draw_time(time.time() - DRAW_GRACE_SECONDS))
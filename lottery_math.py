@@ -0,0 +1,82 @@
+#lottery_math.py
+#the lottery's rules and payout math, no discord and no files, so the draw can run on
+#the io pool and offline scripts can replay it exactly.
+#
+#a ticket is its 5 numbers as bits of one uint64 (bit n set for number n), and the
+#tickets of a draw are one TICKET_DTYPE array. matching a draw against every ticket is
+#then a single AND plus a popcount over the masks, and the tier payouts come out of a
+#bincount instead of a python set per ticket.
+#    masks = np.array([ticket_mask([3, 14, 15, 22, 60])], dtype=np.uint64)
+#    payouts = draw_payouts(jackpot, user_ids, masks, draw_numbers())
+import random
+import numpy as np
+
+LOWEST_NUMBER = 1
+HIGHEST_NUMBER = 60
+PICKS = 5
+TICKET_PRICE = 1000
+DEFAULT_JACKPOT = 100000
+#added to the jackpot after every draw.
+CARRYOVER = 25000
+#share of the jackpot each tier (numbers matched) splits evenly between its tickets.
+TIER_PERCENTAGES = {1: 0.20, 2: 0.40, 3: 0.60, 4: 0.80, 5: 1.00}
+#one ticket, 16 bytes in memory and on disk.
+TICKET_DTYPE = np.dtype([("user_id", "<u8"), ("mask", "<u8")])
+
+def valid_numbers(numbers):
+    return (
+        len(numbers) == PICKS
+        and len(set(numbers)) == PICKS
+        and all(LOWEST_NUMBER <= n <= HIGHEST_NUMBER for n in numbers)
+    )
+
+def ticket_mask(numbers):
+    mask = 0
+    for n in numbers:
+        mask |= 1 << n
+    return mask
+
+def mask_numbers(mask):
+    return [n for n in range(LOWEST_NUMBER, HIGHEST_NUMBER + 1) if mask >> n & 1]
+
+def draw_numbers(rng=random):
+    return rng.sample(range(LOWEST_NUMBER, HIGHEST_NUMBER + 1), PICKS)
+
+def quick_picks(count, rng):
+    #count random tickets as masks, each one 5 distinct numbers. rows that rolled a
+    #number twice (about 1 in 6) come out with fewer bits and are simply rolled again.
+    masks = np.zeros(count, dtype=np.uint64)
+    redo = np.arange(count)
+    while len(redo):
+        numbers = rng.integers(LOWEST_NUMBER, HIGHEST_NUMBER + 1, (len(redo), PICKS), dtype=np.uint64)
+        masks[redo] = np.bitwise_or.reduce(np.left_shift(np.uint64(1), numbers), axis=1)
+        redo = redo[np.bitwise_count(masks[redo]) != PICKS]
+    return masks
+
+def match_counts(masks, drawn_mask):
+    #numbers each ticket matched, one uint8 per ticket.
+    return np.bitwise_count(masks & np.uint64(drawn_mask))
+
+def tier_shares(jackpot, matches):
+    #(tickets per tier, what one ticket in each tier wins), both indexed by match count.
+    counts = np.bincount(matches, minlength=PICKS + 1)
+    shares = np.zeros(PICKS + 1)
+    for tier, percentage in TIER_PERCENTAGES.items():
+        if counts[tier]:
+            shares[tier] = percentage * jackpot / counts[tier]
+    return counts, shares
+
+def draw_payouts(jackpot, user_ids, masks, drawn_numbers):
+    #{user id: total won} for one draw, a user with several winning tickets gets them all.
+    matches = match_counts(masks, ticket_mask(drawn_numbers))
+    _, shares = tier_shares(jackpot, matches)
+    won = shares[matches]
+    winners = won > 0
+    if not winners.any():
+        return {}
+    users, index = np.unique(user_ids[winners], return_inverse=True)
+    totals = np.bincount(index, weights=won[winners])
+    return {str(user_id): total for user_id, total in zip(users.tolist(), totals.tolist())}
+
+def next_jackpot(jackpot, paid):
+    return jackpot - paid + CARRYOVER
@@ -0,0 +1,165 @@
+#lottery_sim.py
+#offline monte carlo for the lottery. replays thousands of independent lottery
+#histories, draw after draw, through the same payout code the bot uses
+#(lottery_math.draw_payouts and next_jackpot) on a process pool, and reports what a
+#ticket is worth, the house edge and where the jackpot goes. players buy quick picks,
+#a Poisson number of tickets per draw around each volume asked for.
+#    python lottery_sim.py --tickets 10 100 1000 --paths 2000 --draws 365
+#    python lottery_sim.py --out lottery_report.json
+#the bot never runs this itself, /lotterystats only shows the LOTTERY_REPORT_FILE written here.
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from lottery_math import (
+    CARRYOVER, DEFAULT_JACKPOT, TICKET_PRICE, TIER_PERCENTAGES,
+    draw_numbers, draw_payouts, next_jackpot, quick_picks,
+)
+
+DEFAULT_VOLUMES = (10, 100, 1000)
+#points along each history the jackpot is sampled at.
+CHECKPOINTS = 10
+PERCENTILES = (5, 25, 50, 75, 95)
+
+def rules():
+    #everything the report depends on, a cached report for other rules is stale.
+    return {
+        "ticket_price": TICKET_PRICE,
+        "default_jackpot": DEFAULT_JACKPOT,
+        "carryover": CARRYOVER,
+        "tiers": {str(tier): percentage for tier, percentage in TIER_PERCENTAGES.items()},
+    }
+
+def checkpoints(draws):
+    return sorted({max(0, round(draws * (i + 1) / CHECKPOINTS) - 1) for i in range(CHECKPOINTS)})
+
+def simulate_chunk(paths, draws, tickets, players, jackpot, seed):
+    #runs `paths` lottery histories one after the other, returns per path totals and
+    #the jackpot at each checkpoint.
+    rng = np.random.default_rng(seed)
+    draw_rng = random.Random(int(rng.integers(2**63)))
+    user_pool = np.arange(1, players + 1, dtype=np.uint64)
+    sampled = checkpoints(draws)
+    trajectory = np.zeros((paths, len(sampled)))
+    sold = np.zeros(paths)
+    paid = np.zeros(paths)
+    lowest = np.zeros(paths)
+    for path in range(paths):
+        #the whole history's tickets are generated up front, each draw takes its slice.
+        counts = rng.poisson(tickets, draws)
+        ends = np.cumsum(counts).tolist()
+        masks = quick_picks(ends[-1], rng)
+        user_ids = user_pool[rng.integers(0, players, ends[-1])]
+        current = jackpot
+        low = current
+        column = 0
+        start = 0
+        for draw, count in enumerate(counts.tolist()):
+            end = ends[draw]
+            #sales go into the pot before the draw, like /lotteryticket.
+            current += count * TICKET_PRICE
+            payouts = draw_payouts(current, user_ids[start:end], masks[start:end], draw_numbers(draw_rng))
+            start = end
+            won = sum(payouts.values())
+            current = next_jackpot(current, won)
+            sold[path] += count
+            paid[path] += won
+            low = min(low, current)
+            if draw == sampled[column]:
+                trajectory[path, column] = current
+                column += 1
+        lowest[path] = low
+    return {"tickets": sold, "paid": paid, "lowest": lowest, "trajectory": trajectory}
+
+def _run_chunk(args):
+    return args[0], simulate_chunk(*args[1:])
+
+def simulate(volumes, paths, draws, players=50, jackpot=DEFAULT_JACKPOT, seed=None, workers=None, mp_context=None):
+    #{volume: merged arrays}, every volume's paths are split into chunks across the pool.
+    workers = workers or os.cpu_count() or 1
+    chunks = min(workers * 4, paths)
+    sizes = [paths // chunks + (1 if i < paths % chunks else 0) for i in range(chunks)]
+    seeds = np.random.SeedSequence(seed).spawn(chunks * len(volumes))
+    jobs = []
+    for index, volume in enumerate(volumes):
+        for size, child in zip(sizes, seeds[index * chunks:(index + 1) * chunks]):
+            jobs.append((volume, size, draws, volume, players, jackpot, child))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+        parts = list(pool.map(_run_chunk, jobs))
+    results = {}
+    for volume in volumes:
+        chunk_results = [part for key, part in parts if key == volume]
+        results[volume] = {key: np.concatenate([part[key] for part in chunk_results]) for key in chunk_results[0]}
+    return results
+
+def report(results, draws, jackpot=DEFAULT_JACKPOT):
+    summary = {"draws": draws, "start_jackpot": jackpot, "rules": rules(), "volumes": {}}
+    sampled = checkpoints(draws)
+    for volume, result in results.items():
+        tickets = float(result["tickets"].sum())
+        paid = float(result["paid"].sum())
+        sales = tickets * TICKET_PRICE
+        return_to_player = paid / sales if sales else None
+        summary["paths"] = len(result["paid"])
+        summary["volumes"][str(volume)] = {
+            "tickets_per_draw": volume,
+            "ticket_ev": round(paid / tickets - TICKET_PRICE, 2) if tickets else None,
+            "return_to_player": round(return_to_player, 4) if return_to_player is not None else None,
+            "house_edge": round(1 - return_to_player, 4) if return_to_player is not None else None,
+            "paid_per_draw": round(paid / (len(result["paid"]) * draws), 2),
+            "negative_jackpot_probability": round(float((result["lowest"] < 0).mean()), 4),
+            "jackpot": {
+                "draws": [draw + 1 for draw in sampled],
+                "mean": [round(float(value), 2) for value in result["trajectory"].mean(axis=0)],
+                "percentiles": {
+                    f"p{pct}": [round(float(value), 2) for value in row]
+                    for pct, row in zip(PERCENTILES, np.percentile(result["trajectory"], PERCENTILES, axis=0))
+                },
+            },
+        }
+    return summary
+
+def print_report(summary):
+    print(f"{summary['paths']} paths x {summary['draws']} draws per volume, starting jackpot {summary['start_jackpot']}\n")
+    print(f"{'tickets/draw':>13}{'ticket EV':>14}{'house edge':>12}{'paid/draw':>14}{'jackpot < 0':>13}{'final p50':>16}")
+    for stats in summary["volumes"].values():
+        final = stats["jackpot"]["percentiles"]["p50"][-1]
+        edge = f"{stats['house_edge']:.2%}" if stats["house_edge"] is not None else "-"
+        ev = f"{stats['ticket_ev']:.2f}" if stats["ticket_ev"] is not None else "-"
+        print(
+            f"{stats['tickets_per_draw']:>13}{ev:>14}{edge:>12}{stats['paid_per_draw']:>14.2f}"
+            f"{stats['negative_jackpot_probability']:>13.2%}{final:>16.2f}"
+        )
+    print("\njackpot p50 by draw:")
+    for stats in summary["volumes"].values():
+        points = ", ".join(f"{draw}: {value:.0f}" for draw, value in zip(stats["jackpot"]["draws"], stats["jackpot"]["percentiles"]["p50"]))
+        print(f"  {stats['tickets_per_draw']:>6} tickets/draw  {points}")
+
+def run_report(volumes=DEFAULT_VOLUMES, paths=2000, draws=365, players=50, jackpot=DEFAULT_JACKPOT, seed=None, workers=None, mp_context=None):
+    started = time.perf_counter()
+    results = simulate(volumes, paths, draws, players, jackpot, seed, workers, mp_context)
+    summary = report(results, draws, jackpot)
+    summary["settings"] = {"players": players, "seed": seed, "seconds": round(time.perf_counter() - started, 1), "created": time.time()}
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo simulation of the lottery payouts.")
+    parser.add_argument("--tickets", type=int, nargs="+", default=list(DEFAULT_VOLUMES), help="average tickets sold per draw, one simulation each")
+    parser.add_argument("--paths", type=int, default=2000, help="independent lottery histories per volume")
+    parser.add_argument("--draws", type=int, default=365, help="draws per history")
+    parser.add_argument("--players", type=int, default=50, help="distinct players the tickets are spread over")
+    parser.add_argument("--jackpot", type=float, default=DEFAULT_JACKPOT, help="starting jackpot")
+    parser.add_argument("--workers", type=int, default=None, help="processes to use (default: all cores)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--out", help="also write the report as json here")
+    args = parser.parse_args()
+
+    summary = run_report(args.tickets, args.paths, args.draws, args.players, args.jackpot, args.seed, args.workers)
+    print_report(summary)
+    print(f"\nfinished in {summary['settings']['seconds']:.1f}s")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(summary, f, indent=4)
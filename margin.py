@@ -0,0 +1,286 @@
+#margin.py
+#leveraged longs (/stockbuy with leverage) and shorts (/stockshort). an open position
+#lives in the user's record next to the portfolio, as
+#    {"side": "long" | "short", "shares": ..., "entry": ..., "margin": ..., "cash": ...}
+#where margin is what the user put up and cash is the position's cash leg, the borrowed
+#amount as a negative number for longs, margin plus the short sale for shorts. so at any
+#price a position is worth
+#    long:  cash + shares * price
+#    short: cash - shares * price
+#and it's liquidated once that drops under MAINTENANCE_MARGIN of the shares' value.
+#
+#every position's liquidation price goes into a per-symbol heap (longs fall into it,
+#shorts rise into it), so a market tick only looks at the positions it actually crossed.
+#the heaps follow the economy store through its listener hook, reopened or closed
+#positions leave a stale entry behind that's skipped when it surfaces.
+#    liquidations = await liquidate_positions({"INK": 287.5})
+import discord
+from discord import app_commands
+from discord.ext import commands
+import heapq
+from globals import GUILD_ID
+from economy import economy
+from prices import price_feed
+
+MAX_LEVERAGE = 5
+#share of the position's market value the equity has to stay above. has to be under
+#1 / MAX_LEVERAGE, otherwise a max leverage position opens already under water.
+MAINTENANCE_MARGIN = 0.10
+#rebuild the heaps once this many stale entries are sitting in them.
+STALE_LIMIT = 256
+
+def open_position(side, margin, leverage, price):
+    notional = margin * leverage
+    shares = notional / price
+    cash = margin - notional if side == "long" else margin + notional
+    return {"side": side, "shares": shares, "entry": price, "margin": margin, "cash": cash}
+
+def merge_position(position, added):
+    #adding to a position, the value is linear so the legs just add up.
+    shares = position["shares"] + added["shares"]
+    return {
+        "side": position["side"],
+        "shares": shares,
+        "entry": (position["entry"] * position["shares"] + added["entry"] * added["shares"]) / shares,
+        "margin": position["margin"] + added["margin"],
+        "cash": position["cash"] + added["cash"],
+    }
+
+def position_equity(position, price):
+    if position["side"] == "long":
+        return position["cash"] + position["shares"] * price
+    return position["cash"] - position["shares"] * price
+
+def liquidation_price(position):
+    #price at which equity hits the maintenance margin, None if it never can.
+    shares = position["shares"]
+    if position["side"] == "long":
+        if position["cash"] >= 0:
+            return None
+        return -position["cash"] / (shares * (1 - MAINTENANCE_MARGIN))
+    return position["cash"] / (shares * (1 + MAINTENANCE_MARGIN))
+
+def should_liquidate(position, price):
+    return position_equity(position, price) < MAINTENANCE_MARGIN * position["shares"] * price
+
+def close_value(position, price):
+    #what closing pays out, losses past the margin are the house's problem.
+    return max(0.0, round(position_equity(position, price), 2))
+
+class LiquidationBook:
+    def __init__(self):
+        #symbol -> ([(-price, user id)] longs, [(price, user id)] shorts)
+        self.heaps = {}
+        #user id -> {symbol: liquidation price} for every live heap entry.
+        self.by_user = {}
+        self.stale = 0
+        self.store = None
+
+    def attach(self, store):
+        #indexes a loaded store and follows its changes from then on.
+        self.store = store
+        self.heaps = {}
+        self.by_user = {}
+        self.stale = 0
+        for user_id, record in store.items():
+            if record.positions:
+                self.changed(user_id, record)
+        if self.changed not in store.listeners:
+            store.add_listener(self.changed)
+
+    def _push(self, user_id, symbol, side, price):
+        longs, shorts = self.heaps.setdefault(symbol, ([], []))
+        if side == "long":
+            heapq.heappush(longs, (-price, user_id))
+        else:
+            heapq.heappush(shorts, (price, user_id))
+
+    def changed(self, user_id, record):
+        #economy listener, cheap for the common case of a user without positions.
+        known = self.by_user.get(user_id)
+        if not record.positions and not known:
+            return
+        known = known or {}
+        current = {}
+        for symbol, position in record.positions.items():
+            price = liquidation_price(position)
+            if price is None:
+                continue
+            current[symbol] = price
+            if known.get(symbol) != price:
+                self._push(user_id, symbol, position["side"], price)
+        self.stale += sum(1 for symbol, price in known.items() if current.get(symbol) != price)
+        if current:
+            self.by_user[user_id] = current
+        else:
+            self.by_user.pop(user_id, None)
+        if self.stale > STALE_LIMIT and self.stale > len(self.by_user):
+            self._rebuild()
+
+    def _rebuild(self):
+        self.heaps = {}
+        self.stale = 0
+        for user_id, entries in self.by_user.items():
+            for symbol, price in entries.items():
+                #the heap only needs the side, and that follows from the record it came from.
+                side = self.store.get(user_id).positions[symbol]["side"]
+                self._push(user_id, symbol, side, price)
+
+    def _live(self, user_id, symbol, price):
+        entries = self.by_user.get(user_id)
+        return entries is not None and entries.get(symbol) == price
+
+    def triggered(self, prices):
+        #pops the (user id, symbol) of every position the prices crossed.
+        crossed = []
+        for symbol, price in prices.items():
+            heaps = self.heaps.get(symbol)
+            if heaps is None:
+                continue
+            longs, shorts = heaps
+            while longs and -longs[0][0] >= price:
+                key, user_id = heapq.heappop(longs)
+                crossed.append((user_id, symbol, -key))
+            while shorts and shorts[0][0] <= price:
+                key, user_id = heapq.heappop(shorts)
+                crossed.append((user_id, symbol, key))
+        positions = []
+        for user_id, symbol, price in crossed:
+            if not self._live(user_id, symbol, price):
+                self.stale -= 1
+                continue
+            del self.by_user[user_id][symbol]
+            if not self.by_user[user_id]:
+                del self.by_user[user_id]
+            positions.append((user_id, symbol))
+        return positions
+
+#the one liquidation index every cog shares
+liquidation_book = LiquidationBook()
+
+async def liquidate_positions(prices):
+    #closes every position the new prices pushed under maintenance, returns what happened.
+    crossed = liquidation_book.triggered(prices)
+    if not crossed:
+        return []
+    liquidations = []
+    async with economy.transaction({user_id for user_id, _ in crossed}) as tx:
+        for user_id, symbol in crossed:
+            user_record = tx.get(user_id)
+            position = user_record.positions.get(symbol)
+            price = prices[symbol]
+            if position is None or not should_liquidate(position, price):
+                #closed, changed or sitting right on the line since it was popped, make
+                #sure whatever is left is indexed again.
+                liquidation_book.changed(int(user_id), user_record)
+                continue
+            payout = close_value(position, price)
+            del user_record.positions[symbol]
+            user_record.balance += payout
+            user_record.total_earned += payout
+            tx.put(user_id, user_record, f"liquidation {symbol}")
+            liquidations.append({"user_id": user_id, "symbol": symbol, "position": position, "price": price, "payout": payout})
+    return liquidations
+
+async def open_margin_position(user_id, symbol, side, margin, leverage, price):
+    #takes the margin from the balance and opens (or adds to) the position.
+    #returns (position, error), margin None means the whole balance.
+    if leverage < 1 or leverage > MAX_LEVERAGE:
+        return None, f"Leverage must be between 1 and {MAX_LEVERAGE}."
+    async with economy.transaction(user_id) as tx:
+        user_record = tx.get(user_id)
+        current_balance = float(user_record.balance)
+        if margin is None:
+            margin = current_balance
+        if margin <= 0:
+            return None, "Amount must be greater than 0."
+        if margin > current_balance:
+            return None, f"You do not have enough Beaned Bucks to put up {margin}."
+        existing = user_record.positions.get(symbol)
+        if existing is not None and existing["side"] != side:
+            return None, f"You already have a {existing['side']} position in {symbol}. Close it with /stockclose first."
+        position = open_position(side, margin, leverage, price)
+        if existing is not None:
+            position = merge_position(existing, position)
+        user_record.balance = current_balance - margin
+        user_record.total_spent += margin
+        user_record.positions[symbol] = position
+        tx.put(user_id, user_record, f"open {side} {symbol}")
+    return position, None
+
+def describe_position(symbol, position, price):
+    equity = position_equity(position, price)
+    liquidation = liquidation_price(position)
+    return (
+        f"{position['side'].capitalize()} {round(position['shares'], 4)} shares of {symbol} from {round(position['entry'], 2)}\n"
+        f"Margin: {round(position['margin'], 2)} | Equity: {round(equity, 2)} Beaned Bucks\n"
+        f"Liquidation at: {round(liquidation, 2) if liquidation is not None else 'never'}"
+    )
+
+
+class MarginCog(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @app_commands.guilds(discord.Object(id=GUILD_ID))
+    @app_commands.command(name="stockshort", description="Short a stock, you profit if the price falls.")
+    @app_commands.describe(
+    stock="Stock symbol (e.g. ACME)",
+    amount="Beaned Bucks to put up as margin (or 'all')",
+    leverage=f"Optional: Position size as a multiple of the margin, 1 to {MAX_LEVERAGE}"
+    )
+    async def stockshort(self, interaction: discord.Interaction, stock: str, amount: str, leverage: int = 1):
+        stocks_data = price_feed.current()
+        stock = stock.upper()
+        if stock not in stocks_data:
+            await interaction.response.send_message("Invalid stock symbol.", ephemeral=True)
+            return
+        margin = None
+        if amount.lower() != "all":
+            try:
+                margin = float(amount)
+            except ValueError:
+                await interaction.response.send_message("Invalid amount.", ephemeral=True)
+                return
+        price = stocks_data[stock]
+        position, error = await open_margin_position(str(interaction.user.id), stock, "short", margin, leverage, price)
+        if error:
+            await interaction.response.send_message(error, ephemeral=True)
+            return
+        await interaction.response.send_message(f"Short opened at {price}.\n{describe_position(stock, position, price)}")
+
+    @app_commands.guilds(discord.Object(id=GUILD_ID))
+    @app_commands.command(name="stockclose", description="Close your leveraged or short position in a stock.")
+    @app_commands.describe(stock="Stock symbol of the position to close")
+    async def stockclose(self, interaction: discord.Interaction, stock: str):
+        stocks_data = price_feed.current()
+        stock = stock.upper()
+        if stock not in stocks_data:
+            await interaction.response.send_message("Invalid stock symbol.", ephemeral=True)
+            return
+        price = stocks_data[stock]
+        user_id = str(interaction.user.id)
+        async with economy.transaction(user_id) as tx:
+            user_record = tx.get(user_id)
+            position = user_record.positions.pop(stock, None)
+            if position is not None:
+                payout = close_value(position, price)
+                user_record.balance += payout
+                user_record.total_earned += payout
+                tx.put(user_id, user_record, f"close {stock}")
+                new_balance = user_record.balance
+        if position is None:
+            await interaction.response.send_message("You have no open position in that stock.", ephemeral=True)
+            return
+        profit = round(payout - position["margin"], 2)
+        await interaction.response.send_message(
+            f"Closed your {position['side']} position in {stock} at {price} for {payout} Beaned Bucks "
+            f"({'+' if profit >= 0 else ''}{profit} on your margin).\n"
+            f"Your new balance is {new_balance} Beaned Bucks."
+        )
+
+
+async def setup(bot: commands.Bot):
+    print("Loading MarginCog...")
+    liquidation_book.attach(economy)
+    await bot.add_cog(MarginCog(bot))
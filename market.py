@@ -0,0 +1,142 @@
+#market.py
+#the stock price model, vectorized. every symbol's parameters live in numpy arrays and a
+#tick draws all of its random numbers at once, so the rally/crash/jump/normal rules are
+#masked array operations instead of a branch per symbol. the random numbers come from a
+#seeded numpy Generator, the same seed and starting prices give the same market.
+#
+#nothing here touches discord, globals or files, the simulators import it as-is.
+#    engine = MarketEngine.from_prices({"INK": 300.0, "BEANEDCOIN": 10.0}, seed=42)
+#    event = engine.choose_event()
+#    new_prices = engine.step(event)
+import numpy as np
+
+#market-wide event odds per tick, an event lasts EVENT_DURATION ticks (inclusive).
+EVENT_WEIGHTS = {"none": 0.96, "rally": 0.02, "crash": 0.02}
+EVENT_DURATION = (1, 3)
+#+1 pushes prices up, -1 down, 0 is a normal tick.
+EVENT_DIRECTION = {"rally": 1, "crash": -1}
+
+#prices are rounded to cents and never drop below this.
+PRICE_FLOOR = 0.01
+
+#per-kind tick rules: normal move range, event move range and how often the event move
+#happens while an event is on, plus the rare big jump outside of events.
+COIN_PARAMS = {
+    "normal": (0.005, 0.20),
+    "event": (0.10, 0.50),
+    "event_chance": 0.70,
+    "jump_chance": 0.0,
+    "jump": (0.5, 0.95),
+}
+STOCK_PARAMS = {
+    "normal": (0.005, 0.05),
+    "event": (0.10, 0.20),
+    "event_chance": 0.70,
+    "jump_chance": 0.01,
+    "jump": (0.5, 0.95),
+}
+
+def is_coin(symbol):
+    return "COIN" in symbol.upper()
+
+def default_sector(symbol):
+    return "coin" if is_coin(symbol) else "stock"
+
+class MarketParams:
+    #the per-symbol rule arrays, one slot per symbol in engine order. the simulator passes
+    #its own coin/stock rules to try out different volatility.
+    def __init__(self, symbols, coin=COIN_PARAMS, stock=STOCK_PARAMS):
+        kinds = [coin if is_coin(symbol) else stock for symbol in symbols]
+        self.normal_low = np.array([kind["normal"][0] for kind in kinds])
+        self.normal_high = np.array([kind["normal"][1] for kind in kinds])
+        self.event_low = np.array([kind["event"][0] for kind in kinds])
+        self.event_high = np.array([kind["event"][1] for kind in kinds])
+        self.event_chance = np.array([kind["event_chance"] for kind in kinds])
+        self.jump_chance = np.array([kind["jump_chance"] for kind in kinds])
+        self.jump_low = np.array([kind["jump"][0] for kind in kinds])
+        self.jump_high = np.array([kind["jump"][1] for kind in kinds])
+
+def step_prices(prices, direction, params, rng):
+    #one tick for prices shaped (..., symbols). direction broadcasts against prices:
+    #+1 rally, -1 crash, 0 no event. the same number of draws is made whatever the
+    #event, so a seed replays identically.
+    shape = prices.shape
+    sign = np.where(rng.random(shape) < 0.5, -1.0, 1.0)
+    normal = rng.uniform(params.normal_low, params.normal_high, shape) * sign
+    event_hit = rng.random(shape) < params.event_chance
+    event_move = rng.uniform(params.event_low, params.event_high, shape)
+    jump_hit = rng.random(shape) < params.jump_chance
+    jump_move = rng.uniform(params.jump_low, params.jump_high, shape) * np.where(rng.random(shape) < 0.5, 1.0, -1.0)
+
+    direction = np.broadcast_to(direction, shape)
+    in_event = direction != 0
+    change = normal
+    #during an event most ticks take the event move, the rest fluctuate normally.
+    change = np.where(in_event & event_hit, event_move * direction, change)
+    #outside events a few symbols make a big jump either way.
+    change = np.where(~in_event & jump_hit, jump_move, change)
+    return np.maximum(np.round(prices * (1 + change), 2), PRICE_FLOOR)
+
+def choose_events(rng, size, weights=EVENT_WEIGHTS):
+    #vectorized event pick for `size` independent markets: (direction, duration) arrays,
+    #duration is 0 where no event started.
+    names = list(weights)
+    probabilities = np.array([weights[name] for name in names], dtype=float)
+    picks = rng.choice(len(names), size=size, p=probabilities / probabilities.sum())
+    lookup = np.array([EVENT_DIRECTION.get(name, 0) for name in names])
+    direction = lookup[picks]
+    duration = rng.integers(EVENT_DURATION[0], EVENT_DURATION[1] + 1, size=size)
+    return direction, np.where(direction != 0, duration, 0)
+
+class MarketEngine:
+    def __init__(self, symbols, prices, seed=None, sectors=None, weights=EVENT_WEIGHTS, sector_event_chance=0.0):
+        self.rng = np.random.default_rng(seed)
+        self.weights = dict(weights)
+        #share of events that only hit one sector instead of the whole market.
+        self.sector_event_chance = sector_event_chance
+        self._load(symbols, prices, sectors)
+
+    @classmethod
+    def from_prices(cls, prices, seed=None, sectors=None, **kwargs):
+        return cls(list(prices), list(prices.values()), seed=seed, sectors=sectors, **kwargs)
+
+    def _load(self, symbols, prices, sectors=None):
+        self.symbols = list(symbols)
+        self.prices = np.array(prices, dtype=float)
+        self.params = MarketParams(self.symbols)
+        sectors = sectors or {}
+        self.sectors = np.array([sectors.get(symbol, default_sector(symbol)) for symbol in self.symbols])
+
+    def sync(self, prices):
+        #takes the saved prices as the truth, symbols added or removed by hand included.
+        if list(prices) != self.symbols:
+            self._load(list(prices), list(prices.values()))
+        else:
+            self.prices = np.fromiter(prices.values(), dtype=float, count=len(self.symbols))
+
+    def choose_event(self):
+        #same odds as the old choose_new_market_event, None when nothing happens.
+        direction, duration = choose_events(self.rng, 1, self.weights)
+        if direction[0] == 0:
+            return None
+        event = {"event": "rally" if direction[0] > 0 else "crash", "duration": int(duration[0])}
+        if self.sector_event_chance and self.rng.random() < self.sector_event_chance:
+            event["sector"] = str(self.rng.choice(np.unique(self.sectors)))
+        return event
+
+    def direction(self, event):
+        #per-symbol direction for an event dict (or None), sector events mask the rest out.
+        if not event:
+            return np.zeros(len(self.symbols))
+        direction = np.full(len(self.symbols), float(EVENT_DIRECTION.get(event["event"], 0)))
+        if event.get("sector") is not None:
+            direction[self.sectors != event["sector"]] = 0.0
+        return direction
+
+    def step(self, event):
+        #advances one tick and returns the new price array (also kept in self.prices).
+        self.prices = step_prices(self.prices, self.direction(event), self.params, self.rng)
+        return self.prices
+
+    def as_dict(self):
+        return dict(zip(self.symbols, self.prices.tolist()))
@@ -0,0 +1,168 @@
+#market_sim.py
+#offline monte carlo for the stock market. runs thousands of independent market paths
+#through the same price model the bot uses (market.py) on a process pool and reports
+#where prices end up, how often they get pinned at the 0.01 floor and how often events
+#fire. no discord connection or config.json needed.
+#    python market_sim.py --paths 10000 --months 3
+#    python market_sim.py --rally 0.03 --crash 0.01 --stock-normal 0.005 0.04 --out sim.json
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from market import (
+    COIN_PARAMS, EVENT_WEIGHTS, PRICE_FLOOR, STOCK_PARAMS,
+    MarketParams, choose_events, step_prices,
+)
+
+#one tick every 20 minutes, like the bot.
+TICKS_PER_DAY = 24 * 60 // 20
+DEFAULT_PRICES = {"INK": 300.0, "BEANEDCOIN": 10.0}
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+def simulate_chunk(symbols, prices, paths, ticks, weights, coin, stock, seed):
+    #runs `paths` markets side by side, returns the raw arrays the report is built from.
+    rng = np.random.default_rng(seed)
+    params = MarketParams(symbols, coin, stock)
+    current = np.tile(np.array(prices, dtype=float), (paths, 1))
+    direction = np.zeros(paths)
+    remaining = np.zeros(paths, dtype=int)
+    floored = np.zeros(current.shape, dtype=bool)
+    low = current.copy()
+    rallies = np.zeros(paths, dtype=int)
+    crashes = np.zeros(paths, dtype=int)
+    event_ticks = np.zeros(paths, dtype=int)
+
+    for _ in range(ticks):
+        #markets without a running event roll for a new one, like choose_new_market_event.
+        idle = remaining == 0
+        if idle.any():
+            new_direction, new_duration = choose_events(rng, int(idle.sum()), weights)
+            direction[idle] = new_direction
+            remaining[idle] = new_duration
+            rallies[idle] += new_direction > 0
+            crashes[idle] += new_direction < 0
+        current = step_prices(current, direction[:, None], params, rng)
+        floored |= current <= PRICE_FLOOR
+        np.minimum(low, current, out=low)
+        active = remaining > 0
+        event_ticks += active
+        remaining[active] -= 1
+        direction[remaining == 0] = 0
+
+    return {
+        "final": current,
+        "low": low,
+        "floored": floored,
+        "rallies": rallies,
+        "crashes": crashes,
+        "event_ticks": event_ticks,
+    }
+
+def _run_chunk(args):
+    return simulate_chunk(*args)
+
+def simulate(prices, paths, months, weights=EVENT_WEIGHTS, coin=COIN_PARAMS, stock=STOCK_PARAMS, seed=None, workers=None):
+    symbols = list(prices)
+    start = list(prices.values())
+    ticks = int(months * 30 * TICKS_PER_DAY)
+    workers = workers or os.cpu_count() or 1
+    #one independent, reproducible stream per chunk.
+    chunks = min(workers * 4, paths)
+    sizes = [paths // chunks + (1 if i < paths % chunks else 0) for i in range(chunks)]
+    seeds = np.random.SeedSequence(seed).spawn(chunks)
+    jobs = [(symbols, start, size, ticks, weights, coin, stock, child) for size, child in zip(sizes, seeds)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(_run_chunk, jobs))
+    merged = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+    return symbols, start, ticks, merged
+
+def report(symbols, start, ticks, results):
+    paths = len(results["rallies"])
+    summary = {"paths": paths, "ticks": ticks, "symbols": {}}
+    for index, symbol in enumerate(symbols):
+        final = results["final"][:, index]
+        summary["symbols"][symbol] = {
+            "start": start[index],
+            "mean": round(float(final.mean()), 2),
+            "percentiles": {f"p{pct}": round(float(value), 2) for pct, value in zip(PERCENTILES, np.percentile(final, PERCENTILES))},
+            "ruin_probability": round(float(results["floored"][:, index].mean()), 4),
+            "ends_below_start": round(float((final < start[index]).mean()), 4),
+            "median_low": round(float(np.median(results["low"][:, index])), 2),
+        }
+    days = ticks / TICKS_PER_DAY
+    summary["events"] = {
+        "rallies_per_day": round(float(results["rallies"].mean() / days), 4),
+        "crashes_per_day": round(float(results["crashes"].mean() / days), 4),
+        "share_of_ticks_in_event": round(float(results["event_ticks"].mean() / ticks), 4),
+    }
+    return summary
+
+def print_report(summary):
+    print(f"{summary['paths']} paths x {summary['ticks']} ticks ({summary['ticks'] / TICKS_PER_DAY:.0f} days)\n")
+    header = f"{'symbol':<12}{'start':>10}{'mean':>12}" + "".join(f"{'p' + str(pct):>12}" for pct in PERCENTILES) + f"{'ruin':>9}{'< start':>9}"
+    print(header)
+    for symbol, stats in summary["symbols"].items():
+        row = f"{symbol:<12}{stats['start']:>10.2f}{stats['mean']:>12.2f}"
+        row += "".join(f"{value:>12.2f}" for value in stats["percentiles"].values())
+        row += f"{stats['ruin_probability']:>9.2%}{stats['ends_below_start']:>9.2%}"
+        print(row)
+    events = summary["events"]
+    print(
+        f"\nevents: {events['rallies_per_day']} rallies/day, {events['crashes_per_day']} crashes/day, "
+        f"{events['share_of_ticks_in_event']:.2%} of ticks inside an event"
+    )
+
+def load_prices(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return dict(DEFAULT_PRICES)
+
+def tuned(base, normal, event, event_chance, jump_chance):
+    params = dict(base)
+    if normal:
+        params["normal"] = tuple(normal)
+    if event:
+        params["event"] = tuple(event)
+    if event_chance is not None:
+        params["event_chance"] = event_chance
+    if jump_chance is not None:
+        params["jump_chance"] = jump_chance
+    return params
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo simulation of the stock market model.")
+    parser.add_argument("--stocks", default="stocks.json", help="starting prices (defaults to the bot's defaults if missing)")
+    parser.add_argument("--paths", type=int, default=10000, help="independent markets to simulate")
+    parser.add_argument("--months", type=float, default=3, help="simulated time, 30-day months of 20-minute ticks")
+    parser.add_argument("--workers", type=int, default=None, help="processes to use (default: all cores)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--rally", type=float, default=EVENT_WEIGHTS["rally"], help="chance a rally starts on an idle tick")
+    parser.add_argument("--crash", type=float, default=EVENT_WEIGHTS["crash"], help="chance a crash starts on an idle tick")
+    for kind in ("stock", "coin"):
+        parser.add_argument(f"--{kind}-normal", type=float, nargs=2, metavar=("LOW", "HIGH"), help=f"normal {kind} move range")
+        parser.add_argument(f"--{kind}-event", type=float, nargs=2, metavar=("LOW", "HIGH"), help=f"{kind} move range during events")
+        parser.add_argument(f"--{kind}-event-chance", type=float, help=f"chance a {kind} takes the event move during an event")
+        parser.add_argument(f"--{kind}-jump-chance", type=float, help=f"chance of a big {kind} jump outside events")
+    parser.add_argument("--out", help="also write the report as json here")
+    args = parser.parse_args()
+
+    weights = {"none": max(0.0, 1 - args.rally - args.crash), "rally": args.rally, "crash": args.crash}
+    stock = tuned(STOCK_PARAMS, args.stock_normal, args.stock_event, args.stock_event_chance, args.stock_jump_chance)
+    coin = tuned(COIN_PARAMS, args.coin_normal, args.coin_event, args.coin_event_chance, args.coin_jump_chance)
+
+    started = time.perf_counter()
+    symbols, start, ticks, results = simulate(
+        load_prices(args.stocks), args.paths, args.months,
+        weights=weights, coin=coin, stock=stock, seed=args.seed, workers=args.workers
+    )
+    summary = report(symbols, start, ticks, results)
+    summary["settings"] = {"weights": weights, "stock": stock, "coin": coin, "seed": args.seed, "months": args.months}
+    print_report(summary)
+    print(f"\nfinished in {time.perf_counter() - started:.1f}s")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(summary, f, indent=4)
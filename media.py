@@ -0,0 +1,135 @@
+#media.py
+#static images the bot shows in embeds (the /crypto rig photo) are uploaded once and
+#then linked by their discord CDN url instead of being re-uploaded on every command.
+#the url, and the message it was uploaded with, are remembered in MEDIA_CACHE_FILE so a
+#restart doesn't upload again.
+#
+#CDN attachment urls are signed and expire (the ex= query parameter, hex epoch). an
+#expired url is refreshed by fetching the original message again, which hands out a
+#freshly signed one. if that message is gone the next command uploads a small,
+#pre-downscaled thumbnail instead and that becomes the cached copy.
+#    url = await rig_image.url(bot)
+#    if url is None: send with rig_image.file(), then rig_image.remember(message)
+import asyncio
+import json
+import os
+import time
+import urllib.parse
+import discord
+from globals import MEDIA_CACHE_FILE
+from persistence import run_io, atomic_write_json
+
+#refresh urls this long before discord says they expire.
+EXPIRY_MARGIN_SECONDS = 600
+THUMBNAIL_WIDTH = 480
+
+def load_media_cache():
+    try:
+        with open(MEDIA_CACHE_FILE, "r") as f:
+            data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("Media cache is not a dictionary.")
+            return data
+    except (FileNotFoundError, json.JSONDecodeError, ValueError):
+        return {}
+
+def save_media_cache(data):
+    atomic_write_json(MEDIA_CACHE_FILE, data)
+
+def cdn_expiry(url):
+    #epoch the signed url stops working, None if it isn't signed.
+    values = urllib.parse.parse_qs(urllib.parse.urlparse(url).query).get("ex")
+    if not values:
+        return None
+    try:
+        return int(values[0], 16)
+    except ValueError:
+        return None
+
+def make_thumbnail(source, target, width=THUMBNAIL_WIDTH):
+    #writes a downscaled jpeg next to the original once, returns the path to upload.
+    if os.path.exists(target):
+        return target
+    try:
+        from PIL import Image
+        with Image.open(source) as image:
+            if image.width > width:
+                image.thumbnail((width, width * image.height // image.width))
+            image.convert("RGB").save(target, "JPEG", quality=80, optimize=True)
+        return target
+    except Exception as e:
+        print(f"[Media] Could not make a thumbnail of {source}: {e}")
+        return source
+
+class CachedImage:
+    def __init__(self, key, path, thumbnail_path):
+        self.key = key
+        self.path = path
+        self.thumbnail_path = thumbnail_path
+        #the whole media cache file, key -> {"url", "expires", "channel_id", "message_id"}
+        self.cache = {}
+        self.lock = asyncio.Lock()
+        self.uploads = 0
+
+    def load(self, cache):
+        self.cache = cache
+
+    def _fresh(self, entry):
+        expires = entry.get("expires")
+        return expires is None or expires - time.time() > EXPIRY_MARGIN_SECONDS
+
+    async def url(self, bot):
+        #a working CDN url for the image, None if it has to be uploaded.
+        entry = self.cache.get(self.key)
+        #a lost entry has no url left, only the flag that makes file() send the thumbnail.
+        if entry is None or "url" not in entry:
+            return None
+        if self._fresh(entry):
+            return entry["url"]
+        async with self.lock:
+            entry = self.cache.get(self.key)
+            if entry is None or "url" not in entry:
+                return None
+            if self._fresh(entry):
+                return entry["url"]
+            try:
+                channel = bot.get_channel(entry["channel_id"]) or await bot.fetch_channel(entry["channel_id"])
+                message = await channel.fetch_message(entry["message_id"])
+            except (discord.HTTPException, KeyError) as e:
+                print(f"[Media] Cached {self.key} image is gone, uploading the thumbnail next time: {e}")
+                entry["lost"] = True
+                entry.pop("url", None)
+                entry.pop("expires", None)
+                await self._save()
+                return None
+            await self.remember(message)
+            return self.cache[self.key].get("url")
+
+    def file(self, filename):
+        #the full image the first time, the thumbnail once a cached copy has been lost.
+        entry = self.cache.get(self.key)
+        path = self.thumbnail_path if entry is not None and entry.get("lost") else self.path
+        self.uploads += 1
+        return discord.File(path, filename=filename)
+
+    async def remember(self, message):
+        #takes the url from a message the image was sent with (attachment or embed).
+        if message.attachments:
+            url = message.attachments[0].url
+        elif message.embeds and message.embeds[0].image and message.embeds[0].image.url:
+            url = message.embeds[0].image.url
+        else:
+            return
+        self.cache[self.key] = {
+            "url": url,
+            "expires": cdn_expiry(url),
+            "channel_id": message.channel.id,
+            "message_id": message.id,
+        }
+        await self._save()
+
+    async def _save(self):
+        await run_io(save_media_cache, {key: dict(entry) for key, entry in self.cache.items()})
+
+#the /crypto rig photo
+rig_image = CachedImage("rig", "RTX5090.jpg", "RTX5090_thumb.jpg")
@@ -0,0 +1,157 @@
+#mining.py
+#crypto mining as a per-coin network. every coin keeps a running hash rate (the cards
+#currently mining it) and a difficulty that rises once that passes NETWORK_TARGET_CARDS,
+#so a coin never mints more than NETWORK_TARGET_CARDS coins per MINING_PERIOD_SECONDS
+#however many cards pile onto it. below the target every card still makes 1 coin per
+#period.
+#
+#instead of paying rigs on a timer each coin keeps a cumulative reward index, coins
+#earned per card since the network started. a rig remembers the index it was last paid
+#at (record.mining_index) and is owed cards * (index now - that), one multiplication.
+#the hash rate only changes through /mine, /cryptobuy and /cryptosell, each of which
+#pays the rig first and then moves the running total, nothing ever scans users for it.
+#
+#rigs are paid when the economy store settles a record (the first read in a
+#transaction), network state is saved to MINING_FILE.
+#    economy.add_settler(mining_network.settle)
+#    mining_network.start(record, "BEANEDCOIN", time.time())
+import json
+import time
+from globals import MINING_FILE
+from persistence import run_io, atomic_write_json, FlushScheduler
+
+MINING_PERIOD_SECONDS = 300
+#cards a coin's network takes before the difficulty starts climbing.
+NETWORK_TARGET_CARDS = 50
+#plain settles skip paying out less than this, rig changes always pay everything.
+SETTLE_MINIMUM = 1.0
+
+def load_mining():
+    try:
+        with open(MINING_FILE, "r") as f:
+            data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("Mining data is not a dictionary.")
+            return data
+    except (FileNotFoundError, json.JSONDecodeError, ValueError):
+        return {}
+
+def save_mining(data):
+    atomic_write_json(MINING_FILE, data)
+
+class MiningNetwork:
+    def __init__(self):
+        #coin -> {"hashrate": cards mining it, "index": coins per card so far, "updated": epoch}
+        self.coins = {}
+        self.saver = FlushScheduler("mining", self.save)
+
+    def load(self, data):
+        self.coins = {coin: dict(state) for coin, state in data.items()}
+
+    async def save(self):
+        data = {coin: dict(state) for coin, state in self.coins.items()}
+        await run_io(save_mining, data)
+
+    def _state(self, coin, now):
+        state = self.coins.get(coin)
+        if state is None:
+            state = self.coins[coin] = {"hashrate": 0, "index": 0.0, "updated": now}
+        return state
+
+    def difficulty(self, coin):
+        state = self.coins.get(coin)
+        hashrate = state["hashrate"] if state else 0
+        return max(1.0, hashrate / NETWORK_TARGET_CARDS)
+
+    def index(self, coin, now):
+        #the reward index as of now, without moving it.
+        state = self._state(coin, now)
+        elapsed = max(0.0, now - state["updated"])
+        return state["index"] + elapsed / MINING_PERIOD_SECONDS / self.difficulty(coin)
+
+    def _advance(self, coin, now):
+        #folds the time since the last change in at the current difficulty, has to run
+        #before the hash rate moves.
+        state = self._state(coin, now)
+        state["index"] = self.index(coin, now)
+        state["updated"] = max(now, state["updated"])
+        return state["index"]
+
+    def active(self, record):
+        return bool(record.mining) and record.mining_index is not None
+
+    def pending(self, record, now):
+        #coins the rig is owed right now.
+        if not self.active(record):
+            return 0.0
+        return record.graphics_cards * (self.index(record.mining, now) - record.mining_index)
+
+    def _pay(self, record, now):
+        index = self._advance(record.mining, now)
+        earned = record.graphics_cards * (index - record.mining_index)
+        record.mining_index = index
+        if earned > 0:
+            record.add_shares(record.mining, earned)
+        return earned
+
+    def settle(self, record, now):
+        #economy settler, True if it paid anything.
+        if self.pending(record, now) < SETTLE_MINIMUM:
+            return False
+        self._pay(record, now)
+        return True
+
+    def _join(self, record, coin, now):
+        record.mining = coin
+        record.mining_index = self._advance(coin, now)
+        self._state(coin, now)["hashrate"] += record.graphics_cards
+        self.saver.request()
+
+    def _leave(self, record, now):
+        self._pay(record, now)
+        self._state(record.mining, now)["hashrate"] -= record.graphics_cards
+        record.mining_index = None
+        self.saver.request()
+
+    def start(self, record, coin, now):
+        #starts mining coin, or switches to it after paying out the old one.
+        if self.active(record):
+            if record.mining == coin:
+                return
+            self._leave(record, now)
+        self._join(record, coin, now)
+
+    def stop(self, record, now):
+        if self.active(record):
+            self._leave(record, now)
+        record.mining = None
+        record.mining_index = None
+
+    def change_cards(self, record, delta, now):
+        #buying or selling cards, the old count is paid up to now first.
+        if self.active(record):
+            self._pay(record, now)
+            self._state(record.mining, now)["hashrate"] += delta
+            self.saver.request()
+        record.graphics_cards += delta
+
+    def reconcile(self, store):
+        #recounts the running totals from the records, only on startup, in case a crash
+        #left mining.json behind the journal. returns the coins that were off.
+        counted = {}
+        for _, record in store.items():
+            if self.active(record):
+                counted[record.mining] = counted.get(record.mining, 0) + record.graphics_cards
+        now = time.time()
+        drifted = []
+        for coin in set(counted) | set(self.coins):
+            state = self._state(coin, now)
+            if state["hashrate"] != counted.get(coin, 0):
+                drifted.append(coin)
+                state["hashrate"] = counted.get(coin, 0)
+        if drifted:
+            self.saver.request()
+        return drifted
+
+#the one mining network every cog shares
+mining_network = MiningNetwork()
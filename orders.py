@@ -0,0 +1,348 @@
+#orders.py
+#resting limit and stop orders for stocks. the money (buys) or shares (sells) are taken
+#out of the account when the order is placed and the order waits in the book until a
+#market tick crosses its trigger price, then it fills at that tick's price.
+#
+#    buy limit   fills once the price drops to the trigger or below
+#    buy stop    fills once the price climbs to the trigger or above
+#    sell limit  fills once the price climbs to the trigger or above
+#    sell stop   fills once the price drops to the trigger or below
+#
+#each symbol keeps two heaps, one per direction, ordered so the orders closest to being
+#crossed sit on top. a tick pops only the orders it actually crossed. cancelled orders
+#stay in the heaps and are skipped when they surface.
+#
+#the book is an economy book (see economy.py): placing, filling and cancelling are
+#effects on the same journal event as the escrow, payout or refund, so a crash can't
+#keep the money and lose the order or the other way around. orders.json is only a
+#checkpoint, the journal after its "seq" is replayed on top of it.
+#    fills = await fill_orders({"INK": 287.5})
+import discord
+from discord import app_commands
+from discord.ext import commands
+import heapq
+import json
+import datetime
+import functools
+from globals import ORDERS_FILE, GUILD_ID
+from economy import economy
+from persistence import run_io, atomic_write_json
+from prices import price_feed
+
+#open orders one user can have at once.
+MAX_OPEN_ORDERS = 20
+#rebuild the heaps once this many cancelled entries are sitting in them.
+STALE_LIMIT = 256
+
+def load_orders():
+    try:
+        with open(ORDERS_FILE, "r") as f:
+            data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("Orders data is not a dictionary.")
+            return data
+    except (FileNotFoundError, json.JSONDecodeError, ValueError):
+        return {"next_id": 1, "orders": [], "seq": 0}
+
+def save_orders(data):
+    atomic_write_json(ORDERS_FILE, data)
+
+def fills_below(order):
+    #True if the order fills when the price falls to its trigger, False if when it rises.
+    return (order["side"] == "buy") == (order["kind"] == "limit")
+
+class OrderBook:
+    def __init__(self):
+        #order id -> order dict, only open orders.
+        self.orders = {}
+        #user id -> {order id: order}, the same orders by owner.
+        self.by_user = {}
+        #symbol -> ([(-trigger, id)] fills on the way down, [(trigger, id)] on the way up)
+        self.heaps = {}
+        self.next_id = 1
+        self.stale = 0
+        #ids a tick popped off the heaps whose fill isn't journaled yet, they can't be cancelled.
+        self.filling = set()
+
+    def load(self, data):
+        self.orders = {}
+        self.by_user = {}
+        self.heaps = {}
+        self.stale = 0
+        self.filling = set()
+        self.next_id = data.get("next_id", 1)
+        for order in data.get("orders", []):
+            self._push(order)
+
+    def checkpoint(self):
+        #economy book hook. orders never change once placed, a shallow copy is enough.
+        data = {"next_id": self.next_id, "orders": list(self.orders.values()), "seq": economy.journal.seq}
+        return functools.partial(run_io, save_orders, data)
+
+    def apply(self, effect):
+        #economy book hook, books and removes orders the same way live and on replay.
+        if "place" in effect:
+            order = effect["place"]
+            self.next_id = max(self.next_id, order["id"] + 1)
+            self._push(order)
+        elif "fill" in effect:
+            self._remove(effect["fill"])
+        else:
+            self._remove(effect["cancel"])
+
+    def _push(self, order):
+        self.orders[order["id"]] = order
+        self.by_user.setdefault(order["user_id"], {})[order["id"]] = order
+        below, above = self.heaps.setdefault(order["symbol"], ([], []))
+        if fills_below(order):
+            heapq.heappush(below, (-order["trigger"], order["id"]))
+        else:
+            heapq.heappush(above, (order["trigger"], order["id"]))
+
+    def new_order(self, user_id, symbol, side, kind, trigger, amount=0.0, shares=0.0):
+        #an order with the next id, it's booked by the {"place": order} effect on its escrow.
+        order = {
+            "id": self.next_id,
+            "user_id": str(user_id),
+            "symbol": symbol,
+            "side": side,
+            "kind": kind,
+            "trigger": trigger,
+            "amount": amount,
+            "shares": shares,
+            "created": datetime.datetime.now().isoformat(),
+        }
+        self.next_id += 1
+        return order
+
+    def open_order(self, order_id, user_id):
+        #a user's order that can still be cancelled, None if there's no such order.
+        order = self.orders.get(order_id)
+        if order is None or order["user_id"] != str(user_id) or order_id in self.filling:
+            return None
+        return order
+
+    def _remove(self, order_id):
+        #a replayed fill or cancel can name an order the checkpoint no longer has.
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            return
+        user_orders = self.by_user[order["user_id"]]
+        del user_orders[order_id]
+        if not user_orders:
+            del self.by_user[order["user_id"]]
+        if order_id in self.filling:
+            #a tick already popped its heap entry.
+            self.filling.discard(order_id)
+            return
+        self.stale += 1
+        if self.stale > STALE_LIMIT and self.stale > len(self.orders):
+            self._rebuild()
+
+    def _rebuild(self):
+        orders = list(self.orders.values())
+        self.heaps = {}
+        self.stale = 0
+        for order in orders:
+            #a filling order is off the heaps already, it stays in the book until its
+            #fill is journaled.
+            if order["id"] not in self.filling:
+                self._push(order)
+
+    def triggered(self, prices):
+        #pops every open order the prices crossed off the heaps, cheapest check per symbol
+        #is one peek. they stay in the book (and orders.json) until their fill is journaled.
+        crossed = []
+        for symbol, price in prices.items():
+            heaps = self.heaps.get(symbol)
+            if heaps is None:
+                continue
+            below, above = heaps
+            while below and -below[0][0] >= price:
+                crossed.append(heapq.heappop(below)[1])
+            while above and above[0][0] <= price:
+                crossed.append(heapq.heappop(above)[1])
+        orders = []
+        for order_id in crossed:
+            order = self.orders.get(order_id)
+            if order is None:
+                #cancelled earlier, its heap entry just surfaced.
+                self.stale -= 1
+                continue
+            self.filling.add(order_id)
+            orders.append(order)
+        return orders
+
+    def user_orders(self, user_id):
+        return list(self.by_user.get(str(user_id), {}).values())
+
+    def escrow_value(self, user_id, prices):
+        #what a user's open orders hold: the money set aside for buys, sells' shares at prices.
+        total = 0.0
+        for order in self.by_user.get(str(user_id), {}).values():
+            if order["side"] == "buy":
+                total += order["amount"]
+            else:
+                total += order["shares"] * prices.get(order["symbol"], 0)
+        return total
+
+#the one order book every cog shares
+order_book = OrderBook()
+
+async def fill_orders(prices):
+    #fills every order the new prices crossed at those prices, returns the fills.
+    orders = order_book.triggered(prices)
+    if not orders:
+        return []
+
+    fills = []
+    async with economy.transaction({order["user_id"] for order in orders}) as tx:
+        for order in orders:
+            if order["id"] not in order_book.orders:
+                #fills go by order id, one that's already been paid is never paid again.
+                continue
+            user_id = order["user_id"]
+            price = prices[order["symbol"]]
+            user_record = tx.get(user_id)
+            if order["side"] == "buy":
+                #the escrowed amount buys whatever it buys at the fill price.
+                shares = order["amount"] / price
+                value = order["amount"]
+                user_record.add_shares(order["symbol"], shares)
+                user_record.total_spent += value
+            else:
+                shares = order["shares"]
+                value = round(price * shares, 2)
+                user_record.balance += value
+                user_record.total_earned += value
+            #the payout and the order leaving the book are one journal event.
+            tx.put(user_id, user_record, f"order {order['id']} fill", effects=[{"book": "orders", "fill": order["id"]}])
+            fills.append({"order": order, "price": price, "shares": shares, "value": value})
+    return fills
+
+def describe_order(order):
+    if order["side"] == "buy":
+        size = f"{order['amount']} Beaned Bucks of {order['symbol']}"
+    else:
+        size = f"{order['shares']} shares of {order['symbol']}"
+    return f"#{order['id']} {order['side']} {order['kind']} {size} at {order['trigger']}"
+
+
+class OrdersCog(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @app_commands.guilds(discord.Object(id=GUILD_ID))
+    @app_commands.command(name="stockorder", description="Place a limit or stop order that fills on a later market update.")
+    @app_commands.describe(
+    side="buy or sell",
+    kind="limit (buy low / sell high) or stop (buy on the way up / sell on the way down)",
+    stock="Stock symbol (e.g. ACME)",
+    price="Trigger price",
+    amount="Beaned Bucks to spend for buys, shares to sell for sells (or 'all')"
+    )
+    async def stockorder(self, interaction: discord.Interaction, side: str, kind: str, stock: str, price: float, amount: str):
+        side = side.lower()
+        kind = kind.lower()
+        stock = stock.upper()
+        if side not in ("buy", "sell") or kind not in ("limit", "stop"):
+            await interaction.response.send_message("Invalid order. Side must be buy or sell and kind must be limit or stop.", ephemeral=True)
+            return
+        stocks_data = price_feed.current()
+        if stock not in stocks_data:
+            await interaction.response.send_message("Invalid stock symbol.", ephemeral=True)
+            return
+        if price <= 0:
+            await interaction.response.send_message("Trigger price must be greater than 0.", ephemeral=True)
+            return
+
+        size = None
+        if amount.lower() != "all":
+            try:
+                size = float(amount)
+            except ValueError:
+                await interaction.response.send_message("Invalid amount.", ephemeral=True)
+                return
+
+        user_id = str(interaction.user.id)
+        error = None
+        async with economy.transaction(user_id) as tx:
+            user_record = tx.get(user_id)
+            #counted under the user's lock, two orders placed at once can't both squeeze in.
+            if len(order_book.user_orders(user_id)) >= MAX_OPEN_ORDERS:
+                error = f"You already have {MAX_OPEN_ORDERS} open orders. Cancel one first."
+            elif side == "buy":
+                if size is None:
+                    size = float(user_record.balance)
+                if size <= 0:
+                    error = "Amount must be greater than 0."
+                elif size > user_record.balance:
+                    error = f"You do not have enough Beaned Bucks to set aside {size}."
+                else:
+                    #escrow: the money is gone until the order fills or is cancelled, and
+                    #the order is booked by the same journal event that takes it.
+                    order = order_book.new_order(user_id, stock, side, kind, price, amount=size)
+                    tx.adjust(user_id, -size, "order escrow", effects=[{"book": "orders", "place": order}])
+            else:
+                owned = user_record.portfolio.get(stock, 0)
+                if size is None:
+                    size = owned
+                if size <= 0:
+                    error = "You do not own any shares of that stock." if not owned else "Amount must be greater than 0."
+                elif size > owned:
+                    error = "You do not own enough shares of that stock."
+                else:
+                    order = order_book.new_order(user_id, stock, side, kind, price, shares=size)
+                    user_record.add_shares(stock, -size)
+                    tx.put(user_id, user_record, "order escrow", effects=[{"book": "orders", "place": order}])
+
+        if error:
+            await interaction.response.send_message(error, ephemeral=True)
+            return
+        await interaction.response.send_message(
+            f"Order placed: {describe_order(order)}.\n"
+            f"Current price is {stocks_data[stock]}. It will fill on the first market update that crosses {price}."
+        )
+
+    @app_commands.guilds(discord.Object(id=GUILD_ID))
+    @app_commands.command(name="orders", description="View your open stock orders.")
+    async def orders(self, interaction: discord.Interaction):
+        open_orders = order_book.user_orders(interaction.user.id)
+        if not open_orders:
+            await interaction.response.send_message("You have no open orders.", ephemeral=True)
+            return
+        embed = discord.Embed(title=f"{interaction.user.display_name}'s Open Orders", color=discord.Color.blue())
+        for order in sorted(open_orders, key=lambda order: order["id"]):
+            embed.add_field(name=f"#{order['id']} {order['symbol']}", value=describe_order(order), inline=False)
+        embed.set_footer(text="Use /cancelorder to cancel one and get the escrow back.")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.guilds(discord.Object(id=GUILD_ID))
+    @app_commands.command(name="cancelorder", description="Cancel one of your open stock orders.")
+    @app_commands.describe(order_id="The order number shown in /orders")
+    async def cancelorder(self, interaction: discord.Interaction, order_id: int):
+        user_id = str(interaction.user.id)
+        #hand the escrow back, the refund and the order leaving the book are one journal event.
+        async with economy.transaction(user_id) as tx:
+            order = order_book.open_order(order_id, user_id)
+            if order is not None:
+                effects = [{"book": "orders", "cancel": order_id}]
+                if order["side"] == "buy":
+                    tx.adjust(user_id, order["amount"], "order cancel", effects=effects)
+                else:
+                    user_record = tx.get(user_id)
+                    user_record.add_shares(order["symbol"], order["shares"])
+                    tx.put(user_id, user_record, "order cancel", effects=effects)
+        if order is None:
+            await interaction.response.send_message("You have no open order with that number.", ephemeral=True)
+            return
+        await interaction.response.send_message(f"Cancelled {describe_order(order)}. Your escrow has been returned.", ephemeral=True)
+
+
+async def setup(bot: commands.Bot):
+    print("Loading OrdersCog...")
+    data = await run_io(load_orders)
+    order_book.load(data)
+    economy.add_book("orders", order_book.apply, order_book.checkpoint)
+    economy.replay_book("orders", data.get("seq", 0))
+    await bot.add_cog(OrdersCog(bot))
@@ -0,0 +1,129 @@
+#persistence.py
+#blocking file io (json parse/dump, sqlite, fsync) runs on this small thread pool so
+#market ticks, mining and the lottery never stall the gateway heartbeat.
+#    data = await run_io(load_stocks)
+#saves that can come in bursts go through a FlushScheduler instead of writing each time.
+import asyncio
+import functools
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+#kept small on purpose, the work is disk bound and every save is a whole file.
+IO_WORKERS = 2
+
+io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="persistence")
+
+async def run_io(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, functools.partial(func, *args, **kwargs))
+
+def atomic_write_json(path, data, indent=4):
+    #readers on other threads see either the old file or the new one, never half of one.
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+#how long a save request waits for more requests to pile onto the same write.
+FLUSH_WINDOW_SECONDS = 0.25
+
+#every scheduler, so shutdown can flush them all and /flushstats can report them.
+schedulers = []
+
+class FlushScheduler:
+    #debounces saves: the first request in a window arms a timer and every request
+    #that lands before it fires rides along, so a burst of changes costs one write.
+    #    saver = FlushScheduler("lottery", self.save_lottery_data)
+    #    saver.request()
+    def __init__(self, name, flush, window=FLUSH_WINDOW_SECONDS):
+        self.name = name
+        #async callable doing the actual write, it should save the latest state.
+        self.flush = flush
+        self.window = window
+        self.timer = None
+        #the flush the timer started, kept so it isn't garbage collected mid-write.
+        self.task = None
+        #when the oldest unsaved change was requested, None if nothing is waiting.
+        self.first_request = None
+        self.lock = asyncio.Lock()
+        self.requests = 0
+        self.writes = 0
+        self.failures = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        schedulers.append(self)
+
+    def request(self):
+        self.requests += 1
+        if self.first_request is None:
+            self.first_request = time.monotonic()
+        if self.timer is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                #no loop (offline scripts), the change waits for an explicit flush_now().
+                return
+            self.timer = loop.call_later(self.window, self._fire)
+
+    def _fire(self):
+        self.timer = None
+        self.task = asyncio.ensure_future(self.flush_now())
+        self.task.add_done_callback(self._fired)
+
+    def _fired(self, task):
+        #nobody awaits a timer flush, its error is reported here instead of being lost.
+        if task is self.task:
+            self.task = None
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            print(f"[Persistence] {self.name} timed flush failed, it's retried on the next request:")
+            traceback.print_exception(type(error), error, error.__traceback__)
+
+    async def flush_now(self):
+        #writes right away if anything is waiting, used by the timer and on shutdown.
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        async with self.lock:
+            started = self.first_request
+            if started is None:
+                return False
+            self.first_request = None
+            try:
+                await self.flush()
+            except Exception:
+                #keep the change pending so the next request or shutdown retries it.
+                if self.first_request is None:
+                    self.first_request = started
+                self.failures += 1
+                print(f"[Persistence] {self.name} flush failed.")
+                raise
+            #lag is how long the oldest change in this write sat unsaved.
+            self.last_lag = time.monotonic() - started
+            self.max_lag = max(self.max_lag, self.last_lag)
+            self.writes += 1
+            return True
+
+    def metrics(self):
+        return {
+            "requests": self.requests,
+            "writes": self.writes,
+            "failures": self.failures,
+            "pending": self.first_request is not None,
+            "last_lag_ms": round(self.last_lag * 1000, 1),
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+        }
+
+async def flush_all():
+    for scheduler in schedulers:
+        await scheduler.flush_now()
+
+def flush_metrics():
+    return {scheduler.name: scheduler.metrics() for scheduler in schedulers}
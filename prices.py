@@ -0,0 +1,68 @@
+#prices.py
+#the current stock prices, in memory. the market tick publishes a new snapshot after
+#every update and commands read it instead of re-reading stocks.json. a snapshot never
+#changes once published, the next tick replaces it with a new version, so anything
+#derived from one set of prices can be cached on the snapshot itself.
+#
+#    snapshot = price_feed.current()
+#    price = snapshot["INK"]
+#    listing = snapshot.memo("listing", build_listing)
+import time
+import types
+
+class PriceSnapshot:
+    __slots__ = ("version", "timestamp", "prices", "_memo")
+
+    def __init__(self, version, prices, timestamp):
+        self.version = version
+        self.timestamp = timestamp
+        #read-only view, nobody gets to edit a published snapshot.
+        self.prices = types.MappingProxyType(dict(prices))
+        self._memo = {}
+
+    def __getitem__(self, symbol):
+        return self.prices[symbol]
+
+    def __contains__(self, symbol):
+        return symbol in self.prices
+
+    def __iter__(self):
+        return iter(self.prices)
+
+    def __len__(self):
+        return len(self.prices)
+
+    def get(self, symbol, default=None):
+        return self.prices.get(symbol, default)
+
+    def keys(self):
+        return self.prices.keys()
+
+    def items(self):
+        return self.prices.items()
+
+    def memo(self, key, compute):
+        #compute(snapshot) once per snapshot, later calls with the same key reuse it.
+        try:
+            return self._memo[key]
+        except KeyError:
+            value = self._memo[key] = compute(self)
+            return value
+
+    def __repr__(self):
+        return f"PriceSnapshot(version={self.version}, prices={dict(self.prices)!r})"
+
+class PriceFeed:
+    def __init__(self):
+        self.snapshot = PriceSnapshot(0, {}, 0.0)
+
+    def publish(self, prices, timestamp=None):
+        #swaps in a new snapshot, readers holding the old one keep a consistent view.
+        self.snapshot = PriceSnapshot(self.snapshot.version + 1, prices, time.time() if timestamp is None else timestamp)
+        return self.snapshot
+
+    def current(self):
+        return self.snapshot
+
+#the one price feed every cog shares
+price_feed = PriceFeed()
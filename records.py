@@ -0,0 +1,126 @@
+#records.py
+#the per-user record the economy store keeps in memory. __slots__ keeps each one to a
+#fixed handful of pointers instead of a dict per user, and every field has its default
+#here so commands don't have to setdefault() their way through a dict.
+#
+#on disk (data.json, the journal, sqlite) a record is still a plain dict, to_dict() and
+#from_dict() convert at the edges and leave unset fields out so old files load as-is.
+import sys
+
+class UserRecord:
+    __slots__ = (
+        "balance",            #int | float
+        "portfolio",          #dict[str, float], symbol -> shares, symbols interned
+        "total_spent",        #float, lifetime stock purchases
+        "total_earned",       #float, lifetime stock sales
+        "positions",          #dict[str, dict], symbol -> open margin position (margin.py)
+        "graphics_cards",     #int
+        "mining",             #str | None, coin being mined
+        "mining_index",       #float | None, coin's reward index the rig was last paid at (mining.py)
+        "last_daily",         #str | None, iso timestamp
+        "last_daily_boost",   #str | None, iso timestamp
+        "last_work",          #str | None, iso timestamp
+        "vc_time",            #float, seconds
+        "vc_timealone",       #float, seconds
+        "vc_afk",             #float, seconds
+        "extra",              #dict | None, keys this version doesn't know about
+    )
+
+    def __init__(self):
+        self.balance = 0
+        self.portfolio = {}
+        self.total_spent = 0
+        self.total_earned = 0
+        self.positions = {}
+        self.graphics_cards = 0
+        self.mining = None
+        self.mining_index = None
+        self.last_daily = None
+        self.last_daily_boost = None
+        self.last_work = None
+        self.vc_time = 0
+        self.vc_timealone = 0
+        self.vc_afk = 0
+        self.extra = None
+
+    @classmethod
+    def from_dict(cls, data):
+        record = cls.__new__(cls)
+        get = data.get
+        record.balance = get("balance", 0)
+        portfolio = get("portfolio")
+        record.portfolio = {sys.intern(symbol): shares for symbol, shares in portfolio.items()} if portfolio else {}
+        record.total_spent = get("total_spent", 0)
+        record.total_earned = get("total_earned", 0)
+        positions = get("positions")
+        record.positions = {sys.intern(symbol): dict(position) for symbol, position in positions.items()} if positions else {}
+        record.graphics_cards = get("graphics_cards", 0)
+        record.mining = get("mining")
+        record.mining_index = get("mining_index")
+        record.last_daily = get("last_daily")
+        record.last_daily_boost = get("last_daily_boost")
+        record.last_work = get("last_work")
+        record.vc_time = get("vc_time", 0)
+        record.vc_timealone = get("vc_timealone", 0)
+        record.vc_afk = get("vc_afk", 0)
+        extra = {key: value for key, value in data.items() if key not in FIELD_NAMES}
+        record.extra = extra or None
+        return record
+
+    def to_dict(self):
+        #always a fresh dict (portfolio included), safe to hand to the io pool.
+        data = {"balance": self.balance}
+        if self.portfolio:
+            data["portfolio"] = dict(self.portfolio)
+        if self.total_spent:
+            data["total_spent"] = self.total_spent
+        if self.total_earned:
+            data["total_earned"] = self.total_earned
+        if self.positions:
+            data["positions"] = {symbol: dict(position) for symbol, position in self.positions.items()}
+        if self.graphics_cards:
+            data["graphics_cards"] = self.graphics_cards
+        if self.mining is not None:
+            data["mining"] = self.mining
+        if self.mining_index is not None:
+            data["mining_index"] = self.mining_index
+        if self.last_daily is not None:
+            data["last_daily"] = self.last_daily
+        if self.last_daily_boost is not None:
+            data["last_daily_boost"] = self.last_daily_boost
+        if self.last_work is not None:
+            data["last_work"] = self.last_work
+        if self.vc_time:
+            data["vc_time"] = self.vc_time
+        if self.vc_timealone:
+            data["vc_timealone"] = self.vc_timealone
+        if self.vc_afk:
+            data["vc_afk"] = self.vc_afk
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def copy(self):
+        record = UserRecord.__new__(UserRecord)
+        for name in UserRecord.__slots__:
+            setattr(record, name, getattr(self, name))
+        record.portfolio = dict(self.portfolio)
+        record.positions = {symbol: dict(position) for symbol, position in self.positions.items()}
+        if self.extra:
+            record.extra = dict(self.extra)
+        return record
+
+    def add_shares(self, symbol, shares):
+        #keeps holdings keyed by the interned symbol and drops emptied positions.
+        symbol = sys.intern(symbol)
+        owned = self.portfolio.get(symbol, 0) + shares
+        if owned > 0:
+            self.portfolio[symbol] = owned
+        else:
+            self.portfolio.pop(symbol, None)
+        return owned
+
+    def __repr__(self):
+        return f"UserRecord({self.to_dict()!r})"
+
+FIELD_NAMES = frozenset(name for name in UserRecord.__slots__ if name != "extra")
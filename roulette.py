@@ -3,7 +3,7 @@ from discord import app_commands
 from discord.ext import commands
 import random
 import datetime
-from utils import load_data, save_data 
+from economy import economy
 from globals import GUILD_ID
 
 class RouletteCog(commands.Cog):
@@ -14,32 +14,15 @@ class RouletteCog(commands.Cog):
     @app_commands.command(name="roulette", description="Play roulette. Bet on a number or category (odd, even, red, black, 1st12, 2nd12, 3rd12).")
     @app_commands.describe(bet="Amount you'd like to bet", choice="0-36, odd, even, red, black, 1st12, 2nd12, 3rd12")
     async def roulette(self, interaction: discord.Interaction, bet: str, choice: str):
-        data = load_data()
         user_id = str(interaction.user.id)
-        user_record = data.get(user_id, {"balance": 0})
-        current_balance = float(user_record.get("balance", 0))
-        
-        if bet.lower() == "all":
-            bet_value = current_balance
-        else:
+        bet_value = None
+        if bet.lower() != "all":
             try:
                 bet_value = float(bet)
             except ValueError:
                 await interaction.response.send_message("Invalid bet amount.", ephemeral=True)
                 return
 
-        if bet_value <= 0:
-            await interaction.response.send_message("Bet must be greater than 0.", ephemeral=True)
-            return
-        if bet_value > current_balance:
-            await interaction.response.send_message("You do not have enough Beaned Bucks for that bet.", ephemeral=True)
-            return
-
-        #deduct the wager
-        user_record["balance"] = current_balance - bet_value
-        data[user_id] = user_record
-        save_data(data)
-
         outcome = random.randint(0, 36)
         red_numbers = {1,3,5,7,9,12,14,16,18,19,21,23,25,27,30,32,34,36}
         black_numbers = {2,4,6,8,10,11,13,15,17,20,22,24,26,28,29,31,33,35}
@@ -91,6 +74,24 @@ class RouletteCog(commands.Cog):
             )
             return
 
+        #the whole spin is settled as one net change, a single journal write per spin.
+        error = None
+        async with economy.transaction(user_id) as tx:
+            current_balance = float(tx.balance(user_id))
+            if bet_value is None:
+                bet_value = current_balance
+            if bet_value <= 0:
+                error = "Bet must be greater than 0."
+            elif bet_value > current_balance:
+                error = "You do not have enough Beaned Bucks for that bet."
+            else:
+                net = bet_value * multiplier if win else -bet_value
+                new_balance = tx.adjust(user_id, net, "roulette")
+
+        if error:
+            await interaction.response.send_message(error, ephemeral=True)
+            return
+
         embed = discord.Embed(
             title="Roulette Result",
             color=discord.Color.purple()
@@ -107,13 +108,10 @@ class RouletteCog(commands.Cog):
                 value=f"WIN! Multiplier: {multiplier}x\nWinnings: {winnings} Beaned Bucks\nTotal Return: {total_return}",
                 inline=False
             )
-            user_record["balance"] += total_return
         else:
             embed.add_field(name="Result", value="LOSE!", inline=False)
 
-        data[user_id] = user_record
-        save_data(data)
-        embed.set_footer(text=f"New Balance: {user_record['balance']} Beaned Bucks")
+        embed.set_footer(text=f"New Balance: {new_balance} Beaned Bucks")
         await interaction.response.send_message(embed=embed)
 
 async def setup(bot: commands.Bot):
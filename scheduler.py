@@ -0,0 +1,184 @@
+#scheduler.py
+#one timer for every recurring job (the market tick, the daily lottery draw). jobs sit in
+#a heap by their next run time and a single task sleeps until the earliest one is due.
+#
+#next run times are saved to SCHEDULE_FILE, so a restart keeps the cadence instead of
+#starting it over, and anything that came due while the bot was down runs as soon as
+#it's back. a job that missed several runs is called once with all of their scheduled
+#times (at most catch_up of the latest), so it can handle them as one batch.
+#    scheduler.add("market", stocks_cog.market_update_task, lambda t: t + 1200, catch_up=72)
+#    await scheduler.start()
+#jobs are async callables taking the list of scheduled epochs they're running for.
+import asyncio
+import heapq
+import json
+import time
+import traceback
+from globals import SCHEDULE_FILE
+from persistence import run_io, atomic_write_json
+
+def load_schedule():
+    try:
+        with open(SCHEDULE_FILE, "r") as f:
+            data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("Schedule data is not a dictionary.")
+            return data
+    except (FileNotFoundError, json.JSONDecodeError, ValueError):
+        return {}
+
+def save_schedule(data):
+    atomic_write_json(SCHEDULE_FILE, data)
+
+class Job:
+    def __init__(self, name, func, next_time, first_run=None, catch_up=1):
+        self.name = name
+        self.func = func
+        #next_time(epoch) -> the run after that one.
+        self.next_time = next_time
+        #when a job that was never saved runs first, None for right away.
+        self.first_run = first_run
+        self.catch_up = catch_up
+        self.next_run = None
+        self.calls = 0
+        self.runs = 0
+        self.caught_up = 0
+        self.skipped = 0
+        self.failures = 0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self.total_ms = 0.0
+        self.last_delay = 0.0
+
+    def due(self, now):
+        #every scheduled time up to now, moves next_run past them.
+        times = []
+        run = self.next_run
+        while run <= now:
+            times.append(run)
+            run = self.next_time(run)
+        self.next_run = run
+        if len(times) > self.catch_up:
+            self.skipped += len(times) - self.catch_up
+            times = times[-self.catch_up:]
+        return times
+
+    def metrics(self):
+        return {
+            "calls": self.calls,
+            "runs": self.runs,
+            "caught_up": self.caught_up,
+            "skipped": self.skipped,
+            "failures": self.failures,
+            "last_ms": round(self.last_ms, 1),
+            "max_ms": round(self.max_ms, 1),
+            "mean_ms": round(self.total_ms / self.calls, 1) if self.calls else 0.0,
+            "last_delay_s": round(self.last_delay, 1),
+            "next_run": self.next_run,
+        }
+
+class Scheduler:
+    def __init__(self):
+        self.jobs = {}
+        #(next run, name), entries for removed or rescheduled jobs are skipped.
+        self.heap = []
+        self.saved = None
+        self.task = None
+        #the job running right now, its own task so stopping the timer doesn't cancel it.
+        self.running = None
+        self.wakeup = asyncio.Event()
+
+    def add(self, name, func, next_time, first_run=None, catch_up=1):
+        job = self.jobs[name] = Job(name, func, next_time, first_run, catch_up)
+        if self.saved is not None:
+            self._schedule(job)
+        return job
+
+    def remove(self, name):
+        self.jobs.pop(name, None)
+        self.wakeup.set()
+
+    def _schedule(self, job):
+        job.next_run = self.saved.get(job.name)
+        if job.next_run is None:
+            job.next_run = time.time() if job.first_run is None else job.first_run
+        heapq.heappush(self.heap, (job.next_run, job.name))
+        self.wakeup.set()
+
+    async def start(self):
+        #loads the saved run times and starts the timer, jobs added later join it.
+        if self.task is not None:
+            return
+        self.saved = await run_io(load_schedule)
+        for job in self.jobs.values():
+            self._schedule(job)
+        self.task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        #no new runs after this, and a job already running (a draw between taking the
+        #tickets and paying out, a tick halfway through the fills) is finished, not cancelled.
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        if self.running is not None:
+            await asyncio.shield(self.running)
+            self.running = None
+
+    async def save(self):
+        #removed jobs keep their saved time, so a reloaded cog picks its cadence back up.
+        self.saved = {**self.saved, **{name: job.next_run for name, job in self.jobs.items()}}
+        await run_io(save_schedule, dict(self.saved))
+
+    async def _loop(self):
+        while True:
+            self.wakeup.clear()
+            timeout = None
+            if self.heap:
+                timeout = self.heap[0][0] - time.time()
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            next_run, name = heapq.heappop(self.heap)
+            job = self.jobs.get(name)
+            if job is None or job.next_run != next_run:
+                continue
+            times = job.due(time.time())
+            heapq.heappush(self.heap, (job.next_run, name))
+            #saved before the job runs: a crash mid-run skips that run rather than
+            #repeating it (a draw that already paid out, say).
+            await self.save()
+            self.running = asyncio.ensure_future(self._run(job, times))
+            try:
+                await asyncio.shield(self.running)
+            finally:
+                if self.running.done():
+                    self.running = None
+
+    async def _run(self, job, times):
+        #the loop waits for each run before the next, so the same job never overlaps itself.
+        job.last_delay = time.time() - times[-1]
+        started = time.perf_counter()
+        try:
+            await job.func(times)
+        except Exception:
+            job.failures += 1
+            print(f"[Scheduler] {job.name} failed:")
+            traceback.print_exc()
+        elapsed = (time.perf_counter() - started) * 1000
+        job.calls += 1
+        job.runs += len(times)
+        job.caught_up += len(times) - 1
+        job.last_ms = elapsed
+        job.max_ms = max(job.max_ms, elapsed)
+        job.total_ms += elapsed
+        if len(times) > 1:
+            print(f"[Scheduler] {job.name} caught up on {len(times)} runs in {elapsed:.0f} ms.")
+
+    def metrics(self):
+        return {name: job.metrics() for name, job in self.jobs.items()}
+
+#the one scheduler every cog shares
+scheduler = Scheduler()
@@ -1,14 +1,27 @@
 import discord
 from discord import app_commands
-from discord.ext import commands, tasks
+from discord.ext import commands
+import io
 import json
-import random
 import datetime
-from globals import STOCK_FILE, STOCK_HISTORY_FILE, UPDATE_INTERVAL_MINUTES, GUILD_ID
-from utils import load_data, save_data
+import numpy as np
+from globals import STOCK_FILE, UPDATE_INTERVAL_MINUTES, GUILD_ID, MARKET_SEED
+from economy import economy
+from persistence import run_io, atomic_write_json
+from market import MarketEngine
+from history import price_history, migrate_json_history, merge_candles, RANGES
+from charts import chart_cache
+from leaderboard import leaderboards
+from orders import fill_orders, describe_order
+from prices import price_feed
+from margin import open_margin_position, liquidate_positions, describe_position, MAX_LEVERAGE
+from scheduler import scheduler
 from typing import Optional
 import pytz
 
+#most missed ticks replayed after downtime, a day's worth. older ones are skipped.
+MARKET_CATCH_UP = 24 * 60 // UPDATE_INTERVAL_MINUTES
+
 #helper functions for stocks:
 def load_stocks():
     try:
@@ -23,135 +36,88 @@ def load_stocks():
         return default_data
 
 def save_stocks(data):
-    with open(STOCK_FILE, "w") as f:
-        json.dump(data, f, indent=4)
-
-def load_stock_history():
-    try:
-        with open(STOCK_HISTORY_FILE, "r") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
-
-def save_stock_history(history):
-    with open(STOCK_HISTORY_FILE, "w") as f:
-        json.dump(history, f, indent=4)
-
-def choose_new_market_event():
-    events = [
-        ("none", 0.96),
-        ("rally", 0.02),
-        ("crash", 0.02)
-    ]
-    total_weight = sum(weight for event, weight in events)
-    r = random.random() * total_weight
-    cumulative = 0
-    for event, weight in events:
-        cumulative += weight
-        if r < cumulative:
-            if event == "none":
-                return None
-            else:
-                duration = random.randint(1, 3)
-                return {"event": event, "duration": duration}
-    return None
-def update_stock_prices(current_market_event):
+    atomic_write_json(STOCK_FILE, data)
+
+def price_listing(snapshot):
+    msg = "**Current Stock Prices:**\n"
+    for sym, price in snapshot.items():
+        msg += f"**{sym}**: {price} Beaned Bucks\n"
+    return msg
+
+#raw ticks drawn when /stocks is asked about a symbol without a range, a day's worth.
+CHART_TICKS = 72
+
+def chart_series(symbol, range_name):
+    #render_chart kwargs for a symbol, None when there's not enough history to draw.
+    if range_name is None:
+        points = price_history.tail(symbol, CHART_TICKS)
+        if len(points) < 2:
+            return None
+        return {
+            "title": f"{symbol} (last {len(points)} updates)",
+            "times": [timestamp for timestamp, _ in points],
+            "closes": [price for _, price in points],
+        }
+    if range_name == "all":
+        #the all-time rollup is a single candle, draw the weekly ones instead.
+        candles = price_history.candles(symbol, "1w", price_history.count(symbol))
+    else:
+        candles = price_history.range_candles(symbol, range_name, datetime.datetime.now().timestamp())
+    if len(candles) < 2:
+        return None
+    return {
+        "title": f"{symbol} ({'all time' if range_name == 'all' else 'last ' + range_name})",
+        "times": [candle[0] for candle in candles],
+        "closes": [candle[4] for candle in candles],
+        "lows": [candle[3] for candle in candles],
+        "highs": [candle[2] for candle in candles],
+        "volumes": [candle[5] for candle in candles],
+    }
+
+def update_stock_prices(engine, current_market_event, volume=None, times=None):
+    #times are the epochs of the ticks to run, several when the scheduler is catching up
+    #on ticks missed while the bot was down. it's one load and one save either way and
+    #the changes cover the whole batch.
     data = load_stocks()
-    history = load_stock_history()
-    now_iso = datetime.datetime.now().isoformat()
-    changes = {}
+    times = times or [datetime.datetime.now().timestamp()]
+
+    #stocks.json stays the source of truth, symbols added by hand join the engine here.
+    engine.sync(data)
+    old_prices = engine.prices
+    ticks = []
+    for now in times:
+        if current_market_event is None:
+            current_market_event = engine.choose_event()
+            if current_market_event:
+                print(f"[Market Event] New event started: {current_market_event}")
+            else:
+                print("[Market Event] No event this update.")
+
+        engine.step(current_market_event)
+        ticks.append((now, engine.as_dict()))
 
-    if current_market_event is None:
-        current_market_event = choose_new_market_event()
         if current_market_event:
-            print(f"[Market Event] New event started: {current_market_event}")
-        else:
-            print("[Market Event] No event this update.")
-
-    event_type = current_market_event["event"] if current_market_event else None
-
-    for stock, price in data.items():
-        old_price = price
-        #check if the stock symbol contains "COIN"
-        is_coin = "COIN" in stock.upper()
-
-        #define the ranges based on whether it's a coin stock or not.
-        if is_coin:
-            #for coin stocks:
-            if event_type == "rally":
-                if random.random() < 0.70:
-                    change_percent = random.uniform(0.10, 0.50)  #rally upward: 10% to 50%
-                    new_price = price * (1 + change_percent)
-                else:
-                    change_percent = random.uniform(0.005, 0.20)  #normal fluctuation: 0.5% to 20%
-                    if random.random() < 0.5:
-                        change_percent = -change_percent
-                    new_price = price * (1 + change_percent)
-            elif event_type == "crash":
-                if random.random() < 0.70:
-                    change_percent = random.uniform(0.10, 0.50)  #crash downward: 10% to 50%
-                    new_price = price * (1 - change_percent)
-                else:
-                    change_percent = random.uniform(0.005, 0.20)
-                    if random.random() < 0.5:
-                        change_percent = -change_percent
-                    new_price = price * (1 + change_percent)
-            else:
-                #normal update for coin stocks 0.5% to 20% fluctuation.
-                change_percent = random.uniform(0.005, 0.20)
-                if random.random() < 0.5:
-                    change_percent = -change_percent
-                new_price = price * (1 + change_percent)
-        else:
-            #for non-coin stocks, use the original percentages.
-            if event_type == "rally":
-                if random.random() < 0.70:
-                    change_percent = random.uniform(0.10, 0.20)
-                    new_price = price * (1 + change_percent)
-                else:
-                    change_percent = random.uniform(0.005, 0.05)
-                    if random.random() < 0.5:
-                        change_percent = -change_percent
-                    new_price = price * (1 + change_percent)
-            elif event_type == "crash":
-                if random.random() < 0.70:
-                    change_percent = random.uniform(0.10, 0.20)
-                    new_price = price * (1 - change_percent)
-                else:
-                    change_percent = random.uniform(0.005, 0.05)
-                    if random.random() < 0.5:
-                        change_percent = -change_percent
-                    new_price = price * (1 + change_percent)
-            else:
-                if random.random() < 0.01:
-                    jump_factor = random.uniform(0.5, 0.95)
-                    if random.random() < 0.5:
-                        new_price = price * (1 + jump_factor)
-                    else:
-                        new_price = price * (1 - jump_factor)
-                else:
-                    change_percent = random.uniform(0.005, 0.05)
-                    if random.random() < 0.5:
-                        change_percent = -change_percent
-                    new_price = price * (1 + change_percent)
+            current_market_event["duration"] -= 1
+            if current_market_event["duration"] <= 0:
+                print(f"[Market Event] Event ended: {current_market_event}")
+                current_market_event = None
+
+    new_prices = engine.prices
+    absolute = np.round(new_prices - old_prices, 2)
+    percent = np.round(np.divide(new_prices - old_prices, old_prices, out=np.zeros_like(old_prices), where=old_prices != 0) * 100, 2)
 
-        new_price = max(round(new_price, 2), 0.01)
+    changes = {}
+    for stock, old_price, new_price, absolute_change, percent_change in zip(
+        engine.symbols, old_prices.tolist(), new_prices.tolist(), absolute.tolist(), percent.tolist()
+    ):
         data[stock] = new_price
-        absolute_change = round(new_price - old_price, 2)
-        percent_change = round(((new_price - old_price) / old_price) * 100, 2) if old_price != 0 else 0
         changes[stock] = {"old": old_price, "new": new_price, "abs": absolute_change, "perc": percent_change}
-        if stock not in history:
-            history[stock] = []
-        history[stock].append({"timestamp": now_iso, "price": new_price})
-
-    if current_market_event:
-        current_market_event["duration"] -= 1
-        if current_market_event["duration"] <= 0:
-            print(f"[Market Event] Event ended: {current_market_event}")
-            current_market_event = None
 
     save_stocks(data)
-    save_stock_history(history)
+    #one fixed-size record per symbol plus the candle rollups, the old history is never
+    #read or rewritten. the traded volume goes with the latest tick.
+    for index, (now, prices) in enumerate(ticks):
+        price_history.append(prices, now, volume if index == len(ticks) - 1 else None)
     print("Stock prices updated:", data)
     return changes, current_market_event
 
@@ -160,11 +126,29 @@ class StocksCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.current_market_event = None
-        self.market_task = tasks.loop(minutes=UPDATE_INTERVAL_MINUTES)(self.market_update_task)
-        self.market_task.start()
-
-    async def market_update_task(self):
-        changes, self.current_market_event = update_stock_prices(self.current_market_event)
+        #prices are synced from stocks.json every tick, only the rng state carries over.
+        self.engine = MarketEngine.from_prices({}, seed=MARKET_SEED)
+        #shares bought/sold per symbol since the last tick, goes into the candle volume.
+        self.traded_volume = {}
+
+    async def market_update_task(self, times=None):
+        #scheduler job. the whole tick (load, reprice, save stocks + history) runs on the
+        #io pool, ticks missed while the bot was down run there as one batch.
+        volume, self.traded_volume = self.traded_volume, {}
+        changes, self.current_market_event = await run_io(update_stock_prices, self.engine, self.current_market_event, volume, times)
+        #everyone reads prices from this snapshot until the next tick.
+        prices = price_feed.publish({stock: change["new"] for stock, change in changes.items()})
+        leaderboards.reprice(prices)
+        #resting orders the new prices crossed fill in one batch at those prices.
+        fills = await fill_orders(prices)
+        for fill in fills:
+            symbol = fill["order"]["symbol"]
+            self.traded_volume[symbol] = self.traded_volume.get(symbol, 0) + fill["shares"]
+        #then margin positions the move pushed under maintenance are closed out.
+        liquidations = await liquidate_positions(prices)
+        for liquidation in liquidations:
+            symbol = liquidation["symbol"]
+            self.traded_volume[symbol] = self.traded_volume.get(symbol, 0) + liquidation["position"]["shares"]
         channel = discord.utils.get(self.bot.get_all_channels(), name="bot-output")
         if channel:
             embed = discord.Embed(
@@ -184,54 +168,124 @@ class StocksCog(commands.Cog):
                 await channel.send(embed=embed)
             except Exception as e:
                 print(f"Failed to send stock update embed: {e}")
+            if fills:
+                lines = [
+                    f"<@{fill['order']['user_id']}> {describe_order(fill['order'])} filled: "
+                    f"{round(fill['shares'], 4)} shares at {fill['price']} ({fill['value']} Beaned Bucks)"
+                    for fill in fills
+                ]
+                #keep under discord's message limit, the rest can check /portfolio.
+                if len(lines) > 20:
+                    lines = lines[:20] + [f"...and {len(lines) - 20} more."]
+                try:
+                    await channel.send("**Orders Filled:**\n" + "\n".join(lines))
+                except Exception as e:
+                    print(f"Failed to send order fills: {e}")
+            if liquidations:
+                lines = [
+                    f"<@{liquidation['user_id']}> {liquidation['position']['side']} {liquidation['symbol']} liquidated at "
+                    f"{liquidation['price']}, {liquidation['payout']} Beaned Bucks returned"
+                    for liquidation in liquidations
+                ]
+                if len(lines) > 20:
+                    lines = lines[:20] + [f"...and {len(lines) - 20} more."]
+                try:
+                    await channel.send("**Margin Calls:**\n" + "\n".join(lines))
+                except Exception as e:
+                    print(f"Failed to send liquidations: {e}")
+
+    async def chart_file(self, symbol, range_name):
+        #the cached chart as an attachment, None if there's no history or rendering failed.
+        last = await run_io(price_history.tail, symbol, 1)
+        if not last:
+            return None
+        try:
+            png = await chart_cache.get(symbol, range_name or "recent", last[0][0], lambda: chart_series(symbol, range_name))
+        except Exception as e:
+            print(f"Failed to render chart for {symbol}: {e}")
+            return None
+        if png is None:
+            return None
+        return discord.File(io.BytesIO(png), filename=f"{symbol}.png")
+
+    async def send_with_chart(self, interaction, msg, symbol, range_name):
+        #a cache miss renders in the chart process, defer so discord doesn't time us out.
+        await interaction.response.defer(thinking=True)
+        chart = await self.chart_file(symbol, range_name)
+        if chart is None:
+            await interaction.followup.send(msg)
+        else:
+            await interaction.followup.send(msg, file=chart)
+
+    def cog_unload(self):
+        scheduler.remove("market")
+        chart_cache.close()
 
     @app_commands.guilds(discord.Object(id=GUILD_ID))
     @app_commands.command(name="stockbuy", description="Buy stock using your Beaned Bucks.")
-    @app_commands.describe(stock="Stock symbol (e.g. ACME)", amount="Amount to invest (or 'all')")
-    async def stockbuy(self, interaction: discord.Interaction, stock: str, amount: str):
-        stocks_data = load_stocks()
+    @app_commands.describe(
+    stock="Stock symbol (e.g. ACME)",
+    amount="Amount to invest (or 'all')",
+    leverage=f"Optional: Buy on margin, 2 to {MAX_LEVERAGE} times the amount (liquidated if it falls too far)"
+    )
+    async def stockbuy(self, interaction: discord.Interaction, stock: str, amount: str, leverage: int = 1):
+        stocks_data = price_feed.current()
         stock = stock.upper()
         if stock not in stocks_data:
             await interaction.response.send_message("Invalid stock symbol.", ephemeral=True)
             return
 
         price = stocks_data[stock]
-        data = load_data()
         user_id = str(interaction.user.id)
-        user_record = data.get(user_id, {"balance": 0, "portfolio": {}, "total_spent": 0, "total_earned": 0})
-        current_balance = float(user_record.get("balance", 0))
 
-        #determine investment amount.
-        if amount.lower() == "all":
-            invest_amount = current_balance
-        else:
+        #determine investment amount ('all' is resolved against the balance below).
+        invest_amount = None
+        if amount.lower() != "all":
             try:
                 invest_amount = float(amount)
             except ValueError:
                 await interaction.response.send_message("Invalid investment amount.", ephemeral=True)
                 return
 
-        if invest_amount <= 0:
-            await interaction.response.send_message("Investment amount must be greater than 0.", ephemeral=True)
-            return
-        if invest_amount > current_balance:
-            await interaction.response.send_message(f"You do not have enough Beaned Bucks to invest {invest_amount}.", ephemeral=True)
+        if leverage != 1:
+            #leveraged buys are margin positions, kept apart from the plain portfolio.
+            position, error = await open_margin_position(user_id, stock, "long", invest_amount, leverage, price)
+            if error:
+                await interaction.response.send_message(error, ephemeral=True)
+                return
+            self.traded_volume[stock] = self.traded_volume.get(stock, 0) + position["shares"]
+            await interaction.response.send_message(f"Leveraged buy at {price} per share.\n{describe_position(stock, position, price)}")
             return
 
-        shares = invest_amount / price
-        user_record["balance"] = current_balance - invest_amount
-        portfolio = user_record.get("portfolio", {})
-        portfolio[stock] = portfolio.get(stock, 0) + shares
-        user_record["portfolio"] = portfolio
-        user_record["total_spent"] = user_record.get("total_spent", 0) + invest_amount
+        error = None
+        async with economy.transaction(user_id) as tx:
+            user_record = tx.get(user_id)
+            current_balance = float(user_record.balance)
+            if invest_amount is None:
+                invest_amount = current_balance
+
+            if invest_amount <= 0:
+                error = "Investment amount must be greater than 0."
+            elif invest_amount > current_balance:
+                error = f"You do not have enough Beaned Bucks to invest {invest_amount}."
+            else:
+                shares = invest_amount / price
+                user_record.balance = current_balance - invest_amount
+                owned = user_record.add_shares(stock, shares)
+                user_record.total_spent += invest_amount
+
+                tx.put(user_id, user_record, "stockbuy")
+                new_balance = user_record.balance
 
-        data[user_id] = user_record
-        save_data(data)
+        if error:
+            await interaction.response.send_message(error, ephemeral=True)
+            return
 
+        self.traded_volume[stock] = self.traded_volume.get(stock, 0) + shares
         await interaction.response.send_message(
             f"Successfully invested {invest_amount} Beaned Bucks in {stock} at {price} per share.\n"
-            f"You now own {portfolio[stock]} shares of {stock}.\n"
-            f"Your new balance is {user_record['balance']} Beaned Bucks."
+            f"You now own {owned} shares of {stock}.\n"
+            f"Your new balance is {new_balance} Beaned Bucks."
         )
 
     @app_commands.guilds(discord.Object(id=GUILD_ID))
@@ -239,18 +293,19 @@ class StocksCog(commands.Cog):
     @app_commands.describe(user="Optional: The user whose portfolio you want to see (defaults to yourself)")
     async def portfolio(self, interaction: discord.Interaction, user: discord.Member = None):
         target = user or interaction.user
-        data = load_data()
         user_id = str(target.id)
-        user_record = data.get(user_id, {"balance": 0, "portfolio": {}, "total_spent": 0, "total_earned": 0})
-        portfolio_holdings = user_record.get("portfolio", {})
+        #reading through a transaction pays out any mined coins first.
+        async with economy.transaction(user_id) as tx:
+            user_record = tx.get(user_id)
+        portfolio_holdings = user_record.portfolio
 
-        stock_prices = load_stocks()
+        stock_prices = price_feed.current()
 
         embed = discord.Embed(
             title=f"{target.display_name}'s Portfolio",
             color=discord.Color.green()
         )
-        embed.set_footer(text=f"Balance: {user_record.get('balance', 0)} Beaned Bucks")
+        embed.set_footer(text=f"Balance: {user_record.balance} Beaned Bucks")
         
         if not portfolio_holdings:
             embed.description = "No stock holdings found."
@@ -270,10 +325,18 @@ class StocksCog(commands.Cog):
                 value=f"{round(total_value, 2)} Beaned Bucks",
                 inline=False
             )
+
+        #leveraged and short positions.
+        for symbol, position in user_record.positions.items():
+            embed.add_field(
+                name=f"{symbol} ({position['side']}, margin)",
+                value=describe_position(symbol, position, stock_prices.get(symbol, 0)),
+                inline=False
+            )
         
         #add profit tracking
-        total_spent = user_record.get("total_spent", 0)
-        total_earned = user_record.get("total_earned", 0)
+        total_spent = user_record.total_spent
+        total_earned = user_record.total_earned
         net_profit = total_earned - total_spent
         embed.add_field(name="Total Invested", value=f"{total_spent} Beaned Bucks", inline=True)
         embed.add_field(name="Total Earned", value=f"{total_earned} Beaned Bucks", inline=True)
@@ -290,76 +353,79 @@ class StocksCog(commands.Cog):
     async def sell(self, interaction: discord.Interaction, stock: str, quantity: str):
         stock = stock.upper()
 
-        #load current stock data.
-        stocks_data = load_stocks()
+        stocks_data = price_feed.current()
         if stock not in stocks_data:
             await interaction.response.send_message("Invalid stock symbol.", ephemeral=True)
             return
 
         price = stocks_data[stock]
 
-        #load user data.
-        data = load_data()
-        user_id = str(interaction.user.id)
-        user_record = data.get(user_id, {"balance": 0, "portfolio": {}, "total_spent": 0, "total_earned": 0})
-        portfolio = user_record.get("portfolio", {})
+        #determine the quantity to sell ('all' is resolved against the portfolio below).
+        sell_quantity = None
+        if quantity.lower() != "all":
+            try:
+                sell_quantity = float(quantity)
+            except Exception as e:
+                await interaction.response.send_message("Invalid quantity format. Please provide a number or 'all'.", ephemeral=True)
+                return
 
-        if stock not in portfolio:
-            await interaction.response.send_message("You do not own any shares of that stock.", ephemeral=True)
-            return
+        error = None
+        user_id = str(interaction.user.id)
+        async with economy.transaction(user_id) as tx:
+            #load user data.
+            user_record = tx.get(user_id)
+            portfolio = user_record.portfolio
 
-        #determine the quantity to sell.
-        try:
-            if quantity.lower() == "all":
-                sell_quantity = portfolio[stock]
+            if stock not in portfolio:
+                error = "You do not own any shares of that stock."
             else:
-                sell_quantity = float(quantity)
-        except Exception as e:
-            await interaction.response.send_message("Invalid quantity format. Please provide a number or 'all'.", ephemeral=True)
-            return
+                if sell_quantity is None:
+                    sell_quantity = portfolio[stock]
+                if sell_quantity <= 0:
+                    error = "Quantity must be greater than zero."
+                elif portfolio[stock] < sell_quantity:
+                    error = "You do not own enough shares of that stock to sell."
 
-        if sell_quantity <= 0:
-            await interaction.response.send_message("Quantity must be greater than zero.", ephemeral=True)
-            return
+            if error is None:
+                sale_value = round(price * sell_quantity, 2)
 
-        if portfolio[stock] < sell_quantity:
-            await interaction.response.send_message("You do not own enough shares of that stock to sell.", ephemeral=True)
-            return
-
-        sale_value = round(price * sell_quantity, 2)
+                #update portfolio.
+                user_record.add_shares(stock, -sell_quantity)
 
-        #update portfolio.
-        portfolio[stock] -= sell_quantity
-        if portfolio[stock] <= 0:
-            del portfolio[stock]
-        user_record["portfolio"] = portfolio
+                #update user's balance.
+                user_record.balance += sale_value
 
-        #update user's balance.
-        user_record["balance"] += sale_value
+                #update total earned.
+                user_record.total_earned += sale_value
 
-        #update total earned.
-        user_record["total_earned"] = user_record.get("total_earned", 0) + sale_value
+                tx.put(user_id, user_record, "stocksell")
+                new_balance = user_record.balance
 
-        data[user_id] = user_record
-        save_data(data)
+        if error:
+            await interaction.response.send_message(error, ephemeral=True)
+            return
 
+        self.traded_volume[stock] = self.traded_volume.get(stock, 0) + sell_quantity
         await interaction.response.send_message(
             f"Successfully sold {sell_quantity} shares of {stock} at {price} Beaned Bucks each for a total of {sale_value} Beaned Bucks.\n"
-            f"Your new balance is {user_record['balance']} Beaned Bucks."
+            f"Your new balance is {new_balance} Beaned Bucks."
         )
 
 
     @app_commands.guilds(discord.Object(id=GUILD_ID))
     @app_commands.command(name="stocks", description="View current stock prices, or view a specific stock's price history.")
-    @app_commands.describe(stock="Optional: The stock symbol to view history for")
-    async def stocks(self, interaction: discord.Interaction, stock: Optional[str] = None):
-        current_prices = load_stocks()
+    @app_commands.describe(
+    stock="Optional: The stock symbol to view history for",
+    chart_range="Optional: Summarize a stock over a day, week, month or all time"
+    )
+    @app_commands.rename(chart_range="range")
+    async def stocks(self, interaction: discord.Interaction, stock: Optional[str] = None, chart_range: Optional[str] = None):
+        current_prices = price_feed.current()
         
         #if no specific stock is provided, display current prices for all stocks.
         if stock is None:
-            msg = "**Current Stock Prices:**\n"
-            for sym, price in current_prices.items():
-                msg += f"**{sym}**: {price} Beaned Bucks\n"
+            #built once per tick, not per call.
+            msg = current_prices.memo("listing", price_listing)
             await interaction.response.send_message(msg)
         else:
             stock = stock.upper()
@@ -371,19 +437,41 @@ class StocksCog(commands.Cog):
             #retrieve current price.
             price = current_prices[stock]
             msg = f"**{stock}**\nCurrent Price: {price} Beaned Bucks\n\n"
-            
-            #load the stock history.
-            history = load_stock_history()
-            if stock in history and history[stock]:
+
+            if chart_range is not None:
+                chart_range = chart_range.lower()
+                if chart_range not in RANGES:
+                    await interaction.response.send_message("Invalid range. Please choose day, week, month, or all.", ephemeral=True)
+                    return
+                #a handful of rollup candles, however long the market has been running.
+                candles = await run_io(price_history.range_candles, stock, chart_range, datetime.datetime.now().timestamp())
+                candle = merge_candles(candles)
+                if candle is None:
+                    msg += "No history available."
+                else:
+                    start, open_price, high, low, close, volume = candle
+                    change = round(close - open_price, 2)
+                    percent = round(change / open_price * 100, 2) if open_price else 0
+                    sign = "+" if change >= 0 else ""
+                    msg += (
+                        f"**{'All Time' if chart_range == 'all' else 'Last ' + chart_range.capitalize()}:**\n"
+                        f"Open: {open_price} | High: {high} | Low: {low} | Close: {close}\n"
+                        f"Change: {sign}{change} ({sign}{percent}%)\n"
+                        f"Volume: {round(volume, 4)} shares"
+                    )
+                await self.send_with_chart(interaction, msg, stock, chart_range)
+                return
+
+            #only the last 10 records of the history file are read.
+            points = await run_io(price_history.tail, stock, 10)
+            if points:
                 msg += "**Price History (last 10 updates):**\n"
-                for record in history[stock][-10:]:
-                    timestamp = record["timestamp"]
-                    hist_price = record["price"]
-                    msg += f"{timestamp}: {hist_price}\n"
+                for timestamp, hist_price in points:
+                    msg += f"{datetime.datetime.fromtimestamp(timestamp).isoformat()}: {hist_price}\n"
             else:
                 msg += "No history available."
             
-            await interaction.response.send_message(msg)
+            await self.send_with_chart(interaction, msg, stock, None)
 
     @app_commands.guilds(discord.Object(id=GUILD_ID))
     @app_commands.command(name="stockgive", description="Give a stock to another user.")
@@ -394,60 +482,69 @@ class StocksCog(commands.Cog):
     )
     async def stockgive(self, interaction: discord.Interaction, stock: str, quantity: str,  user: discord.Member):
         stock = stock.upper()
-        #load current stock data.
-        stocks_data = load_stocks()
+        stocks_data = price_feed.current()
         if stock not in stocks_data:
             await interaction.response.send_message("Invalid stock symbol.", ephemeral=True)
             return
         
-        #load user data
-        data = load_data()
+        #determine the quantity to give ('all' is resolved against the portfolio below).
+        give_quantity = None
+        if quantity.lower() != "all":
+            try:
+                give_quantity = float(quantity)
+            except Exception as e:
+                await interaction.response.send_message("Invalid quantity format. Please provide a number or 'all'.", ephemeral=True)
+                return
+
+        error = None
         user_id = str(interaction.user.id)
-        user_record = data.get(user_id, {"balance": 0, "portfolio": {}, "total_spent": 0, "total_earned": 0})
-        portfolio = user_record.get("portfolio", {})
-        #load target data
         target_id = str(user.id)
-        target_record = data.get(target_id, {"balance": 0, "portfolio": {}, "total_spent": 0, "total_earned": 0})
-        target_portfolio = target_record.get("portfolio", {})
+        async with economy.transaction([user_id, target_id]) as tx:
+            #load user data
+            user_record = tx.get(user_id)
+            portfolio = user_record.portfolio
 
-        if stock not in portfolio:
-            await interaction.response.send_message("You do not own any shares of that stock.", ephemeral=True)
-            return
-        #determine the quantity to give.
-        try:
-            if quantity.lower() == "all":
-                give_quantity = portfolio[stock]
+            if stock not in portfolio:
+                error = "You do not own any shares of that stock."
             else:
-                give_quantity = float(quantity)
-        except Exception as e:
-            await interaction.response.send_message("Invalid quantity format. Please provide a number or 'all'.", ephemeral=True)
-            return
-
-        if give_quantity <= 0:
-            await interaction.response.send_message("Quantity must be greater than zero.", ephemeral=True)
-            return
-
-        if portfolio[stock] < give_quantity:
-            await interaction.response.send_message("You do not own enough shares of that stock to sell.", ephemeral=True)
+                if give_quantity is None:
+                    give_quantity = portfolio[stock]
+                if give_quantity <= 0:
+                    error = "Quantity must be greater than zero."
+                elif portfolio[stock] < give_quantity:
+                    error = "You do not own enough shares of that stock to sell."
+
+            if error is None:
+                #update portfolio.
+                user_record.add_shares(stock, -give_quantity)
+                tx.put(user_id, user_record, "stockgive")
+
+                #load target data after the giver is written, in case they gave to themselves.
+                target_record = tx.get(target_id)
+                target_record.add_shares(stock, give_quantity)
+                tx.put(target_id, target_record, "stockgive")
+
+        if error:
+            await interaction.response.send_message(error, ephemeral=True)
             return
 
-        #update portfolio.
-        portfolio[stock] -= give_quantity
-        if portfolio[stock] <= 0:
-            del portfolio[stock]
-        user_record["portfolio"] = portfolio
-        data[user_id] = user_record
-
-        target_portfolio[stock] = target_portfolio.get(stock, 0) + give_quantity
-        target_record["portfolio"] = target_portfolio
-        data[target_id] = target_record
-
-
-        save_data(data)
-
         await interaction.response.send_message(
             f"Successfully gave {user.mention} {give_quantity} shares of {stock}.")
 
 async def setup(bot: commands.Bot):
     print("Loading StocksCog...")
-    await bot.add_cog(StocksCog(bot))
+    if not price_history.exists():
+        #first start since history moved out of stock_history.json.
+        count = await run_io(migrate_json_history)
+        if count:
+            print(f"[Stocks] Imported {count} price point(s) from the old history file.")
+    #history written before candles existed gets its rollups built once.
+    rebuilt = await run_io(price_history.ensure_candles)
+    if rebuilt:
+        print(f"[Stocks] Built candle rollups for {rebuilt} symbol(s).")
+    if not price_feed.current().version:
+        price_feed.publish(await run_io(load_stocks))
+    cog = StocksCog(bot)
+    await bot.add_cog(cog)
+    #first tick right away on a fresh install, after that the saved schedule holds.
+    scheduler.add("market", cog.market_update_task, lambda run: run + UPDATE_INTERVAL_MINUTES * 60, catch_up=MARKET_CATCH_UP)
@@ -0,0 +1,161 @@
+#storage.py
+#storage backends behind the economy store. json keeps the old data.json file,
+#sqlite keeps one row per user so a flush only touches the users that changed.
+#
+#one-shot import of an existing data.json:
+#    python storage.py migrate [--json data.json] [--db economy.db]
+import argparse
+import json
+import os
+import sqlite3
+from globals import DATA_FILE, DATABASE_FILE, STORAGE_BACKEND
+from persistence import atomic_write_json
+from records import UserRecord
+
+#data.json key holding the last journal event folded into the file, stripped on load.
+JOURNAL_SEQ_KEY = "__journal_seq__"
+
+#user fields that get their own typed column, anything else goes in the extra json blob.
+USER_COLUMNS = {
+    "balance": "NUMERIC",  #NUMERIC so whole-number balances come back as ints like they do from json
+    "vc_time": "REAL",
+    "vc_timealone": "REAL",
+    "vc_afk": "REAL",
+    "graphics_cards": "INTEGER",
+    "mining": "TEXT",
+}
+
+#backends load UserRecords keyed by int user id and save from a snapshot of plain dicts
+#taken on the event loop (snapshot()) so the actual serializing can happen on the io
+#thread pool while commands keep changing records.
+class JsonBackend:
+    def __init__(self, path=DATA_FILE):
+        self.path = path
+        self.journal_seq = 0
+
+    def load_all(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r") as f:
+            try:
+                records = json.load(f)
+            except json.JSONDecodeError as e:
+                #starting from {} here would wipe everyone on the next save.
+                raise RuntimeError(f"{self.path} is corrupt ({e}). Restore it from a backup or delete it to start fresh.")
+        self.journal_seq = records.pop(JOURNAL_SEQ_KEY, 0)
+        return {int(user_id): UserRecord.from_dict(record) for user_id, record in records.items()}
+
+    def snapshot(self, records, dirty):
+        #json has no per-record writes, the whole file goes out every time.
+        #keys stay ints, json.dump writes them out as strings.
+        return {user_id: record.to_dict() for user_id, record in records.items()}
+
+    def save(self, records, dirty, journal_seq=None):
+        if journal_seq is not None:
+            self.journal_seq = journal_seq
+        atomic_write_json(self.path, {JOURNAL_SEQ_KEY: self.journal_seq, **records})
+
+    def close(self):
+        pass
+
+class SqliteBackend:
+    def __init__(self, path=DATABASE_FILE):
+        self.path = path
+        self.journal_seq = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        columns = ", ".join(f"{name} {kind}" for name, kind in USER_COLUMNS.items())
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS users (user_id TEXT PRIMARY KEY, {columns}, extra TEXT)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS portfolios ("
+            "user_id TEXT NOT NULL, symbol TEXT NOT NULL, shares REAL NOT NULL, "
+            "PRIMARY KEY (user_id, symbol))"
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+        self.conn.commit()
+
+    def load_all(self):
+        records = {}
+        names = list(USER_COLUMNS)
+        for row in self.conn.execute(f"SELECT user_id, {', '.join(names)}, extra FROM users"):
+            user_id, values, extra = row[0], row[1:-1], row[-1]
+            record = json.loads(extra) if extra else {}
+            #NULL columns were never set on the original record, keep them missing.
+            for name, value in zip(names, values):
+                if value is not None:
+                    record[name] = value
+            records[user_id] = record
+        for user_id, symbol, shares in self.conn.execute("SELECT user_id, symbol, shares FROM portfolios"):
+            records.setdefault(user_id, {}).setdefault("portfolio", {})[symbol] = shares
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'journal_seq'").fetchone()
+        self.journal_seq = row[0] if row else 0
+        return {int(user_id): UserRecord.from_dict(record) for user_id, record in records.items()}
+
+    def _row(self, user_id, record):
+        extra = {k: v for k, v in record.items() if k not in USER_COLUMNS and k != "portfolio"}
+        return (user_id, *(record.get(name) for name in USER_COLUMNS), json.dumps(extra) if extra else None)
+
+    def snapshot(self, records, dirty):
+        #only the changed users are written, a missing one gets its rows deleted.
+        return {user_id: records[user_id].to_dict() for user_id in dirty if user_id in records}
+
+    def save(self, records, dirty, journal_seq=None):
+        names = ", ".join(USER_COLUMNS)
+        placeholders = ", ".join("?" for _ in range(len(USER_COLUMNS) + 2))
+        with self.conn:
+            for user_id in dirty:
+                record = records.get(user_id)
+                #user_id stays TEXT in the schema, databases from before int ids keep working.
+                user_id = str(user_id)
+                if record is None:
+                    self.conn.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+                    self.conn.execute("DELETE FROM portfolios WHERE user_id = ?", (user_id,))
+                    continue
+                self.conn.execute(
+                    f"INSERT OR REPLACE INTO users (user_id, {names}, extra) VALUES ({placeholders})",
+                    self._row(user_id, record)
+                )
+                self.conn.execute("DELETE FROM portfolios WHERE user_id = ?", (user_id,))
+                portfolio = record.get("portfolio") or {}
+                self.conn.executemany(
+                    "INSERT INTO portfolios (user_id, symbol, shares) VALUES (?, ?, ?)",
+                    [(user_id, symbol, shares) for symbol, shares in portfolio.items()]
+                )
+            if journal_seq is not None:
+                #same transaction as the rows, so the snapshot and its seq always agree.
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('journal_seq', ?)", (journal_seq,))
+                self.journal_seq = journal_seq
+
+    def close(self):
+        self.conn.close()
+
+def get_backend(name=STORAGE_BACKEND):
+    name = name.lower()
+    if name == "json":
+        return JsonBackend()
+    if name == "sqlite":
+        return SqliteBackend()
+    raise ValueError(f"Unknown storage backend '{name}'. Use 'json' or 'sqlite'.")
+
+def migrate_json_to_sqlite(json_path=DATA_FILE, db_path=DATABASE_FILE):
+    source = JsonBackend(json_path)
+    records = source.load_all()
+    backend = SqliteBackend(db_path)
+    try:
+        #carry the journal position over so the same journal keeps replaying correctly.
+        backend.save(backend.snapshot(records, records.keys()), records.keys(), journal_seq=source.journal_seq)
+    finally:
+        backend.close()
+    return len(records)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Economy storage tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="Import an existing data.json into the sqlite database.")
+    migrate.add_argument("--json", default=DATA_FILE, help="data.json to read")
+    migrate.add_argument("--db", default=DATABASE_FILE, help="sqlite database to write")
+    args = parser.parse_args()
+    if args.command == "migrate":
+        count = migrate_json_to_sqlite(args.json, args.db)
+        print(f"Migrated {count} user(s) from {args.json} into {args.db}.")
@@ -0,0 +1,137 @@
+#subscriptions.py
+#recurring lottery tickets. a subscription buys the same tickets (fixed numbers or fresh
+#quick picks) before each of the next N draws, paid for at draw time.
+#
+#draws are counted (the lottery's "Draw" is the number of the next one) and subscriptions
+#are indexed by the draw they're next due at, so a draw finds exactly the subscriptions
+#it owes tickets to and never looks at anyone else.
+#
+#the book is an economy book (see economy.py). a draw moves each paying user's
+#subscriptions on in the same journal event as their debit and their tickets, so a
+#restart can't charge them twice for one draw. LOTTERY_SUBSCRIPTIONS_FILE is the
+#checkpoint the journal after its "seq" is replayed on.
+#    due = subscription_book.due(draw)
+#    tx.adjust(user_id, -cost, "lottery subscription", effects=[..., {"book": "subscriptions", "paid": ids, "next_draw": draw + 1}])
+import json
+import datetime
+import functools
+from globals import LOTTERY_SUBSCRIPTIONS_FILE
+from economy import economy
+from persistence import run_io, atomic_write_json
+
+#most draws one subscription can cover.
+MAX_SUBSCRIPTION_DRAWS = 365
+#subscriptions one user can have running at once.
+MAX_SUBSCRIPTIONS = 10
+
+def load_subscriptions():
+    try:
+        with open(LOTTERY_SUBSCRIPTIONS_FILE, "r") as f:
+            data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("Subscriptions data is not a dictionary.")
+            return data
+    except (FileNotFoundError, json.JSONDecodeError, ValueError):
+        return {"next_id": 1, "subscriptions": [], "seq": 0}
+
+def save_subscriptions(data):
+    atomic_write_json(LOTTERY_SUBSCRIPTIONS_FILE, data)
+
+class SubscriptionBook:
+    def __init__(self):
+        #subscription id -> {"id", "user_id", "numbers" (None for quick picks), "count", "remaining", "next_draw"}
+        self.subscriptions = {}
+        #draw number -> ids of the subscriptions due at it.
+        self.by_draw = {}
+        self.next_id = 1
+
+    def load(self, data):
+        self.subscriptions = {}
+        self.by_draw = {}
+        self.next_id = data.get("next_id", 1)
+        for subscription in data.get("subscriptions", []):
+            self._index(subscription)
+
+    def checkpoint(self):
+        #economy book hook, copied because a draw changes subscriptions in place.
+        data = {"next_id": self.next_id, "subscriptions": [dict(s) for s in self.subscriptions.values()], "seq": economy.journal.seq}
+        return functools.partial(run_io, save_subscriptions, data)
+
+    def apply(self, effect):
+        #economy book hook, the same changes live and on replay.
+        if "subscribe" in effect:
+            subscription = effect["subscribe"]
+            self.next_id = max(self.next_id, subscription["id"] + 1)
+            self._index(subscription)
+        elif "paid" in effect:
+            #bought this draw's tickets: one draw less to go, due again at next_draw.
+            for subscription_id in effect["paid"]:
+                subscription = self.subscriptions.get(subscription_id)
+                if subscription is None:
+                    continue
+                self._unindex(subscription)
+                subscription["remaining"] -= 1
+                if subscription["remaining"] <= 0:
+                    del self.subscriptions[subscription_id]
+                    continue
+                subscription["next_draw"] = effect["next_draw"]
+                self._index(subscription)
+        else:
+            for subscription_id in effect["cancel"]:
+                subscription = self.subscriptions.get(subscription_id)
+                if subscription is not None:
+                    self._drop(subscription)
+
+    def _index(self, subscription):
+        self.subscriptions[subscription["id"]] = subscription
+        self.by_draw.setdefault(subscription["next_draw"], set()).add(subscription["id"])
+
+    def _unindex(self, subscription):
+        due = self.by_draw.get(subscription["next_draw"])
+        if due is not None:
+            due.discard(subscription["id"])
+            if not due:
+                del self.by_draw[subscription["next_draw"]]
+
+    def subscribe(self, user_id, numbers, count, draws, next_draw):
+        subscription = {
+            "id": self.next_id,
+            "user_id": str(user_id),
+            "numbers": sorted(numbers) if numbers else None,
+            "count": count,
+            "remaining": draws,
+            "next_draw": next_draw,
+            "created": datetime.datetime.now().isoformat(),
+        }
+        self.next_id += 1
+        economy.record([{"book": "subscriptions", "subscribe": subscription}])
+        return subscription
+
+    def cancel(self, subscriptions):
+        if subscriptions:
+            economy.record([{"book": "subscriptions", "cancel": [s["id"] for s in subscriptions]}])
+
+    def cancel_user(self, user_id):
+        #drops every subscription the user has, returns them.
+        cancelled = self.user_subscriptions(user_id)
+        self.cancel(cancelled)
+        return cancelled
+
+    def _drop(self, subscription):
+        del self.subscriptions[subscription["id"]]
+        self._unindex(subscription)
+
+    def due(self, draw):
+        #every subscription due at or before draw, earlier ones were missed by a crash.
+        #they stay due until a "paid" or "cancel" effect moves them.
+        ids = []
+        for key in [key for key in self.by_draw if key <= draw]:
+            ids.extend(self.by_draw[key])
+        return [self.subscriptions[subscription_id] for subscription_id in sorted(ids)]
+
+    def user_subscriptions(self, user_id):
+        user_id = str(user_id)
+        return [s for s in self.subscriptions.values() if s["user_id"] == user_id]
+
+#the one subscription book every cog shares
+subscription_book = SubscriptionBook()